@@ -0,0 +1,133 @@
+import libtorrent as lt
+import threading
+import atexit
+
+
+# Alert categories every session must enable for the engine to see piece,
+# state and error events
+ALERT_MASK = (lt.alert.category_t.status_notification |
+              lt.alert.category_t.error_notification |
+              lt.alert.category_t.storage_notification |
+              lt.alert.category_t.piece_progress_notification)
+
+
+def torrent_key(handle):
+    """Key used to route a torrent's alerts to its listener"""
+    return str(handle.info_hash())
+
+
+class AlertEngine:
+    """
+    Pumps alerts off a libtorrent session and dispatches them to per-torrent
+    listeners. Replaces status()/have_piece() polling: a piece is reported as
+    soon as libtorrent posts piece_finished_alert, and an idle engine sleeps
+    inside wait_for_alert().
+
+    Listener callbacks run on the engine thread and must not block; hand the
+    work off to a queue instead. Supported callbacks (all optional):
+        on_piece_finished(piece_index)
+        on_read_piece(piece_index, buffer, error)   - error is None on success
+        on_torrent_checked()
+        on_torrent_finished()
+        on_state_changed(state)
+        on_error(message)
+        on_resume_data(params)   - save_resume_data_alert, lt.add_torrent_params
+        on_alert(alert)          - any other alert for the torrent
+
+    Session listeners (add_session_listener) receive alerts that are not
+    tied to a torrent:
+        on_state_update(statuses)   - state_update_alert, see post_torrent_updates()
+        on_session_alert(alert)     - any other session-wide alert
+    """
+
+    def __init__(self, session, wait_ms=500):
+        self.session = session
+        self.wait_ms = wait_ms
+        self.listeners = {}  # torrent key -> listener
+        self.session_listeners = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def register(self, key, listener):
+        with self.lock:
+            self.listeners[key] = listener
+
+    def unregister(self, key):
+        with self.lock:
+            self.listeners.pop(key, None)
+
+    def add_session_listener(self, listener):
+        with self.lock:
+            self.session_listeners.append(listener)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        # Let the thread leave wait_for_alert() before libtorrent tears down
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.wait_ms / 1000 * 2)
+
+    def _run(self):
+        while self.running:
+            if not self.session.wait_for_alert(self.wait_ms):
+                continue
+            for alert in self.session.pop_alerts():
+                try:
+                    self.dispatch(alert)
+                except Exception as e:
+                    print(f"⚠ Alert dispatch failed ({alert.what()}): {e}")
+
+    def dispatch(self, alert):
+        handle = getattr(alert, 'handle', None)
+        if handle is None:
+            self.dispatch_session(alert)
+            return
+        if not handle.is_valid():
+            return
+
+        with self.lock:
+            listener = self.listeners.get(torrent_key(handle))
+        if listener is None:
+            return
+
+        if isinstance(alert, lt.piece_finished_alert):
+            self._call(listener, 'on_piece_finished', alert.piece_index)
+        elif isinstance(alert, lt.read_piece_alert):
+            error = alert.error.message() if alert.error.value() else None
+            self._call(listener, 'on_read_piece', alert.piece, alert.buffer, error)
+        elif isinstance(alert, lt.torrent_checked_alert):
+            self._call(listener, 'on_torrent_checked')
+        elif isinstance(alert, lt.torrent_finished_alert):
+            self._call(listener, 'on_torrent_finished')
+        elif isinstance(alert, lt.state_changed_alert):
+            self._call(listener, 'on_state_changed', alert.state)
+        elif isinstance(alert, lt.save_resume_data_alert):
+            self._call(listener, 'on_resume_data', alert.params)
+        elif isinstance(alert, (lt.torrent_error_alert, lt.file_error_alert)):
+            self._call(listener, 'on_error', alert.message())
+        else:
+            self._call(listener, 'on_alert', alert)
+
+    def dispatch_session(self, alert):
+        with self.lock:
+            listeners = list(self.session_listeners)
+
+        for listener in listeners:
+            if isinstance(alert, lt.state_update_alert):
+                self._call(listener, 'on_state_update', alert.status)
+            else:
+                self._call(listener, 'on_session_alert', alert)
+
+    @staticmethod
+    def _call(listener, name, *args):
+        callback = getattr(listener, name, None)
+        if callback is not None:
+            callback(*args)
@@ -1,16 +1,39 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import os
+import sys
 import threading
 import time
+import queue
+import itertools
 import libtorrent as lt
 from datetime import datetime
 import hashlib
+from session_manager import TorrentBusy, get_session_manager
+from piece_pipeline import get_piece_pipeline
+from scanner_executor import get_scanner_executor
+from verdict_cache import get_verdict_cache, piece_hash_hex
+from torrent_index import TorrentIndex
+from sampling import FirstPiecesStrategy, SamplingBudget, create_strategy
+from policy import create_policy
+from piece_picker import create_picker
+from progress_emitter import ProgressEmitter
+from status_collector import StatusCollector
+from results_store import get_results_store
+from scheduler import get_scheduler, QueueFull
+from resume_store import get_resume_store
+from presets import apply_torrent_preset, describe_presets, get_preset
+from metrics import get_metrics
+from sample_storage import get_sample_storage
+from file_index import FileVerdicts, get_file_index
+from signatures import SignatureStreams
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Emits come from plain threads (downloads, progress emitter), which only the
+# threading server delivers; under eventlet they never reach the clients
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Configuration
 DOWNLOAD_FOLDER = os.path.join(os.getcwd(), "downloads")
@@ -18,59 +41,189 @@ UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Global state management
+# Global state management (active_downloads is shared with download threads)
 active_downloads = {}
-scan_results = {}
+active_downloads_lock = threading.Lock()
+
+# One queued or running download per torrent: infohash -> download_id
+active_info_hashes = {}
+
+# Per-piece scan results and final verdicts are persisted (see results_store.py)
+MAX_RESULTS_PAGE = 1000
+
+# Uploaded torrents, keyed by infohash (parsed once, see torrent_index.py)
+torrent_index = TorrentIndex(UPLOAD_FOLDER)
+
+# Seconds between progress frames (clients may ask for a slower pace)
+PROGRESS_INTERVAL = 0.5
+
+# Swarm status of every torrent, refreshed from post_torrent_updates();
+# readers only ever see the latest immutable snapshot
+status_collector = StatusCollector(get_session_manager(), interval=PROGRESS_INTERVAL)
+status_collector.start()
+
+# Progress of every download, coalesced into one delta frame per client per tick
+progress_emitter = ProgressEmitter(socketio, interval=PROGRESS_INTERVAL,
+                                   snapshot=status_collector.snapshot)
+progress_emitter.start()
+
+# Seconds between save_resume_data() requests for running torrents
+RESUME_SAVE_INTERVAL = float(os.environ.get('RESUME_SAVE_INTERVAL', 10))
+get_resume_store().start(get_session_manager(), interval=RESUME_SAVE_INTERVAL)
+
+# libtorrent counters for /metrics, refreshed from post_session_stats()
+METRICS_SESSION_INTERVAL = float(os.environ.get('METRICS_SESSION_INTERVAL', 5))
+get_metrics().start(get_session_manager(), interval=METRICS_SESSION_INTERVAL)
 
 
 # ============= TORRENT CLIENT CLASS =============
 class TorrentDownloader:
-    def __init__(self, download_id):
+    def __init__(self, download_id, session_manager=None, pipeline=None, scanner=None,
+                 verdicts=None, policy=None, results=None, resume_store=None, storage=None,
+                 picker=None):
         self.download_id = download_id
-        self.session = lt.session()
         
-        settings = self.session.get_settings()
-        settings['listen_interfaces'] = '0.0.0.0:6881'
-        settings['enable_dht'] = True
-        settings['enable_lsd'] = True
-        settings['enable_upnp'] = True
-        settings['enable_natpmp'] = True
-        settings['announce_to_all_trackers'] = True
-        settings['announce_to_all_tiers'] = True
-        self.session.apply_settings(settings)
-
-        self.session.add_dht_router("router.bittorrent.com", 6881)
-        self.session.add_dht_router("router.utorrent.com", 6881)
-        self.session.add_dht_router("dht.transmissionbt.com", 6881)
-        self.session.start_dht()
+        # All downloads share the process-wide session (see session_manager.py)
+        self.sessions = session_manager or get_session_manager()
+        
+        # Piece bytes flow read_piece -> bounded queue -> scanner workers
+        self.pipeline = pipeline or get_piece_pipeline()
+        self.scanner = scanner or get_scanner_executor()
+        self.verdicts = verdicts or get_verdict_cache()
+        self.results = results or get_results_store()
+        self.resume_store = resume_store or get_resume_store()
+        self.resume_started = None  # set for jobs restarted after a server restart
+        self.preset = None  # per-download performance preset (presets.py)
+        
+        # Early exit on conclusive verdicts, more pieces for suspicious samples
+        self.policy = policy or create_policy()
+        
+        # Priorities only, or deadlines in scan order (see piece_picker.py)
+        self.picker = picker or create_picker()
         
         self.handle = None
         self.info = None
         self.stopped = False
+        
+        # Sampling state, set up by download_chunks_with_scan
+        self.strategy = None
+        self.candidates = None
+        self.reserve = 0
+        self.target_pieces = set()
+        self.known_pieces = {}  # piece_index -> piece_hash, verdict came from the cache
+        self.requested_at = {}  # piece_index -> when it was prioritized (piece wait metric)
+        self.metrics = get_metrics()
+        
+        # Piece -> file ranges and kinds, per-file verdicts (see file_index.py),
+        # signature matches across piece boundaries (see signatures.py)
+        self.files = None
+        self.file_verdicts = None
+        self.signatures = None
+        
+        # Sampled files are kept, deleted when done, or kept in a scratch area
+        self.storage = storage or get_sample_storage()
+        self.save_path = None
+        self.disk_bytes = None
+        self.released = False
+        self.release_lock = threading.Lock()
+        
+        # Filled by AlertEngine callbacks, drained by the download loop
+        self.events = queue.Queue()
+
+    # ----- AlertEngine callbacks (run on the alert thread, must not block) -----
+
+    def on_piece_finished(self, piece_index):
+        self.events.put(('piece', piece_index))
 
-    def download_chunks_with_scan(self, torrent_file_path, save_path, num_pieces=10):
-        """Download chunks and emit progress via WebSocket"""
+    def on_read_piece(self, piece_index, buffer, error):
+        self.pipeline.piece_read(self.download_id, piece_index, buffer, error)
+
+    def on_torrent_checked(self):
+        if self.resume_started is not None:
+            # Restart-to-resume time: server start until the torrent is usable again
+            self.resume_store.record_resume(time.time() - self.resume_started)
+            self.resume_started = None
+        self.events.put(('checked', None))
+
+    def on_resume_data(self, params):
+        self.resume_store.save_resume_data(self.download_id, lt.write_resume_data_buf(params))
+
+    def on_error(self, message):
+        self.events.put(('error', message))
+
+    def download_chunks_with_scan(self, torrent, save_path, num_pieces=10, strategy=None,
+                                  budget=None, resume_data=None, peers=None):
+        """
+        Download chunks and emit progress via WebSocket.
+        `torrent` is a parsed lt.torrent_info or a path to a .torrent file.
+        Which pieces are sampled is up to `strategy` (see sampling.py, default
+        first N pieces) within `budget` (default: num_pieces pieces).
+        `resume_data` (from the resume store) continues an interrupted job.
+        `peers` are (host, port) pairs to connect to directly (tracker-less
+        lab swarms, bench_swarm.py).
+        """
         
         try:
-            self.info = lt.torrent_info(torrent_file_path)
+            if isinstance(torrent, lt.torrent_info):
+                self.info = torrent
+            else:
+                self.info = lt.torrent_info(torrent)
+            self.files = get_file_index(self.info)
+            self.file_verdicts = FileVerdicts(self.files, self.policy.settings)
+            self.signatures = SignatureStreams(self.files)
             
-            params = {
-                'save_path': save_path,
-                'storage_mode': lt.storage_mode_t.storage_mode_sparse,
-                'ti': self.info
-            }
+            budget = budget or SamplingBudget(max_pieces=num_pieces)
+            budget_pieces = budget.pieces(self.info)
             
-            self.handle = self.session.add_torrent(params)
+            # Usual folder or a per-job scratch directory (see sample_storage.py)
+            self.save_path = self.storage.acquire(
+                self.download_id, self.info, budget_pieces * self.info.piece_length(), save_path)
             
+            if resume_data:
+                # Interrupted job: libtorrent trusts the saved piece state
+                # instead of hash-checking the files already on disk
+                params = lt.read_resume_data(resume_data)
+                params.ti = self.info
+                params.save_path = self.save_path
+                params.storage_mode = lt.storage_mode_t.storage_mode_sparse
+            else:
+                params = {
+                    'save_path': self.save_path,
+                    'storage_mode': lt.storage_mode_t.storage_mode_sparse,
+                    'ti': self.info
+                }
+            
+            self.strategy = strategy or FirstPiecesStrategy()
             total_pieces = self.info.num_pieces()
-            num_pieces = min(num_pieces, total_pieces)
             
-            # Prioritize only first N pieces
-            priorities = [0] * total_pieces
-            for i in range(num_pieces):
-                priorities[i] = 7
+            # Adaptive strategies hold part of the budget back for feedback()
+            self.reserve = int(budget_pieces * self.strategy.adaptive_share)
+            self.candidates = iter(self.strategy.order(self.info, budget_pieces))
+            
+            if resume_data and list(params.piece_priorities):
+                new_targets = self._resume_sample(params)
+            else:
+                # Pieces whose hash already has a verdict are never fetched;
+                # the budget goes to unseen pieces instead
+                self.target_pieces = set()
+                self.known_pieces = {}
+                new_targets = self._extend_sample(self.candidates, budget_pieces - self.reserve)
             
-            self.handle.prioritize_pieces(priorities)
+            self.handle = self.sessions.add_torrent(self.download_id, params, listener=self)
+            if self.stopped:
+                # stop() came in while the torrent was being added
+                self._release_torrent()
+                return {'success': False, 'error': 'Download stopped'}
+            if self.preset:
+                apply_torrent_preset(self.handle, self.preset)
+            for peer in peers or []:
+                self.handle.connect_peer(peer)
+            status_collector.track(self.download_id, name=self.info.name(),
+                                   total_size=self.info.total_size())
+            
+            # Request only the unseen sample pieces
+            self.picker.start(self.handle, total_pieces, new_targets)
+            self.requested_at.update(dict.fromkeys(new_targets, time.monotonic()))
             
             # Emit initial status
             socketio.emit('download_started', {
@@ -78,99 +231,297 @@ class TorrentDownloader:
                 'name': self.info.name(),
                 'total_size': self.info.total_size(),
                 'total_pieces': total_pieces,
-                'downloading_pieces': num_pieces,
-                'piece_size': self.info.piece_length()
+                'downloading_pieces': len(self.target_pieces),
+                'known_pieces': len(self.known_pieces),
+                'piece_size': self.info.piece_length(),
+                'strategy': self.strategy.name,
+                'pick_mode': self.picker.mode,
+                'budget': budget.to_dict(),
+                'resumed': bool(resume_data)
+            })
+            
+            progress_emitter.update(self.download_id, {
+                'progress': 0.0,
+                'pieces_completed': 0,
+                'total_pieces': len(self.target_pieces) + len(self.known_pieces)
             })
             
             pieces_downloaded = set()
+            # A resumed job's stored verdicts count as scanned (see _resume_sample)
+            pieces_scanned = set(self.known_pieces) if resume_data else set()
             
-            while len(pieces_downloaded) < num_pieces and not self.stopped:
-                s = self.handle.status()
+            while not self.stopped:
+                sample_size = len(self.target_pieces) + len(self.known_pieces)
+                if len(pieces_scanned) >= sample_size:
+                    # First round done: spend whatever budget feedback didn't
+                    # use, then whatever the policy grants a suspicious sample
+                    if self.reserve <= 0:
+                        self.reserve += self.policy.extra_budget(budget_pieces)
+                    if self.reserve <= 0 or not self._fill_reserve(self.candidates):
+                        break
+                    continue
                 
-                state_str = [
-                    'queued', 'checking', 'downloading metadata',
-                    'downloading', 'finished', 'seeding', 'allocating',
-                    'checking fastresume', 'unknown'
-                ]
-                state_idx = min(s.state, len(state_str) - 1)
+                # Block until libtorrent reports something (swarm status is
+                # collected separately, see status_collector.py)
+                try:
+                    kind, value = self.events.get(timeout=PROGRESS_INTERVAL)
+                except queue.Empty:
+                    kind, value = None, None
                 
-                # Check for newly downloaded pieces
-                if s.has_metadata:
-                    for i in range(num_pieces):
-                        if self.handle.have_piece(i) and i not in pieces_downloaded:
-                            pieces_downloaded.add(i)
-                            
-                            # 🔬 HOOK FOR ML MALWARE DETECTION
-                            piece_hash = str(self.info.hash_for_piece(i))
-                            scan_result = self.scan_piece(i, piece_hash)
-                            
-                            socketio.emit('piece_downloaded', {
-                                'download_id': self.download_id,
-                                'piece_index': i,
-                                'piece_hash': piece_hash,
-                                'scan_result': scan_result,
-                                'progress': (len(pieces_downloaded) / num_pieces) * 100
-                            })
+                if kind == 'error':
+                    raise RuntimeError(value)
                 
-                # Emit progress update
-                progress_percent = (len(pieces_downloaded) / num_pieces) * 100
-                socketio.emit('download_progress', {
-                    'download_id': self.download_id,
-                    'progress': progress_percent,
-                    'state': state_str[state_idx],
-                    'peers': s.num_peers,
-                    'download_rate': s.download_rate,
-                    'pieces_completed': len(pieces_downloaded),
-                    'total_pieces': num_pieces
-                })
+                if kind == 'checked':
+                    # Pieces found on disk while checking never raise
+                    # piece_finished_alert, so pick them up once here
+                    for i in self.target_pieces - pieces_downloaded:
+                        if self.handle.have_piece(i):
+                            self.events.put(('piece', i))
                 
-                time.sleep(0.5)
+                if kind == 'piece' and value in self.target_pieces and value not in pieces_downloaded:
+                    pieces_downloaded.add(value)
+                    if value in self.requested_at:
+                        self.metrics.observe('piece_wait', time.monotonic() - self.requested_at.pop(value))
+                    piece_hash = piece_hash_hex(self.info, value)
+                    
+                    # Identical piece scanned since it was targeted (any torrent):
+                    # skip read and scan. _extend_sample() already counted its lookup
+                    cached = self.verdicts.get(piece_hash, self.scanner.version, count=False)
+                    if cached is not None:
+                        self.events.put(('scanned', (value, piece_hash, self._from_cache(value, cached))))
+                    else:
+                        # 🔬 HOOK FOR ML MALWARE DETECTION
+                        # Blocks here (backpressure) while the scanners are saturated
+                        self.pipeline.request(self.handle, self.download_id, value, piece_hash,
+                                              self.scan_pieces, self._on_scanned,
+                                              should_stop=lambda: self.stopped)
+                
+                if kind == 'scanned':
+                    piece_index, piece_hash, scan_result = value
+                    scan_result = dict(scan_result, files=self.files.describe(piece_index))
+                    pieces_scanned.add(piece_index)
+                    decision = self.policy.observe(piece_index, scan_result)
+                    self.file_verdicts.observe(piece_index, scan_result)
+                    self.results.record(self.download_id, str(self.info.info_hash()),
+                                        piece_index, piece_hash, scan_result)
+                    
+                    socketio.emit('piece_downloaded', {
+                        'download_id': self.download_id,
+                        'piece_index': piece_index,
+                        'piece_hash': piece_hash,
+                        'scan_result': scan_result,
+                        'progress': (len(pieces_scanned) / sample_size) * 100
+                    }, to=self.download_id)
+                    progress_emitter.update(self.download_id, {
+                        'progress': (len(pieces_scanned) / sample_size) * 100,
+                        'pieces_completed': len(pieces_scanned),
+                        'total_pieces': sample_size
+                    })
+                    
+                    if decision == 'stop':
+                        # Verdict is conclusive: free bandwidth and the session slot now
+                        self._abort_sample()
+                        break
+                    
+                    # Adaptive strategies may ask for more pieces around this one
+                    if self.reserve > 0:
+                        more = self.strategy.feedback(self.info, piece_index, scan_result)
+                        if more:
+                            self._fill_reserve(iter(more))
+            
+            # Sample complete: every piece has been read into memory, so
+            # the files can go now (unless SAMPLE_STORAGE=keep)
+            self._release_torrent()
             
+            verdict = dict(self.policy.verdict(), files=self.file_verdicts.report())
+            self.results.record_verdict(self.download_id, str(self.info.info_hash()),
+                                        dict(verdict, stopped=self.stopped, disk_bytes=self.disk_bytes))
             if not self.stopped:
+                socketio.emit('final_verdict', dict(verdict, download_id=self.download_id),
+                              to=self.download_id)
                 socketio.emit('download_complete', {
                     'download_id': self.download_id,
                     'pieces_downloaded': len(pieces_downloaded),
-                    'file_path': os.path.join(save_path, self.info.name())
-                })
+                    'bytes_downloaded': sum(self.info.piece_size(i) for i in pieces_downloaded),
+                    'early_exit': verdict['early_exit'],
+                    'disk_bytes': self.disk_bytes,
+                    # The file itself, or the torrent's folder for multi-file torrents
+                    'file_path': (None if self.storage.deletes_files
+                                  else os.path.join(self.save_path, self.info.name())),
+                    'files': [{
+                        'file_index': entry['file_index'],
+                        'path': (None if self.storage.deletes_files
+                                 else os.path.join(self.save_path, entry['path'])),
+                        'kind': entry['kind'],
+                        'verdict': entry['verdict']
+                    } for entry in verdict['files']]
+                }, to=self.download_id)
                 
             return {
                 'success': True,
                 'pieces_downloaded': len(pieces_downloaded),
-                'file_name': self.info.name()
+                'file_name': self.info.name(),
+                'disk_bytes': self.disk_bytes,
+                'signatures': self.signatures.stats(),
+                'verdict': verdict
             }
             
         except Exception as e:
             socketio.emit('download_error', {
                 'download_id': self.download_id,
                 'error': str(e)
-            })
+            }, to=self.download_id)
             return {'success': False, 'error': str(e)}
+        
+        finally:
+            # Free the buffer slots and the handle on the shared session
+            progress_emitter.finish(self.download_id)
+            status_collector.forget(self.download_id)
+            self.pipeline.cancel(self.download_id)
+            self._release_torrent()
+
+    def _release_torrent(self):
+        """
+        Remove the torrent from its session. Its files are measured first
+        (disk bytes per job, once the torrent exists) and removed with it
+        unless the sample storage mode is 'keep'. Safe to call before the
+        torrent is added (stop() on a starting job) and again afterwards.
+        """
+        with self.release_lock:
+            measure = self.handle is not None and not self.released
+            if measure:
+                self.released = True
+        
+        if measure:
+            self.disk_bytes = self.storage.release(self.download_id, self.info, self.save_path)
+        self.sessions.remove_torrent(self.download_id, delete_files=self.storage.deletes_files)
+        self.storage.cleanup(self.download_id)
 
-    def scan_piece(self, piece_index, piece_hash):
+    def _extend_sample(self, candidates, budget):
         """
-        🔬 MALWARE DETECTION HOOK
-        Your teammate will replace this with ML model
+        Pull pieces from the `candidates` iterator into the sample until
+        `budget` new pieces are to be downloaded. Pieces whose verdict is
+        already cached join the sample for free and their verdicts are
+        queued right away. Returns the newly targeted pieces.
         """
-        # Placeholder for ML scanner
-        # TODO: Integrate ML model here
-        # Example:
-        # piece_data = self.handle.read_piece(piece_index)
-        # features = extract_features(piece_data)
-        # prediction = ml_model.predict(features)
-        # return {'malicious': prediction, 'confidence': confidence}
+        version = self.scanner.version
+        new_targets = []
         
-        return {
-            'malicious': False,
-            'confidence': 0.0,
-            'scanner': 'placeholder',
-            'timestamp': datetime.now().isoformat()
-        }
+        while len(new_targets) < budget:
+            # Never pull more than still needed, so unused candidates stay
+            # in the iterator for a later _fill_reserve()
+            raw = list(itertools.islice(candidates, budget - len(new_targets)))
+            if not raw:
+                break  # candidates exhausted
+            
+            # dict.fromkeys: a strategy repeating a piece within one chunk
+            # must not spend the budget on it twice
+            chunk = [i for i in dict.fromkeys(raw)
+                     if i not in self.target_pieces and i not in self.known_pieces]
+            hashes = {i: piece_hash_hex(self.info, i) for i in chunk}
+            verdicts = self.verdicts.get_many(list(hashes.values()), version)
+            
+            for i in chunk:
+                if hashes[i] in verdicts:
+                    self.known_pieces[i] = hashes[i]
+                    self.events.put(('scanned', (i, hashes[i], self._from_cache(i, verdicts[hashes[i]]))))
+                else:
+                    self.target_pieces.add(i)
+                    new_targets.append(i)
+        
+        return new_targets
+
+    def _resume_sample(self, params):
+        """
+        Rebuild an interrupted job's sample: the pieces it had prioritized
+        (from the resume data), minus those whose results were stored before
+        the restart. Those keep their verdicts and are replayed into the
+        policy instead of being read and scanned again.
+        """
+        self.reserve = 0
+        self.known_pieces = {}
+        self.target_pieces = {i for i, p in enumerate(params.piece_priorities) if p > 0}
+        
+        for i, (piece_hash, scan_result) in self.results.scanned_pieces(self.download_id).items():
+            self.known_pieces[i] = piece_hash
+            self.target_pieces.discard(i)
+            self.policy.observe(i, scan_result)
+            self.file_verdicts.observe(i, scan_result)
+        
+        if self.policy.reason:
+            self.target_pieces = set()  # already conclusive before the restart
+        return sorted(self.target_pieces)
+
+    def _fill_reserve(self, candidates):
+        """Spend held-back budget on more candidates; True if the sample grew"""
+        before = len(self.target_pieces) + len(self.known_pieces)
+        new_targets = self._extend_sample(candidates, self.reserve)
+        self.reserve -= len(new_targets)
+        
+        self.picker.add(self.handle, new_targets)
+        for i in new_targets:
+            self.requested_at[i] = time.monotonic()
+            if self.handle.have_piece(i):
+                self.events.put(('piece', i))
+        
+        return len(self.target_pieces) + len(self.known_pieces) > before
+
+    def _abort_sample(self):
+        """Early exit: stop requesting pieces and release the handle"""
+        try:
+            self.picker.stop(self.handle, self.info.num_pieces())
+        except RuntimeError:
+            pass  # handle already gone
+        self.reserve = 0
+        self.pipeline.cancel(self.download_id)
+        self._release_torrent()
+
+    def _on_scanned(self, piece_index, piece_hash, scan_result):
+        """Pipeline callback (worker thread): hand the verdict to the download loop"""
+        if 'error' not in scan_result:
+            # The piece's own verdict is cached, with its boundary bytes (hex)
+            # so a cached piece still joins its neighbours; the joined matches
+            # belong to this torrent's layout and are not cached
+            verdict = dict(scan_result)
+            if 'boundary' in verdict:
+                verdict['boundary'] = [part.hex() for part in verdict['boundary']]
+            self.verdicts.put(piece_hash, self.scanner.version, verdict)
+        scan_result = self.signatures.feed(piece_index, scan_result)
+        self.events.put(('scanned', (piece_index, piece_hash, scan_result)))
+
+    def _from_cache(self, piece_index, verdict):
+        """A cached verdict as a scan result, fed to the signature streams like a fresh one"""
+        scan_result = dict(verdict, cached=True)
+        if 'boundary' in scan_result:
+            scan_result['boundary'] = [bytes.fromhex(part) for part in scan_result['boundary']]
+        return self.signatures.feed(piece_index, scan_result)
+
+    def scan_piece(self, piece_index, piece_hash, piece_data):
+        """
+        🔬 MALWARE DETECTION HOOK
+        The scanner itself is pluggable (SCANNER=module:factory, see scanners.py)
+        and runs in a process pool unless SCANNER_EXECUTOR=inline (see
+        scanner_executor.py).
+        """
+        return self.scan_pieces([(piece_index, piece_hash, piece_data)])[0]
+
+    def scan_pieces(self, pieces):
+        """
+        Batch form of scan_piece, called by PiecePipeline workers with a list
+        of (piece_index, piece_hash, piece_data) so features are extracted
+        for several pieces in one pass.
+        """
+        # Files starting in these pieces are classified by their magic bytes
+        # (file-types sampling spends the rest of the budget accordingly)
+        for piece_index, _, data in pieces:
+            self.files.sniff(piece_index, data)
+        return self.scanner.scan_batch(pieces)
 
     def stop(self):
         """Stop the download"""
         self.stopped = True
-        if self.handle:
-            self.session.remove_torrent(self.handle)
+        self._release_torrent()
+        self.events.put(('stopped', None))  # wake the download loop
 
 
 # ============= REST API ENDPOINTS =============
@@ -181,10 +532,61 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'active_downloads': len(active_downloads),
+        'sessions': get_session_manager().stats(),
+        'pipeline': get_piece_pipeline().stats(),
+        'scanner': get_scanner_executor().stats(),
+        'verdict_cache': get_verdict_cache().stats(),
+        'torrent_index': torrent_index.stats(),
+        'progress_emitter': progress_emitter.stats(),
+        'status_collector': status_collector.stats(),
+        'results_store': get_results_store().stats(),
+        'scheduler': get_scheduler().stats(),
+        'resume': get_resume_store().stats(),
+        'sample_storage': get_sample_storage().stats(),
         'timestamp': datetime.now().isoformat()
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text format: latency histograms, libtorrent counters, queues, caches"""
+    pipeline = get_piece_pipeline().stats()
+    verdicts = get_verdict_cache().stats()
+    scheduler = get_scheduler().stats()
+    scanner = get_scanner_executor().stats()
+    results = get_results_store().stats()
+    storage = get_sample_storage().stats()
+    
+    gauges = [
+        ('scanner_scheduler_queue_depth', 'Downloads waiting for an active slot', scheduler['queue_depth']),
+        ('scanner_scheduler_active', 'Downloads holding an active slot', scheduler['active']),
+        ('scanner_scheduler_oldest_queued_seconds', 'Age of the oldest queued download',
+         scheduler['oldest_queued_seconds']),
+        ('scanner_active_downloads', 'Downloads in progress', len(active_downloads)),
+        ('scanner_verdict_cache_hit_ratio', 'Verdict cache hits / lookups', verdicts['hit_ratio']),
+        ('scanner_results_pending', 'Scan results waiting for the writer thread', results['pending']),
+    ]
+    for stage in ('reading', 'queued', 'in_flight'):
+        gauges.append(('scanner_pipeline_pieces', 'Piece buffers per pipeline stage',
+                       pipeline[stage], {'stage': stage}))
+    
+    # Only ever increase (since the server started)
+    counters = [
+        ('scanner_verdict_cache_lookups_total', 'Verdict cache lookups by outcome',
+         verdicts['hits'], {'result': 'hit'}),
+        ('scanner_verdict_cache_lookups_total', 'Verdict cache lookups by outcome',
+         verdicts['misses'], {'result': 'miss'}),
+        ('scanner_sample_disk_bytes_total', 'Bytes sampled jobs put on disk (allocated blocks)',
+         storage['disk_bytes']),
+        ('scanner_sample_jobs_total', 'Sampling jobs whose files were accounted', storage['jobs']),
+    ]
+    for kind in ('scans', 'timeouts', 'crashes', 'restarts'):
+        counters.append(('scanner_executor_events_total', 'Scanner executor events by kind',
+                         scanner[kind], {'kind': kind}))
+    
+    return Response(get_metrics().render(gauges, counters), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/upload-torrent', methods=['POST'])
 def upload_torrent():
     """Upload .torrent file"""
@@ -199,25 +601,13 @@ def upload_torrent():
     if not file.filename.endswith('.torrent'):
         return jsonify({'error': 'File must be a .torrent file'}), 400
     
-    # Save the torrent file
-    filename = f"{hashlib.md5(file.filename.encode()).hexdigest()}.torrent"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    
-    # Parse torrent info
+    # Parse once and index by infohash; re-uploads return the existing entry
     try:
-        info = lt.torrent_info(filepath)
-        torrent_data = {
-            'torrent_id': filename.replace('.torrent', ''),
-            'name': info.name(),
-            'total_size': info.total_size(),
-            'total_pieces': info.num_pieces(),
-            'piece_size': info.piece_length(),
-            'file_path': filepath
-        }
+        torrent_data, created = torrent_index.add(file.read())
         
         return jsonify({
             'success': True,
+            'duplicate': not created,
             'torrent': torrent_data
         }), 200
         
@@ -225,6 +615,99 @@ def upload_torrent():
         return jsonify({'error': f'Invalid torrent file: {str(e)}'}), 400
 
 
+def schedule_download(download_id, torrent_info, job, resume_data=None, resume_started=None):
+    """
+    Queue a sampling job on the scheduler and return its queue position.
+    `job` is the JSON-friendly request; it stays in the resume store until
+    the job ends so a restarted server can run it again. Raises ValueError
+    for a bad strategy, policy or pick mode, QueueFull when the queue is at capacity,
+    TorrentBusy when another download already has the torrent.
+    """
+    # Sampling: strategy name or mix ('file-heads+tail') sharing one budget
+    strategy = create_strategy(job['strategy'])
+    budget = SamplingBudget(max_pieces=job['num_pieces'], max_bytes=job['max_bytes'])
+    
+    # Early-exit / budget-expansion thresholds (see policy.py)
+    policy = create_policy(job['policy'])
+    
+    # Per-download knobs of a performance preset (see presets.py)
+    preset = job.get('preset')
+    if preset:
+        get_preset(preset)
+    
+    # Priority-only or deadline (latency) piece picking (see piece_picker.py)
+    picker = create_picker(job.get('pick_mode'))
+    
+    # Create downloader instance
+    downloader = TorrentDownloader(download_id, policy=policy, picker=picker)
+    downloader.resume_started = resume_started
+    downloader.preset = preset
+    info_hash = str(torrent_info.info_hash())
+    with active_downloads_lock:
+        if info_hash in active_info_hashes:
+            raise TorrentBusy(active_info_hashes[info_hash])
+        active_downloads[download_id] = downloader
+        active_info_hashes[info_hash] = download_id
+    
+    # Runs on a scheduler worker once a slot is free
+    def download_job():
+        try:
+            if not downloader.stopped:
+                downloader.download_chunks_with_scan(
+                    torrent_info,
+                    DOWNLOAD_FOLDER,
+                    strategy=strategy,
+                    budget=budget,
+                    resume_data=resume_data
+                )
+        finally:
+            # Clean up
+            forget_download(download_id)
+            get_resume_store().remove(download_id)
+    
+    # Queue behind other jobs: higher priority first, submitters take turns
+    get_resume_store().save_job(download_id, job)
+    try:
+        return get_scheduler().submit(download_id, download_job,
+                                      submitter=job['submitter'], priority=job['priority'])
+    except QueueFull:
+        forget_download(download_id)
+        get_resume_store().remove(download_id)
+        raise
+
+
+def forget_download(download_id):
+    """Drop a download from the active set; returns its TorrentDownloader (or None)"""
+    with active_downloads_lock:
+        downloader = active_downloads.pop(download_id, None)
+        for info_hash, owner in list(active_info_hashes.items()):
+            if owner == download_id:
+                del active_info_hashes[info_hash]
+    return downloader
+
+
+def resume_jobs():
+    """Re-queue the jobs a previous run left unfinished; returns how many"""
+    store = get_resume_store()
+    started_at = time.time()
+    resumed = 0
+    
+    for download_id, job, resume_data in store.jobs():
+        torrent_info = torrent_index.get_info(job['torrent_id'])
+        if torrent_info is None:
+            store.remove(download_id)
+            continue
+        try:
+            schedule_download(download_id, torrent_info, job, resume_data=resume_data,
+                              resume_started=started_at)
+            resumed += 1
+        except (QueueFull, TorrentBusy, TypeError, ValueError) as e:
+            print(f"⚠ Could not resume download {download_id}: {e}")
+            store.remove(download_id)
+    
+    return resumed
+
+
 @app.route('/api/start-download', methods=['POST'])
 def start_download():
     """Start downloading torrent with chunk-level scanning"""
@@ -234,79 +717,98 @@ def start_download():
         return jsonify({'error': 'torrent_id required'}), 400
     
     torrent_id = data['torrent_id']
-    num_pieces = data.get('num_pieces', 10)  # Default to 10 pieces
     
-    torrent_file = os.path.join(UPLOAD_FOLDER, f"{torrent_id}.torrent")
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
     
-    if not os.path.exists(torrent_file):
+    job = {
+        'torrent_id': torrent_id,
+        # Default to 10 pieces, unless only a byte budget is given
+        'num_pieces': data.get('num_pieces', None if 'max_bytes' in data else 10),
+        'max_bytes': data.get('max_bytes'),
+        'strategy': data.get('strategy', 'first'),
+        'policy': data.get('policy'),
+        'preset': data.get('preset'),
+        'pick_mode': data.get('pick_mode'),
+        'priority': priority,
+        # Fairness key: the client's address, which it can't pick. A name from
+        # the body or a header would let one client take a turn per name
+        'submitter': request.remote_addr or 'anonymous'
+    }
+    
+    torrent_info = torrent_index.get_info(torrent_id)
+    
+    if torrent_info is None:
         return jsonify({'error': 'Torrent file not found'}), 404
     
     # Generate unique download ID
     download_id = hashlib.md5(f"{torrent_id}_{datetime.now().isoformat()}".encode()).hexdigest()
     
-    # Create downloader instance
-    downloader = TorrentDownloader(download_id)
-    active_downloads[download_id] = downloader
-    
-    # Start download in background thread
-    def download_thread():
-        result = downloader.download_chunks_with_scan(
-            torrent_file,
-            DOWNLOAD_FOLDER,
-            num_pieces
-        )
-        # Clean up
-        if download_id in active_downloads:
-            del active_downloads[download_id]
-    
-    thread = threading.Thread(target=download_thread, daemon=True)
-    thread.start()
+    try:
+        queue_position = schedule_download(download_id, torrent_info, job)
+    except QueueFull as e:
+        return jsonify({'error': f'Download queue is full: {e}'}), 503
+    except TorrentBusy as e:
+        # Same torrent already queued or sampling: point the client at that download
+        return jsonify({'error': str(e), 'download_id': e.download_id}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'success': True,
         'download_id': download_id,
-        'message': 'Download started'
+        'queue_position': queue_position,
+        'message': 'Download queued'
     }), 202
 
 
 @app.route('/api/download-status/<download_id>', methods=['GET'])
 def download_status(download_id):
-    """Get download status"""
-    if download_id not in active_downloads:
-        return jsonify({'error': 'Download not found'}), 404
-    
-    downloader = active_downloads[download_id]
+    """Get download status (from the collector's snapshot, never the handle)"""
+    status = status_collector.get(download_id)
     
-    if downloader.handle:
-        s = downloader.handle.status()
-        state_str = [
-            'queued', 'checking', 'downloading metadata',
-            'downloading', 'finished', 'seeding', 'allocating',
-            'checking fastresume', 'unknown'
-        ]
-        state_idx = min(s.state, len(state_str) - 1)
+    if status is None:
+        if download_id not in active_downloads:
+            return jsonify({'error': 'Download not found'}), 404
         
-        return jsonify({
-            'download_id': download_id,
-            'state': state_str[state_idx],
-            'progress': s.progress * 100,
-            'peers': s.num_peers,
-            'download_rate': s.download_rate,
-            'upload_rate': s.upload_rate
-        })
+        queue_position = get_scheduler().position(download_id)
+        if queue_position is not None:
+            return jsonify({'download_id': download_id, 'state': 'queued',
+                            'queue_position': queue_position, 'progress': 0.0})
+        return jsonify({'error': 'Download not active'}), 400
     
-    return jsonify({'error': 'Download not active'}), 400
+    if 'state' not in status:
+        return jsonify({'download_id': download_id, 'state': 'starting', 'progress': 0.0})
+    
+    return jsonify({
+        'download_id': download_id,
+        'state': status['state'],
+        'progress': status['progress'],
+        'peers': status['peers'],
+        'download_rate': status['download_rate'],
+        'upload_rate': status['upload_rate']
+    })
 
 
 @app.route('/api/stop-download/<download_id>', methods=['POST'])
 def stop_download(download_id):
     """Stop a download"""
-    if download_id not in active_downloads:
+    downloader = forget_download(download_id)
+    
+    if downloader is None:
         return jsonify({'error': 'Download not found'}), 404
     
-    downloader = active_downloads[download_id]
+    # Still waiting for a slot: just drop it from the queue
+    if get_scheduler().cancel(download_id):
+        get_resume_store().remove(download_id)
+        return jsonify({
+            'success': True,
+            'message': 'Queued download cancelled'
+        })
+    
     downloader.stop()
-    del active_downloads[download_id]
     
     return jsonify({
         'success': True,
@@ -314,31 +816,106 @@ def stop_download(download_id):
     })
 
 
+def _results_page(**filters):
+    """
+    One page of stored scan results. Query parameters:
+        limit      page size (default 100, max MAX_RESULTS_PAGE)
+        cursor     next_cursor from the previous page
+        malicious  'true' / 'false' to filter by verdict
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), MAX_RESULTS_PAGE)
+        cursor = int(request.args.get('cursor', 0))
+    except ValueError:
+        return None, None, (jsonify({'error': 'limit and cursor must be integers'}), 400)
+    
+    malicious = request.args.get('malicious')
+    if malicious is not None:
+        malicious = malicious.lower() in ('1', 'true', 'yes')
+    
+    results, next_cursor = get_results_store().query(
+        malicious=malicious, after=cursor, limit=limit, **filters
+    )
+    return results, next_cursor, None
+
+
 @app.route('/api/scan-results/<download_id>', methods=['GET'])
 def get_scan_results(download_id):
-    """Get malware scan results for a download"""
-    if download_id in scan_results:
-        return jsonify({
-            'download_id': download_id,
-            'results': scan_results[download_id]
-        })
+    """Get malware scan results for a download (paginated, see _results_page)"""
+    results, next_cursor, error = _results_page(download_id=download_id)
+    if error:
+        return error
+    
+    store = get_results_store()
+    verdict = store.get_verdict(download_id)
+    if not results and verdict is None and download_id not in active_downloads:
+        return jsonify({'error': 'No scan results found'}), 404
     
-    return jsonify({'error': 'No scan results found'}), 404
+    return jsonify({
+        'download_id': download_id,
+        'verdict': verdict,
+        'summary': store.summary(download_id),
+        'results': results,
+        'next_cursor': next_cursor
+    })
+
+
+@app.route('/api/scan-results', methods=['GET'])
+def search_scan_results():
+    """Search stored scan results by info_hash and/or piece_hash (paginated)"""
+    filters = {key: request.args[key] for key in ('info_hash', 'piece_hash') if key in request.args}
+    if not filters:
+        return jsonify({'error': 'info_hash or piece_hash required'}), 400
+    
+    results, next_cursor, error = _results_page(**filters)
+    if error:
+        return error
+    
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
+
+@app.route('/api/presets', methods=['GET'])
+def list_presets():
+    """Performance presets and the one the server runs with"""
+    return jsonify({
+        'current': get_session_manager().preset or 'default',
+        'presets': describe_presets()
+    })
+
+
+@app.route('/api/presets', methods=['POST'])
+def set_preset():
+    """Switch the whole server to a performance preset (applied with apply_settings)"""
+    data = request.json or {}
+    
+    try:
+        get_session_manager().apply_preset(data.get('preset'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'current': get_session_manager().preset})
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Verdict cache hit/miss counters"""
+    return jsonify({
+        'verdict_cache': get_verdict_cache().stats(),
+        'scanner_version': get_scanner_executor().version
+    })
+
+
+@app.route('/api/torrents', methods=['GET'])
+def list_torrents():
+    """List uploaded torrents (served from the index, never from disk)"""
+    return jsonify({'torrents': torrent_index.list()})
 
 
 @app.route('/api/downloads', methods=['GET'])
 def list_downloads():
-    """List all active downloads"""
-    downloads = []
-    for download_id, downloader in active_downloads.items():
-        if downloader.info:
-            downloads.append({
-                'download_id': download_id,
-                'name': downloader.info.name(),
-                'total_size': downloader.info.total_size()
-            })
-    
-    return jsonify({'downloads': downloads})
+    """List active downloads (from the status snapshot) and queued ones"""
+    downloads = [dict(status) for status in status_collector.snapshot().values()]
+    return jsonify({'downloads': downloads, 'queued': get_scheduler().queued_jobs()})
 
 
 # ============= WEBSOCKET EVENTS =============
@@ -351,25 +928,70 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    progress_emitter.disconnect(request.sid)
     print(f'Client disconnected: {request.sid}')
 
 
 @socketio.on('subscribe_download')
-def handle_subscribe(data):
-    """Client subscribes to download updates"""
+def handle_subscribe(data=None):
+    """
+    Client subscribes to download updates: piece/verdict events go to the
+    download's room, progress arrives in 'progress_batch' frames.
+    Optional 'interval' (seconds) slows this client's progress frames.
+    """
+    data = data if isinstance(data, dict) else {}
     download_id = data.get('download_id')
+    if not download_id:
+        emit('subscribe_error', {'error': 'download_id required'})
+        return
+    
+    join_room(download_id)
+    progress_emitter.subscribe(request.sid, download_id)
+    if data.get('interval') is not None:
+        handle_set_progress_interval(data)
     print(f'Client {request.sid} subscribed to download {download_id}')
 
 
+@socketio.on('unsubscribe_download')
+def handle_unsubscribe(data=None):
+    """Client stops receiving a download's updates"""
+    data = data if isinstance(data, dict) else {}
+    download_id = data.get('download_id')
+    if not download_id:
+        emit('subscribe_error', {'error': 'download_id required'})
+        return
+    
+    leave_room(download_id)
+    progress_emitter.unsubscribe(request.sid, download_id)
+
+
+@socketio.on('set_progress_interval')
+def handle_set_progress_interval(data=None):
+    """Per-client rate limit for progress frames (seconds between frames)"""
+    data = data if isinstance(data, dict) else {}
+    try:
+        progress_emitter.set_interval(request.sid, data.get('interval', PROGRESS_INTERVAL))
+    except (TypeError, ValueError):
+        emit('subscribe_error', {'error': 'interval must be a number of seconds'})
+
+
 # ============= RUN SERVER =============
 
 if __name__ == '__main__':
+    # Spawned scanner workers would run this script again (as __mp_main__)
+    # before their first scan: a second session and every background thread
+    # above. Without a main path they only import what they unpickle.
+    del sys.modules['__main__'].__file__
+    
     print("="*60)
     print("🚀 Torrent Malware Detection API Server")
     print("="*60)
     print(f"📁 Downloads: {DOWNLOAD_FOLDER}")
     print(f"📁 Uploads: {UPLOAD_FOLDER}")
     print("📡 WebSocket: Enabled for real-time updates")
+    print(f"🌐 Session profile: {get_session_manager().profile} (TORRENT_PROFILE)")
+    print(f"💾 Sample storage: {get_sample_storage().mode} (SAMPLE_STORAGE)")
+    print(f"⏱ Piece picking: {create_picker().mode} (PICK_MODE)")
     print("🔬 ML Integration: Ready (placeholder active)")
     print("="*60)
     print("\nAPI Endpoints:")
@@ -379,8 +1001,21 @@ if __name__ == '__main__':
     print("  GET  /api/download-status/<id>")
     print("  POST /api/stop-download/<id>")
     print("  GET  /api/scan-results/<id>")
+    print("  GET  /api/scan-results?info_hash=&piece_hash=")
+    print("  GET  /api/torrents")
     print("  GET  /api/downloads")
+    print("  GET  /api/cache-stats")
+    print("  GET  /metrics")
+    print("  GET  /api/presets")
+    print("  POST /api/presets")
+    resumed = resume_jobs()
+    if resumed:
+        print(f"\n♻ Resumed {resumed} unfinished download(s)")
+    
     print("\nStarting server on http://localhost:5000")
     print("="*60 + "\n")
     
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+    # Werkzeug's threaded server is the one async_mode='threading' runs on
+    # (see the SocketIO setup above); no debug reloader, it would start every
+    # background thread twice
+    socketio.run(app, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: batched NumPy feature extraction vs the per-piece paths.
+
+    python bench_features.py                       # 256 KB .. 16 MB, 8 pieces per batch
+    python bench_features.py --sizes 256K 1M --batch 16 --python
+
+Paths compared for each piece size:
+    batched     features.extract_features_batch over the whole batch
+    per-piece   features.extract_features called once per piece
+    python      pure-Python reference (only with --python; slow on big pieces)
+"""
+import argparse
+import json
+import math
+import os
+import time
+from collections import Counter
+
+from features import NGRAM_BUCKETS, extract_features, extract_features_batch
+
+
+def parse_size(text):
+    units = {'K': 1024, 'M': 1024 ** 2}
+    text = text.upper().rstrip('B')
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def python_features(data):
+    """Pure-Python equivalent of extract_features, piece by piece"""
+    counts = Counter(data)
+    length = max(len(data), 1)
+    entropy = -sum((c / length) * math.log2(c / length) for c in counts.values())
+    printable = sum(c for b, c in counts.items() if 0x20 <= b < 0x7f or b in (9, 10, 13)) / length
+    ngrams = Counter(((a * 33) ^ b) & (NGRAM_BUCKETS - 1) for a, b in zip(data, data[1:]))
+    return {'entropy': entropy, 'printable_ratio': printable, 'ngrams': ngrams}
+
+
+def make_pieces(size, count):
+    # Mix of random and text-like content so entropy varies between pieces
+    pieces = []
+    for i in range(count):
+        if i % 2:
+            pieces.append(os.urandom(size))
+        else:
+            pieces.append((b'MZ\x90\x00 This program cannot be run in DOS mode.\r\n' * (size // 48 + 1))[:size])
+    return pieces
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, batch, repeat, include_python):
+    results = []
+    for size in sizes:
+        pieces = make_pieces(size, batch)
+        total_mb = size * batch / (1024 ** 2)
+
+        paths = {
+            'batched': lambda: extract_features_batch(pieces),
+            'per-piece': lambda: [extract_features(p) for p in pieces],
+        }
+        if include_python:
+            paths['python'] = lambda: [python_features(p) for p in pieces]
+
+        row = {'piece_size': size, 'batch': batch}
+        for name, fn in paths.items():
+            seconds = timed(fn, repeat)
+            row[name] = {'seconds': round(seconds, 4), 'mb_per_s': round(total_mb / seconds, 1)}
+        row['speedup_vs_per_piece'] = round(row['per-piece']['seconds'] / row['batched']['seconds'], 2)
+        results.append(row)
+
+        line = f"{size / 1024:>8.0f} KB x {batch:<3}"
+        for name in paths:
+            line += f" | {name}: {row[name]['mb_per_s']:>8.1f} MB/s"
+        print(line)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark piece feature extraction')
+    parser.add_argument('--sizes', nargs='+', default=['256K', '1M', '4M', '16M'])
+    parser.add_argument('--batch', type=int, default=8, help='pieces per batch')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--python', action='store_true', help='include the pure-Python path')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🔬 Feature extraction benchmark")
+    print("="*60)
+    results = run([parse_size(s) for s in args.sizes], args.batch, args.repeat, args.python)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,130 @@
+"""
+Benchmark: handing piece buffers to scanner processes, pickled vs shared memory.
+
+    python bench_handoff.py                          # 1M, 4M and 16M pieces
+    python bench_handoff.py --sizes 16M --pieces 256 --workers 4 --json handoff.json
+
+Each configuration runs in a fresh process with a ProcessScannerExecutor
+(placeholder scanner), fed by --workers threads that call scan_batch()
+with batches of --batch pieces, the way PiecePipeline does:
+
+    pickle   SCANNER_SHM_BYTES=0: every piece is pickled to a worker
+    shared   pieces are copied once into a SharedPieceArena and workers
+             read them through memoryviews
+
+Reported: MB/s through the scanners, user-space copies per piece (executor
+counters), arena fallbacks, and peak RSS of the parent and of the
+largest worker (VmHWM; shared arena pages count towards whoever touched
+them).
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import threading
+import time
+
+from bench_features import parse_size
+
+
+def worker_peak_rss(pids):
+    """Largest VmHWM among the worker processes (Linux), in bytes"""
+    peak = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peak = max(peak, int(line.split()[1]) * 1024)
+        except OSError:
+            pass
+    return peak
+
+
+def run_one(piece_size, pieces, batch, workers, shm_bytes):
+    """One configuration, in its own process"""
+    from scanner_executor import ProcessScannerExecutor
+
+    executor = ProcessScannerExecutor(workers=workers, timeout=120, shm_bytes=shm_bytes)
+    executor.version  # start the workers before timing
+
+    # A handful of distinct buffers, reused: the payload itself doesn't matter
+    buffers = [os.urandom(piece_size) for _ in range(min(pieces, batch * workers))]
+    batches = [[(i + j, 'bench', buffers[(i + j) % len(buffers)]) for j in range(min(batch, pieces - i))]
+               for i in range(0, pieces, batch)]
+    todo = iter(batches)
+    todo_lock = threading.Lock()
+
+    def feed():
+        while True:
+            with todo_lock:
+                group = next(todo, None)
+            if group is None:
+                return
+            executor.scan_batch(group)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=feed) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = executor.stats()
+    worker_rss = worker_peak_rss(list((executor.pool._processes or {}).keys()))
+    executor.close()
+
+    return {
+        'mb_per_s': round(pieces * piece_size / 2**20 / elapsed, 1),
+        'copies_per_piece': stats['copies_per_piece'],
+        'pickled_pieces': stats['pickled_pieces'],
+        'shared_pieces': stats['shared_pieces'],
+        'parent_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'worker_peak_rss_mb': round(worker_rss / 2**20, 1),
+    }
+
+
+def run(sizes, pieces, batch, workers, shm_bytes):
+    spawn = multiprocessing.get_context('spawn')
+    results = {}
+    for piece_size in sizes:
+        for mode, arena in (('pickle', 0), ('shared', shm_bytes)):
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                row = pool.submit(run_one, piece_size, pieces, batch, workers, arena).result()
+            results.setdefault(piece_size, {})[mode] = row
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Piece handoff to scanner processes: pickle vs shared memory')
+    parser.add_argument('--sizes', nargs='+', default=['1M', '4M', '16M'], help='piece sizes')
+    parser.add_argument('--pieces', type=int, default=128, help='pieces per configuration (default 128)')
+    parser.add_argument('--batch', type=int, default=4, help='pieces per scan_batch call (default 4)')
+    parser.add_argument('--workers', type=int, default=2, help='scanner processes and feeder threads')
+    parser.add_argument('--shm', default='64M', help='shared arena size (default 64M)')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🧠 Piece handoff benchmark (pickle vs shared memory)")
+    print("="*60)
+
+    results = run([parse_size(s) for s in args.sizes], args.pieces, args.batch, args.workers,
+                  parse_size(args.shm))
+
+    print(f"\n{'piece':>7} {'mode':<7} {'MB/s':>8} {'copies/piece':>13} {'pickled':>8} "
+          f"{'parent RSS':>11} {'worker RSS':>11}")
+    for piece_size, modes in results.items():
+        for mode, row in modes.items():
+            print(f"{piece_size // 1024:>5} K {mode:<7} {row['mb_per_s']:>8.1f} {row['copies_per_piece']:>13.2f} "
+                  f"{row['pickled_pieces']:>8} {row['parent_peak_rss_mb']:>8.1f} MB {row['worker_peak_rss_mb']:>8.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'pieces': args.pieces, 'batch': args.batch, 'workers': args.workers,
+                       'shm_bytes': parse_size(args.shm),
+                       'results': {str(size): modes for size, modes in results.items()}}, f, indent=2)
+        print(f"\nResults written to {args.json}")
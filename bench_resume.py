@@ -0,0 +1,186 @@
+"""
+Benchmark: restart-to-resume time with and without fast-resume data.
+
+    python bench_resume.py
+    python bench_resume.py --size 512M --piece 1M --pieces 64 --repeat 5 --json resume.json
+
+A local seeder serves a synthetic torrent over loopback; a leecher
+downloads a sample of pieces into sparse files, saves its resume data
+through ResumeStore and drops its session (the "crash"). Each restart
+then opens a fresh session and times how long the torrent takes to be
+usable again (torrent_checked_alert):
+
+    resume    re-added from the stored resume data (what resume_jobs() does)
+    recheck   re-added from the .torrent alone: libtorrent hash-checks the
+              files already on disk
+
+Both must find every sampled piece again.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+
+import libtorrent as lt
+
+from bench_features import parse_size
+from resume_store import ResumeStore
+
+warnings.filterwarnings('ignore', category=DeprecationWarning)
+
+LOOPBACK_SETTINGS = {
+    'enable_dht': False,
+    'enable_lsd': False,
+    'enable_upnp': False,
+    'enable_natpmp': False,
+    'allow_multiple_connections_per_ip': True,
+    'alert_mask': lt.alert.category_t.status_notification | lt.alert.category_t.storage_notification
+}
+
+
+def make_torrent(root, size, piece_length):
+    """Random payload of `size` bytes under root, and its torrent_info"""
+    path = os.path.join(root, 'payload.bin')
+    with open(path, 'wb') as f:
+        for _ in range(0, size, 1 << 20):
+            f.write(os.urandom(min(1 << 20, size - f.tell())))
+
+    fs = lt.file_storage()
+    lt.add_files(fs, path)
+    creator = lt.create_torrent(fs, piece_length)
+    lt.set_piece_hashes(creator, root)
+    return lt.torrent_info(creator.generate())
+
+
+def new_session(port):
+    return lt.session(dict(LOOPBACK_SETTINGS, listen_interfaces=f'127.0.0.1:{port}'))
+
+
+def wait_for(session, alert_type, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not session.wait_for_alert(100):
+            continue
+        for alert in session.pop_alerts():
+            if isinstance(alert, alert_type):
+                return alert
+    raise TimeoutError(f'no {alert_type.__name__} within {timeout}s')
+
+
+def download_sample(info, save_path, sample, seed_port, port):
+    """Fetch `sample` pieces from the seeder, return encoded resume data"""
+    session = new_session(port)
+    priorities = [0] * info.num_pieces()
+    for i in sample:
+        priorities[i] = 7
+    handle = session.add_torrent({'ti': info, 'save_path': save_path,
+                                  'storage_mode': lt.storage_mode_t.storage_mode_sparse})
+    handle.prioritize_pieces(priorities)
+    handle.connect_peer(('127.0.0.1', seed_port))
+
+    deadline = time.time() + 120
+    while not all(handle.have_piece(i) for i in sample):
+        if time.time() > deadline:
+            raise TimeoutError('sample download did not finish')
+        session.wait_for_alert(100)
+        session.pop_alerts()
+
+    handle.save_resume_data()
+    alert = wait_for(session, lt.save_resume_data_alert)
+    resume_data = lt.write_resume_data_buf(alert.params)
+    session.remove_torrent(handle)
+    return resume_data
+
+
+def restart(info, save_path, sample, port, store=None, download_id=None):
+    """Fresh session; seconds until the torrent is checked, and pieces found"""
+    started = time.perf_counter()
+    session = new_session(port)
+
+    if store is not None:
+        _, _, resume_data = next(job for job in store.jobs() if job[0] == download_id)
+        params = lt.read_resume_data(resume_data)
+        params.ti = info
+        params.save_path = save_path
+    else:
+        params = {'ti': info, 'save_path': save_path}
+
+    handle = session.add_torrent(params)
+    wait_for(session, lt.torrent_checked_alert)
+    elapsed = time.perf_counter() - started
+
+    found = sum(1 for i in sample if handle.have_piece(i))
+    session.remove_torrent(handle)
+    return elapsed, found
+
+
+def run(size, piece_length, sample_size, repeat, port):
+    root = tempfile.mkdtemp(prefix='bench_resume_')
+    try:
+        seed_dir = os.path.join(root, 'seed')
+        leech_dir = os.path.join(root, 'leech')
+        os.makedirs(seed_dir)
+        info = make_torrent(seed_dir, size, piece_length)
+
+        seeder = new_session(port)
+        seeder.add_torrent({'ti': info, 'save_path': seed_dir, 'flags': lt.torrent_flags.seed_mode})
+
+        total = info.num_pieces()
+        sample = sorted({s * total // sample_size for s in range(min(sample_size, total))})
+        resume_data = download_sample(info, leech_dir, sample, port, port + 1)
+
+        store = ResumeStore(os.path.join(root, 'resume.db'))
+        store.save_job('bench', {'torrent_id': str(info.info_hash())})
+        store.save_resume_data('bench', resume_data)
+
+        results = {'resume': [], 'recheck': []}
+        for _ in range(repeat):
+            results['resume'].append(restart(info, leech_dir, sample, port + 2, store, 'bench'))
+            results['recheck'].append(restart(info, leech_dir, sample, port + 3))
+
+        return {
+            'size': size,
+            'piece_length': piece_length,
+            'sample_pieces': len(sample),
+            'resume_data_bytes': len(resume_data),
+            'modes': {
+                mode: {
+                    'seconds_min': round(min(t for t, _ in runs), 4),
+                    'seconds_avg': round(sum(t for t, _ in runs) / len(runs), 4),
+                    'pieces_found': min(found for _, found in runs)
+                } for mode, runs in results.items()
+            }
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Restart-to-resume time, fast-resume vs recheck')
+    parser.add_argument('--size', default='256M', help='torrent size (default 256M)')
+    parser.add_argument('--piece', default='1M', help='piece length (default 1M)')
+    parser.add_argument('--pieces', type=int, default=32, help='sampled pieces (default 32)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--port', type=int, default=17881, help='first of 4 loopback ports')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("♻ Restart-to-resume benchmark")
+    print("="*60)
+
+    result = run(parse_size(args.size), parse_size(args.piece), args.pieces, args.repeat, args.port)
+
+    print(f"Torrent: {result['size'] / 2**20:.0f} MB, {result['piece_length'] // 1024} KB pieces, "
+          f"{result['sample_pieces']} sampled, resume data {result['resume_data_bytes']} bytes")
+    for mode, row in result['modes'].items():
+        print(f"  {mode:<8} {row['seconds_avg'] * 1000:>9.1f} ms avg | {row['seconds_min'] * 1000:>9.1f} ms min | "
+              f"pieces found {row['pieces_found']}/{result['sample_pieces']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,315 @@
+"""
+Benchmark: sampling a synthetic torrent from local seeders over loopback.
+
+    python bench_swarm.py
+    python bench_swarm.py --size 512M --piece 1M --pieces 64 --seeders 3 --json swarm.json
+    python bench_swarm.py --presets default high-throughput low-latency low-memory
+    python bench_swarm.py --modes downloader --storage keep delete scratch
+    python bench_swarm.py --pick-modes priority latency --seeders 4 --seed-rate 8M
+
+Runs fully offline. A random payload is turned into a torrent, one or more
+seeder sessions ('offline' profile, seed mode) serve it on 127.0.0.1, and
+each run samples it with:
+
+    client       TorrentClient.download_chunks_only (download only)
+    downloader   api_server's TorrentDownloader (download, read, scan, policy)
+
+Every run happens in a fresh process, so peak RSS is that run's own and the
+verdict cache, results store and session start empty. Reported per run:
+time to first piece, sampled pieces/s and MB/s (from adding the torrent to
+the last sampled piece), and for the downloader time to first verdict and
+scan throughput (bytes scanned per second of scanner time). With
+--presets, each run's leecher uses that performance preset (presets.py);
+the seeders always run libtorrent defaults. With --storage, downloader runs
+are repeated per sample storage mode (sample_storage.py) and report the
+bytes each job put on disk. With --pick-modes, every run is repeated per
+piece pick mode (piece_picker.py): priority-only against deadlines in
+scan order; compare time to first verdict and time to the full sample
+(last sampled piece, or last verdict for the downloader). --seed-rate
+caps each seeder's upload so the swarm isn't faster than the scanner.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import libtorrent as lt
+
+from bench_features import parse_size
+from bench_resume import make_torrent
+from piece_picker import PICK_MODES
+from presets import PRESETS
+from session_profiles import create_session
+
+warnings.filterwarnings('ignore', category=DeprecationWarning)
+
+MODES = ('client', 'downloader')
+
+
+def start_seeders(info, seed_dir, count, base_port, upload_rate=0):
+    """
+    `count` loopback sessions seeding the payload, each uploading at most
+    `upload_rate` bytes/s (0: unlimited); returns them with their peer addresses
+    """
+    seeders, peers = [], []
+    for i in range(count):
+        session = create_session('offline', base_port + i)
+        if upload_rate:
+            # Loopback peers are in the unthrottled local peer class by default
+            everyone = lt.ip_filter()
+            everyone.add_rule('0.0.0.0', '255.255.255.255', 1 << lt.session.global_peer_class_id)
+            session.set_peer_class_filter(everyone)
+            session.apply_settings({'upload_rate_limit': upload_rate})
+        handle = session.add_torrent({'ti': info, 'save_path': seed_dir,
+                                      'flags': lt.torrent_flags.seed_mode})
+        deadline = time.time() + 30
+        while not handle.status().is_seeding:
+            if time.time() > deadline:
+                raise TimeoutError(f'seeder {i} did not start')
+            time.sleep(0.05)
+        seeders.append(session)
+        peers.append(('127.0.0.1', base_port + i))
+    return seeders, peers
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_client(config):
+    from torrentclient import TorrentClient
+    from sampling import create_strategy
+    from piece_picker import create_picker
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = TorrentClient(profile='offline', port=config['port'], preset=config['preset'])
+        piece_info, pieces = client.download_chunks_only(
+            config['torrent_path'], config['save_path'], num_pieces=config['pieces'],
+            strategy=create_strategy(config['strategy']), peers=config['peers'],
+            picker=create_picker(config['pick_mode']))
+
+    return {
+        'first_piece_seconds': piece_info['first_piece_seconds'],
+        'elapsed_seconds': piece_info['elapsed_seconds'],
+        'pieces': len(pieces),
+        'bytes': len(pieces) * piece_info['piece_length']
+    }
+
+
+def run_downloader(config):
+    # api_server builds its singletons from the environment on import
+    os.environ.update({
+        'TORRENT_PROFILE': 'offline',
+        'TORRENT_LISTEN_PORT': str(config['port']),
+        'TORRENT_PRESET': config['preset'],
+        'SAMPLE_STORAGE': config['storage'],
+        'SCRATCH_DIR': os.path.join(config['scratch_dir'], 'scratch'),
+        'RESULTS_DB_PATH': os.path.join(config['work_dir'], 'results.db'),
+        'RESUME_DB_PATH': os.path.join(config['work_dir'], 'resume.db'),
+        'VERDICT_CACHE_PATH': os.path.join(config['work_dir'], 'verdicts.db'),
+    })
+    os.chdir(config['work_dir'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        import api_server
+    from sampling import create_strategy
+    from piece_picker import create_picker
+
+    timings = {'first_piece': None, 'first_verdict': None, 'scan_seconds': 0.0, 'scan_bytes': 0}
+
+    class TimedDownloader(api_server.TorrentDownloader):
+        def on_piece_finished(self, piece_index):
+            timings['first_piece'] = timings['first_piece'] or time.time()
+            super().on_piece_finished(piece_index)
+
+        def scan_pieces(self, pieces):
+            started = time.perf_counter()
+            results = super().scan_pieces(pieces)
+            timings['scan_seconds'] += time.perf_counter() - started
+            timings['scan_bytes'] += sum(len(data) for _, _, data in pieces)
+            return results
+
+        def _on_scanned(self, piece_index, piece_hash, scan_result):
+            timings['first_verdict'] = timings['first_verdict'] or time.time()
+            super()._on_scanned(piece_index, piece_hash, scan_result)
+
+    info = lt.torrent_info(config['torrent_path'])
+    downloader = TimedDownloader('bench', picker=create_picker(config['pick_mode']))
+    started = time.time()
+    result = downloader.download_chunks_with_scan(
+        info, config['save_path'], num_pieces=config['pieces'],
+        strategy=create_strategy(config['strategy']), peers=config['peers'])
+    elapsed = time.time() - started
+    if not result['success']:
+        raise RuntimeError(result['error'])
+
+    return {
+        'first_piece_seconds': timings['first_piece'] and timings['first_piece'] - started,
+        'first_verdict_seconds': timings['first_verdict'] and timings['first_verdict'] - started,
+        'elapsed_seconds': elapsed,
+        'pieces': result['pieces_downloaded'],
+        'bytes': result['pieces_downloaded'] * info.piece_length(),
+        'scan_bytes': timings['scan_bytes'],
+        'disk_bytes': result['disk_bytes'],
+        'scan_mb_per_s': (timings['scan_bytes'] / 2**20 / timings['scan_seconds']
+                          if timings['scan_seconds'] else None)
+    }
+
+
+def run_one(mode, config):
+    """One run, in its own process (see run())"""
+    os.makedirs(config['save_path'], exist_ok=True)
+    row = run_client(config) if mode == 'client' else run_downloader(config)
+    row['pieces_per_s'] = row['pieces'] / row['elapsed_seconds']
+    row['mb_per_s'] = row['bytes'] / 2**20 / row['elapsed_seconds']
+    row['peak_rss_mb'] = peak_rss_bytes() / 2**20
+    return row
+
+
+def summarize(runs):
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(sum(values) / len(values), 4) if values else None
+    return summary
+
+
+def run(size, piece_length, sample_size, seeders, presets, modes, strategy, repeat, port,
+        storages=('keep',), pick_modes=('priority',), seed_rate=0, timeout=300):
+    root = tempfile.mkdtemp(prefix='bench_swarm_')
+    # Scratch mode wants tmpfs, like in production
+    scratch_root = tempfile.mkdtemp(prefix='bench_swarm_', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    sessions = []
+    try:
+        seed_dir = os.path.join(root, 'seed')
+        os.makedirs(seed_dir)
+        info = make_torrent(seed_dir, size, piece_length)
+        torrent_path = os.path.join(root, 'bench.torrent')
+        with open(torrent_path, 'wb') as f:
+            f.write(lt.bencode({'info': lt.bdecode(info.metadata())}))
+
+        sessions, peers = start_seeders(info, seed_dir, seeders, port, seed_rate)
+        leech_port = port + seeders
+
+        # Fresh interpreter per run: no shared caches, and RSS is the run's own
+        spawn = multiprocessing.get_context('spawn')
+        # (mode, label, storage): downloader runs once per storage mode
+        variants = [('client', 'client', 'keep')] if 'client' in modes else []
+        if 'downloader' in modes:
+            variants += [('downloader', 'downloader' if len(storages) == 1 else f'downloader/{storage}',
+                          storage) for storage in storages]
+
+        # ...and once per pick mode
+        if len(pick_modes) > 1:
+            variants = [(mode, f'{label}/{pick_mode}', storage, pick_mode)
+                        for pick_mode in pick_modes for mode, label, storage in variants]
+        else:
+            variants = [variant + (pick_modes[0],) for variant in variants]
+
+        results = {}
+        for preset in presets:
+            for mode, label, storage, pick_mode in variants:
+                runs = []
+                for n in range(repeat):
+                    work_dir = os.path.join(root, f'{preset}-{mode}-{storage}-{pick_mode}-{n}')
+                    config = {
+                        'storage': storage,
+                        'scratch_dir': scratch_root,
+                        'torrent_path': torrent_path,
+                        'save_path': os.path.join(work_dir, 'downloads'),
+                        'work_dir': work_dir,
+                        'pieces': sample_size,
+                        'strategy': strategy,
+                        'preset': preset,
+                        'pick_mode': pick_mode,
+                        'peers': peers,
+                        'port': leech_port,
+                    }
+                    with concurrent.futures.ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                        runs.append(pool.submit(run_one, mode, config).result(timeout=timeout))
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                    leech_port += 1  # never reuse a port still in TIME_WAIT
+                results.setdefault(preset, {})[label] = {'runs': runs, 'avg': summarize(runs)}
+
+        return {
+            'size': size,
+            'piece_length': piece_length,
+            'sample_pieces': min(sample_size, info.num_pieces()),
+            'seeders': seeders,
+            'seed_rate': seed_rate,
+            'strategy': strategy,
+            'repeat': repeat,
+            'libtorrent': lt.__version__,
+            'python': platform.python_version(),
+            'timestamp': time.time(),
+            'results': results
+        }
+    finally:
+        del sessions
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(scratch_root, ignore_errors=True)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:>8.1f} ms" if seconds is not None else f"{'-':>11}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Loopback swarm benchmark for sampled downloads')
+    parser.add_argument('--size', default='256M', help='torrent size (default 256M)')
+    parser.add_argument('--piece', default='1M', help='piece length (default 1M)')
+    parser.add_argument('--pieces', type=int, default=32, help='sampled pieces (default 32)')
+    parser.add_argument('--seeders', type=int, default=2, help='local seeder sessions (default 2)')
+    parser.add_argument('--presets', nargs='+', default=['default'], choices=sorted(PRESETS),
+                        help='leecher performance presets to compare (default: default)')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--strategy', default='first', help='sampling strategy (default first)')
+    parser.add_argument('--storage', nargs='+', default=['keep'], choices=('keep', 'delete', 'scratch'),
+                        help='sample storage modes for downloader runs (default keep)')
+    parser.add_argument('--pick-modes', nargs='+', default=['priority'], choices=PICK_MODES,
+                        help='piece pick modes to compare (default priority)')
+    parser.add_argument('--seed-rate', default='0', help='upload limit per seeder, e.g. 8M (default unlimited)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--port', type=int, default=18881, help='first loopback port')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("🐝 Loopback swarm benchmark")
+    print("="*60)
+
+    result = run(parse_size(args.size), parse_size(args.piece), args.pieces, args.seeders,
+                 args.presets, args.modes, args.strategy, args.repeat, args.port, args.storage,
+                 args.pick_modes, parse_size(args.seed_rate))
+
+    rate = f" at {result['seed_rate'] / 2**20:.1f} MB/s" if result['seed_rate'] else ''
+    print(f"Torrent: {result['size'] / 2**20:.0f} MB, {result['piece_length'] // 1024} KB pieces, "
+          f"{result['sample_pieces']} sampled ({result['strategy']}), {result['seeders']} seeder(s){rate}, "
+          f"{result['repeat']} run(s) each\n")
+    print(f"{'preset':<16} {'mode':<26} {'1st piece':>11} {'1st verdict':>11} {'full sample':>11} "
+          f"{'pieces/s':>9} {'MB/s':>8} {'scan MB/s':>10} {'peak RSS':>9} {'disk/job':>10}")
+    for preset, modes in result['results'].items():
+        for mode, row in modes.items():
+            avg = row['avg']
+            scan = f"{avg['scan_mb_per_s']:>10.1f}" if avg.get('scan_mb_per_s') else f"{'-':>10}"
+            disk = (f"{avg['disk_bytes'] / 2**20:>7.1f} MB" if avg.get('disk_bytes') is not None
+                    else f"{'-':>10}")
+            print(f"{preset:<16} {mode:<26} {_ms(avg['first_piece_seconds'])} "
+                  f"{_ms(avg.get('first_verdict_seconds'))} {_ms(avg['elapsed_seconds'])} {avg['pieces_per_s']:>9.1f} "
+                  f"{avg['mb_per_s']:>8.1f} {scan} {avg['peak_rss_mb']:>6.0f} MB {disk}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+# Bigram counts are hashed into this many buckets (power of two)
+NGRAM_BUCKETS = 1024
+
+# Printable ASCII plus tab, newline and carriage return
+PRINTABLE = np.zeros(256, dtype=bool)
+PRINTABLE[0x20:0x7f] = True
+PRINTABLE[[0x09, 0x0a, 0x0d]] = True
+
+# A little-endian uint16 read of bytes (a, b) is a | b << 8; map each of the
+# 65536 pair codes to its n-gram bucket
+_PAIR_CODES = np.arange(65536)
+_PAIR_BUCKETS = (((_PAIR_CODES & 0xff) * 33) ^ (_PAIR_CODES >> 8)) & (NGRAM_BUCKETS - 1)
+
+
+def as_array(buffer):
+    """Zero-copy uint8 view of a piece buffer (bytes, bytearray, memoryview, ndarray)"""
+    if isinstance(buffer, np.ndarray):
+        return np.ascontiguousarray(buffer).reshape(-1).view(np.uint8)
+    return np.frombuffer(buffer, dtype=np.uint8)
+
+
+def _pair_counts(view, odd):
+    """Counts of the 65536 byte pairs starting at even (or odd) offsets"""
+    start = 1 if odd else 0
+    usable = (view.size - start) & ~1
+    if usable <= 0:
+        return np.zeros(65536, dtype=np.int64)
+    # Reinterpret the piece as uint16 in place: no copy of the buffer
+    return np.bincount(view[start:start + usable].view('<u2'), minlength=65536)
+
+
+def extract_features_batch(buffers, ngrams=True):
+    """
+    Compute scanner features for many pieces at once.
+
+    Buffers are wrapped as NumPy views and read in place as uint16 byte
+    pairs, never copied. Each piece is reduced to its byte histogram and
+    n-gram buckets while its pair counts are still in cache; entropy and
+    printable ratio are then computed for the whole batch at once on the
+    stacked (n, 256) histogram matrix.
+
+    Returns a dict of arrays with one row per piece:
+        length           (n,)        bytes in the piece
+        histogram        (n, 256)    byte counts
+        entropy          (n,)        Shannon entropy, bits per byte (0-8)
+        printable_ratio  (n,)        share of printable ASCII bytes
+        ngrams           (n, NGRAM_BUCKETS)  hashed bigram counts
+    """
+    views = [as_array(buffer) for buffer in buffers]
+    n = len(views)
+
+    lengths = np.fromiter((view.size for view in views), dtype=np.int64, count=n)
+    histogram = np.empty((n, 256), dtype=np.int64)
+    ngram_counts = np.zeros((n, NGRAM_BUCKETS), dtype=np.int64) if ngrams else None
+
+    for row, view in enumerate(views):
+        pairs = _pair_counts(view, odd=False)
+
+        # Even-offset pairs cover every byte except the last one of an
+        # odd-length piece: rows of the (b, a) matrix give the second byte,
+        # columns the first
+        square = pairs.reshape(256, 256)
+        histogram[row] = square.sum(axis=0) + square.sum(axis=1)
+        if view.size % 2:
+            histogram[row, view[-1]] += 1
+
+        if ngrams:
+            # Add the odd-offset pairs so every overlapping bigram is counted once
+            pairs += _pair_counts(view, odd=True)
+            ngram_counts[row] = np.bincount(_PAIR_BUCKETS, weights=pairs, minlength=NGRAM_BUCKETS)
+
+    safe_lengths = np.maximum(lengths, 1)[:, None]
+    probabilities = histogram / safe_lengths
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_p = np.where(probabilities > 0, np.log2(probabilities), 0.0)
+    entropy = 0.0 - (probabilities * log_p).sum(axis=1)  # 0.0 - avoids -0.0
+
+    printable_ratio = histogram[:, PRINTABLE].sum(axis=1) / safe_lengths[:, 0]
+
+    features = {
+        'length': lengths,
+        'histogram': histogram,
+        'entropy': entropy,
+        'printable_ratio': printable_ratio
+    }
+
+    if ngrams:
+        features['ngrams'] = ngram_counts
+
+    return features
+
+
+def extract_features(buffer, ngrams=True):
+    """Single-piece convenience wrapper around extract_features_batch"""
+    batch = extract_features_batch([buffer], ngrams=ngrams)
+    return {name: values[0] for name, values in batch.items()}
+
+
+def summarize(features, row):
+    """JSON-friendly summary of one piece's features for scan results"""
+    return {
+        'entropy': round(float(features['entropy'][row]), 4),
+        'printable_ratio': round(float(features['printable_ratio'][row]), 4)
+    }
@@ -0,0 +1,264 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+
+
+# File kinds, most worth scanning first. Pad files get no kind: they are
+# never sampled.
+KINDS = ('executable', 'archive', 'document', 'other', 'media')
+KIND_PRIORITY = {kind: rank for rank, kind in enumerate(KINDS)}
+
+EXTENSIONS = {
+    'executable': ('.exe', '.dll', '.scr', '.sys', '.msi', '.com', '.cpl', '.ocx', '.elf', '.so',
+                   '.dylib', '.bin', '.apk', '.jar', '.bat', '.cmd', '.ps1', '.vbs', '.vbe', '.js',
+                   '.jse', '.wsf', '.hta', '.lnk', '.sh', '.py', '.appimage', '.deb', '.rpm'),
+    'archive': ('.zip', '.rar', '.7z', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.tar', '.cab', '.iso',
+                '.img', '.dmg', '.vhd', '.vhdx', '.wim'),
+    'document': ('.pdf', '.doc', '.docx', '.docm', '.xls', '.xlsx', '.xlsm', '.ppt', '.pptx', '.pptm',
+                 '.rtf', '.odt', '.ods', '.one', '.chm'),
+    'media': ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.webm', '.m4v', '.mpg', '.mpeg', '.ts',
+              '.mp3', '.flac', '.ogg', '.wav', '.m4a', '.aac', '.opus', '.jpg', '.jpeg', '.png',
+              '.gif', '.bmp', '.webp', '.srt', '.sub'),
+}
+_EXTENSION_KINDS = {ext: kind for kind, extensions in EXTENSIONS.items() for ext in extensions}
+
+# (offset, magic bytes, kind), checked against the first bytes of a file
+MAGIC = (
+    (0, b'MZ', 'executable'),
+    (0, b'\x7fELF', 'executable'),
+    (0, b'\xcf\xfa\xed\xfe', 'executable'),  # Mach-O 64
+    (0, b'\xca\xfe\xba\xbe', 'executable'),  # Mach-O universal / Java class
+    (0, b'#!', 'executable'),
+    (0, b'PK\x03\x04', 'archive'),
+    (0, b'Rar!\x1a\x07', 'archive'),
+    (0, b'7z\xbc\xaf\x27\x1c', 'archive'),
+    (0, b'\x1f\x8b', 'archive'),
+    (0, b'MSCF', 'archive'),
+    (0, b'\xfd7zXZ\x00', 'archive'),
+    (0x8001, b'CD001', 'archive'),  # ISO 9660
+    (0, b'%PDF', 'document'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'document'),  # OLE (doc, xls, msi)
+    (0, b'{\\rtf', 'document'),
+    (0, b'\x1a\x45\xdf\xa3', 'media'),  # Matroska / WebM
+    (4, b'ftyp', 'media'),
+    (0, b'RIFF', 'media'),
+    (0, b'ID3', 'media'),
+    (0, b'fLaC', 'media'),
+    (0, b'OggS', 'media'),
+    (0, b'\xff\xd8\xff', 'media'),
+    (0, b'\x89PNG', 'media'),
+)
+
+# Bytes of a file's start sniff() wants to see
+SNIFF_BYTES = max(offset + len(magic) for offset, magic, _ in MAGIC)
+
+
+def kind_from_name(path):
+    return _EXTENSION_KINDS.get(os.path.splitext(path)[1].lower(), 'other')
+
+
+def kind_from_magic(head):
+    """File kind from its first bytes, or None if no magic matches"""
+    for offset, magic, kind in MAGIC:
+        if bytes(head[offset:offset + len(magic)]) == magic:
+            return kind
+    return None
+
+
+class FileIndex:
+    """
+    Piece -> file byte ranges for one torrent, built once from
+    torrent_info.files(). Pad files (BEP 47) are left out: their bytes
+    are zeros no file contains.
+
+    Every file has a kind: from its extension at first, then from its
+    magic bytes once its first piece has been read (sniff()). A file keeps
+    the more dangerous of the two, so a "video.mp4" starting with MZ is
+    an executable while "setup.exe" stays one whatever its header says.
+    """
+
+    def __init__(self, info):
+        storage = info.files()
+        self.piece_length = info.piece_length()
+        self.num_pieces = info.num_pieces()
+        self.total_size = info.total_size()
+        self.paths = [storage.file_path(i) for i in range(storage.num_files())]
+        self.sizes = [storage.file_size(i) for i in range(storage.num_files())]
+        self.offsets = [storage.file_offset(i) for i in range(storage.num_files())]
+        self.pad = [bool(storage.file_flags(i) & storage.flag_pad_file) for i in range(storage.num_files())]
+        self.kinds = [None if pad else kind_from_name(path) for path, pad in zip(self.paths, self.pad)]
+        self.sniffed = [False] * len(self.paths)
+
+    @property
+    def num_files(self):
+        return len(self.paths)
+
+    def piece_size(self, piece_index):
+        if piece_index == self.num_pieces - 1:
+            return self.total_size - piece_index * self.piece_length
+        return self.piece_length
+
+    def segments(self, piece_index):
+        """
+        The piece's bytes as [(file_index, file_offset, piece_offset, length)],
+        in piece order (the same ranges as torrent_info.map_block())
+        """
+        start = piece_index * self.piece_length
+        end = start + self.piece_size(piece_index)
+        segments = []
+        i = bisect.bisect_right(self.offsets, start) - 1
+        while i < len(self.offsets) and self.offsets[i] < end:
+            file_start = self.offsets[i]
+            file_end = file_start + self.sizes[i]
+            lo, hi = max(start, file_start), min(end, file_end)
+            if hi > lo and not self.pad[i]:
+                segments.append((i, lo - file_start, lo - start, hi - lo))
+            i += 1
+        return segments
+
+    def continues_after(self, file_index, file_offset, length):
+        """Whether a file has bytes past the segment [file_offset, file_offset + length)"""
+        return file_offset + length < self.sizes[file_index]
+
+    def pieces(self, file_index):
+        """range of the pieces holding a file's bytes (empty for empty files)"""
+        if self.sizes[file_index] == 0:
+            return range(0)
+        first = self.offsets[file_index] // self.piece_length
+        last = (self.offsets[file_index] + self.sizes[file_index] - 1) // self.piece_length
+        return range(first, last + 1)
+
+    def by_priority(self):
+        """Non-empty, non-pad files, most important kind first (then torrent order)"""
+        files = [i for i in range(self.num_files) if self.sizes[i] and not self.pad[i]]
+        return sorted(files, key=lambda i: KIND_PRIORITY[self.kinds[i]])
+
+    def sniff(self, piece_index, data):
+        """
+        Classify the files starting in a piece by their magic bytes.
+        Returns the indexes of files whose kind went up.
+        """
+        promoted = []
+        for file_index, file_offset, piece_offset, length in self.segments(piece_index):
+            if file_offset != 0 or self.sniffed[file_index]:
+                continue
+            self.sniffed[file_index] = True
+            kind = kind_from_magic(data[piece_offset:piece_offset + min(length, SNIFF_BYTES)])
+            if kind and KIND_PRIORITY[kind] < KIND_PRIORITY[self.kinds[file_index]]:
+                self.kinds[file_index] = kind
+                promoted.append(file_index)
+        return promoted
+
+    def describe(self, piece_index):
+        """JSON-friendly file ranges of a piece, for its scan result"""
+        return [{'file_index': file_index, 'path': self.paths[file_index],
+                 'kind': self.kinds[file_index], 'file_offset': file_offset, 'length': length}
+                for file_index, file_offset, _, length in self.segments(piece_index)]
+
+    def file_record(self, file_index):
+        return {'file_index': file_index, 'path': self.paths[file_index],
+                'size': self.sizes[file_index], 'kind': self.kinds[file_index]}
+
+
+class FileVerdicts:
+    """
+    Scan results of a download aggregated per file.
+
+    A piece counts for every file it overlaps. Signature hits carry their
+    file (see signatures.py) and only flag that file; a detection without
+    located hits (a model scoring the whole piece) flags every file in the
+    piece. Verdicts use the policy's thresholds (policy.POLICY_DEFAULTS).
+    """
+
+    def __init__(self, files, settings):
+        self.files = files
+        self.settings = settings
+        self.stats = {}  # file_index -> running totals
+
+    def _file(self, file_index):
+        stats = self.stats.get(file_index)
+        if stats is None:
+            stats = self.stats[file_index] = {
+                'pieces_scanned': 0, 'bytes_scanned': 0, 'scan_errors': 0,
+                'flagged_pieces': [], 'max_confidence': 0.0, 'signatures': []
+            }
+        return stats
+
+    def observe(self, piece_index, scan_result):
+        segments = self.files.segments(piece_index)
+        error = 'error' in scan_result
+        for file_index, _, _, length in segments:
+            stats = self._file(file_index)
+            if error:
+                stats['scan_errors'] += 1
+                continue
+            stats['pieces_scanned'] += 1
+            stats['bytes_scanned'] += length
+        if error:
+            return
+
+        confidence = float(scan_result.get('confidence') or 0.0)
+        located = [hit for hit in scan_result.get('signatures') or [] if 'file_index' in hit]
+        if located:
+            confidences = {}
+            for hit in located:
+                file_index = hit['file_index']
+                confidences[file_index] = max(confidences.get(file_index, 0.0),
+                                              float(hit.get('confidence', confidence)))
+                stats = self._file(file_index)
+                if hit['rule'] not in stats['signatures']:
+                    stats['signatures'].append(hit['rule'])
+        else:
+            confidences = {file_index: confidence for file_index, _, _, _ in segments}
+
+        for file_index, file_confidence in confidences.items():
+            stats = self._file(file_index)
+            stats['max_confidence'] = max(stats['max_confidence'], file_confidence)
+            # Only the file holding the piece's strongest evidence is flagged
+            if (scan_result.get('malicious') and file_confidence >= confidence
+                    and piece_index not in stats['flagged_pieces']):
+                stats['flagged_pieces'].append(piece_index)
+
+    def verdict(self, stats):
+        if stats['flagged_pieces']:
+            confident = stats['max_confidence'] >= self.settings['malicious_confidence']
+            return 'malicious' if confident else 'suspicious'
+        if stats['max_confidence'] >= self.settings['suspicious_confidence']:
+            return 'suspicious'
+        if stats['pieces_scanned']:
+            return 'clean'
+        return 'inconclusive'
+
+    def report(self):
+        """Per-file verdicts of the files the sample touched, most important first"""
+        files = []
+        for file_index in sorted(self.stats, key=lambda i: (KIND_PRIORITY[self.files.kinds[i]], i)):
+            stats = self.stats[file_index]
+            size = self.files.sizes[file_index]
+            record = dict(self.files.file_record(file_index), **stats)
+            record.update(verdict=self.verdict(stats), max_confidence=round(stats['max_confidence'], 4),
+                          coverage=round(min(1.0, stats['bytes_scanned'] / size), 4) if size else 1.0)
+            files.append(record)
+        return files
+
+
+_file_indexes = OrderedDict()
+_file_indexes_lock = threading.Lock()
+
+
+def get_file_index(info, max_cached=64):
+    """
+    The FileIndex of a torrent, built once per infohash and kept in a small
+    LRU, so a sampling strategy and the download sharing a torrent (and
+    later jobs on it) see the same file kinds
+    """
+    key = str(info.info_hash())
+    with _file_indexes_lock:
+        files = _file_indexes.get(key)
+        if files is None:
+            files = _file_indexes[key] = FileIndex(info)
+        _file_indexes.move_to_end(key)
+        while len(_file_indexes) > max_cached:
+            _file_indexes.popitem(last=False)
+        return files
@@ -0,0 +1,321 @@
+"""
+Load test for api_server.py: REST latency percentiles and Socket.IO event lag.
+
+    python load_test.py --serve                          # own offline server on 127.0.0.1:5055
+    python load_test.py --serve --jobs 300 --pollers 100 --subscribers 100 --duration 60
+    python load_test.py --url http://127.0.0.1:5000 --json run.json
+    python load_test.py --serve --baseline run.json      # exit 1 on a p95/p99 regression
+
+Phases, all driven from one asyncio loop (aiohttp for REST,
+socketio.AsyncClient for WebSockets):
+
+    setup     upload --jobs synthetic torrents (metadata only, unique
+              infohashes) and start a download for each
+    steady    for --duration seconds: --pollers tasks hit download-status,
+              /api/downloads and /api/health; --subscribers Socket.IO
+              clients keep subscribing to random downloads
+    teardown  stop every download
+
+The synthetic torrents have no peers, so with --serve (TORRENT_PROFILE=
+offline, SCHEDULER_MAX_ACTIVE=--jobs) every job stays active for the whole
+run: hundreds of live torrents in the session, the status snapshot and the
+progress emitter. Event lag is the time from a progress_batch frame's
+server timestamp ('t') to its arrival; each (re)subscription gets a full
+frame on the next tick, so churning subscriptions keeps frames flowing.
+
+With --baseline (the --json output of an earlier run), p95/p99 of every
+endpoint and of event lag are compared with the baseline; anything more
+than --tolerance slower (and at least --min-delta ms slower) is reported
+and the exit status is 1.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import aiohttp
+import libtorrent as lt
+import socketio
+
+from bench_sampling import synthetic_torrent
+
+warnings.filterwarnings('ignore', category=DeprecationWarning)
+
+# Server started by --serve: api_server's app on its own port, from a scratch directory
+SERVE_CODE = (
+    "import api_server; "
+    "api_server.socketio.run(api_server.app, host='127.0.0.1', port={port}, log_output=False, "
+    "allow_unsafe_werkzeug=True)"
+)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def distribution(samples):
+    """Count and p50/p95/p99/max in milliseconds"""
+    values = sorted(samples)
+    return {
+        'count': len(values),
+        'p50_ms': _ms(percentile(values, 50)),
+        'p95_ms': _ms(percentile(values, 95)),
+        'p99_ms': _ms(percentile(values, 99)),
+        'max_ms': _ms(values[-1] if values else None),
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+class LoadTest:
+    def __init__(self, url, jobs, concurrency, pollers, subscribers, duration):
+        self.url = url.rstrip('/')
+        self.jobs = jobs
+        self.concurrency = concurrency
+        self.pollers = pollers
+        self.subscribers = subscribers
+        self.duration = duration
+        self.latencies = {}   # endpoint label -> [seconds]
+        self.errors = {}      # endpoint label -> count
+        self.lags = []        # seconds, progress_batch 't' -> arrival
+        self.frames = 0
+        self.download_ids = []
+
+    async def request(self, http, method, path, label, **kwargs):
+        """Timed request; returns the JSON body (None on error)"""
+        started = time.perf_counter()
+        try:
+            async with http.request(method, self.url + path, **kwargs) as response:
+                body = await response.json()
+                ok = response.status < 500 and response.status != 404
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            body, ok = None, False
+        self.latencies.setdefault(label, []).append(time.perf_counter() - started)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return body
+
+    # ----- setup / teardown -----
+
+    async def start_job(self, http, gate, n):
+        info = synthetic_torrent([(f'load-{n}-{os.getpid()}-{time.time_ns()}/payload.bin', 64 * 2**20)],
+                                 piece_length=2**20)
+        torrent = lt.bencode({'info': lt.bdecode(info.metadata())})
+        async with gate:
+            form = aiohttp.FormData()
+            form.add_field('file', torrent, filename=f'load-{n}.torrent')
+            body = await self.request(http, 'POST', '/api/upload-torrent', 'POST /api/upload-torrent',
+                                      data=form)
+            if not body or not body.get('success'):
+                return
+            body = await self.request(http, 'POST', '/api/start-download', 'POST /api/start-download',
+                                      json={'torrent_id': body['torrent']['torrent_id'],
+                                            'num_pieces': 8})
+            if body and body.get('success'):
+                self.download_ids.append(body['download_id'])
+
+    async def stop_job(self, http, gate, download_id):
+        async with gate:
+            await self.request(http, 'POST', f'/api/stop-download/{download_id}',
+                               'POST /api/stop-download/<id>')
+
+    # ----- steady state -----
+
+    async def poller(self, http, deadline):
+        while time.time() < deadline:
+            roll = random.random()
+            if roll < 0.8:
+                await self.request(http, 'GET', f'/api/download-status/{random.choice(self.download_ids)}',
+                                   'GET /api/download-status/<id>')
+            elif roll < 0.95:
+                await self.request(http, 'GET', '/api/downloads', 'GET /api/downloads')
+            else:
+                await self.request(http, 'GET', '/api/health', 'GET /api/health')
+
+    async def subscriber(self, deadline):
+        sio = socketio.AsyncClient(reconnection=False)
+        frame_arrived = asyncio.Event()
+
+        @sio.on('progress_batch')
+        async def on_progress(frame):
+            self.lags.append(max(0.0, time.time() - frame['t']))
+            self.frames += 1
+            frame_arrived.set()
+
+        try:
+            await sio.connect(self.url, transports=['websocket'])
+        except socketio.exceptions.ConnectionError:
+            self.errors['socket.io connect'] = self.errors.get('socket.io connect', 0) + 1
+            return
+
+        try:
+            while time.time() < deadline:
+                download_id = random.choice(self.download_ids)
+                frame_arrived.clear()
+                await sio.emit('subscribe_download', {'download_id': download_id})
+                try:
+                    await asyncio.wait_for(frame_arrived.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    self.errors['progress_batch'] = self.errors.get('progress_batch', 0) + 1
+                await sio.emit('unsubscribe_download', {'download_id': download_id})
+        finally:
+            await sio.disconnect()
+
+    # ----- run -----
+
+    async def run(self):
+        gate = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=self.concurrency + self.pollers)
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+            started = time.time()
+            await asyncio.gather(*(self.start_job(http, gate, n) for n in range(self.jobs)))
+            setup_seconds = time.time() - started
+            if not self.download_ids:
+                raise RuntimeError(f'no download could be started on {self.url}')
+            print(f"  setup: {len(self.download_ids)}/{self.jobs} downloads started in {setup_seconds:.1f}s")
+
+            deadline = time.time() + self.duration
+            await asyncio.gather(*(self.poller(http, deadline) for _ in range(self.pollers)),
+                                 *(self.subscriber(deadline) for _ in range(self.subscribers)))
+            print(f"  steady: {self.duration:.0f}s, {self.frames} progress frames")
+
+            await asyncio.gather(*(self.stop_job(http, gate, d) for d in self.download_ids))
+
+        return {
+            'url': self.url,
+            'jobs': self.jobs,
+            'started': len(self.download_ids),
+            'pollers': self.pollers,
+            'subscribers': self.subscribers,
+            'duration': self.duration,
+            'setup_seconds': round(setup_seconds, 3),
+            'endpoints': {label: dict(distribution(samples), errors=self.errors.get(label, 0))
+                          for label, samples in sorted(self.latencies.items())},
+            'event_lag': dict(distribution(self.lags), errors=self.errors.get('progress_batch', 0)),
+            'socket_errors': self.errors.get('socket.io connect', 0),
+            'timestamp': time.time()
+        }
+
+
+def compare(result, baseline, tolerance, min_delta_ms):
+    """[(metric, baseline ms, current ms)] for every p95/p99 that regressed"""
+    rows = [(f'{label} {p}', baseline['endpoints'].get(label, {}).get(p), row[p])
+            for label, row in result['endpoints'].items() for p in ('p95_ms', 'p99_ms')]
+    rows += [(f'event lag {p}', baseline.get('event_lag', {}).get(p), result['event_lag'][p])
+             for p in ('p95_ms', 'p99_ms')]
+    return [(metric, before, now) for metric, before, now in rows
+            if before is not None and now is not None
+            and now > before * (1 + tolerance) and now - before >= min_delta_ms]
+
+
+def serve(port, jobs):
+    """Start api_server in offline mode from a scratch directory"""
+    work_dir = tempfile.mkdtemp(prefix='load_test_')
+    env = dict(os.environ,
+               TORRENT_PROFILE='offline',
+               TORRENT_LISTEN_PORT=str(port + 1),
+               SCHEDULER_MAX_ACTIVE=str(jobs),
+               SCHEDULER_MAX_QUEUED=str(jobs),
+               RESULTS_DB_PATH=os.path.join(work_dir, 'results.db'),
+               RESUME_DB_PATH=os.path.join(work_dir, 'resume.db'),
+               VERDICT_CACHE_PATH=os.path.join(work_dir, 'verdicts.db'),
+               PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(work_dir, 'server.log'), 'wb') as log:
+        server = subprocess.Popen([sys.executable, '-c', SERVE_CODE.format(port=port)], cwd=work_dir,
+                                  env=env, stdout=log, stderr=subprocess.STDOUT)
+    return server, work_dir
+
+
+async def wait_ready(url, server=None, work_dir=None, timeout=30):
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.time() < deadline:
+            if server is not None and server.poll() is not None:
+                with open(os.path.join(work_dir, 'server.log'), errors='replace') as f:
+                    log = f.read()[-2000:]
+                raise RuntimeError(f'server exited with status {server.returncode}:\n{log}')
+            try:
+                async with http.get(url + '/api/health') as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f'server at {url} did not come up')
+
+
+async def main(args):
+    server = work_dir = None
+    url = args.url
+    if args.serve:
+        url = f'http://127.0.0.1:{args.port}'
+        server, work_dir = serve(args.port, args.jobs)
+    try:
+        await wait_ready(url, server, work_dir)
+        test = LoadTest(url, args.jobs, args.concurrency, args.pollers, args.subscribers, args.duration)
+        return await test.run()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test for the scanning API server')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server to test (ignored with --serve)')
+    parser.add_argument('--serve', action='store_true', help='start an offline api_server for the test')
+    parser.add_argument('--port', type=int, default=5055, help='--serve HTTP port (listen port is +1)')
+    parser.add_argument('--jobs', type=int, default=200, help='downloads to start (default 200)')
+    parser.add_argument('--concurrency', type=int, default=32, help='parallel setup/teardown requests')
+    parser.add_argument('--pollers', type=int, default=50, help='concurrent REST pollers (default 50)')
+    parser.add_argument('--subscribers', type=int, default=50, help='Socket.IO clients (default 50)')
+    parser.add_argument('--duration', type=float, default=30, help='steady phase seconds (default 30)')
+    parser.add_argument('--json', help='write results to this file (usable as a --baseline)')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown (default 0.25 = 25%%)')
+    parser.add_argument('--min-delta', type=float, default=2.0, help='ignore slowdowns under this many ms')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("📈 API load test")
+    print("="*60)
+
+    result = asyncio.run(main(args))
+
+    print(f"\n{'endpoint':<34} {'count':>7} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for label, row in list(result['endpoints'].items()) + [('progress_batch lag', result['event_lag'])]:
+        print(f"{label:<34} {row['count']:>7} {row['errors']:>6} "
+              + ' '.join(f"{row[p]:>6.1f} ms" if row[p] is not None else f"{'-':>9}"
+                         for p in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for metric, before, now in regressions:
+                print(f"   {metric}: {before:.1f} ms -> {now:.1f} ms")
+            sys.exit(1)
+        print(f"\n✓ No regressions against {args.baseline}")
@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+
+import libtorrent as lt
+
+
+# Latency buckets (seconds): a cached read takes milliseconds, a piece
+# from a slow swarm can take minutes
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# libtorrent counter groups exported from session_stats_alert
+SESSION_METRIC_GROUPS = ('net', 'peer', 'disk', 'picker', 'ses')
+
+HISTOGRAMS = {
+    'piece_wait': ('scanner_piece_wait_seconds',
+                   'Time from prioritizing a sampled piece to piece_finished_alert'),
+    'read_piece': ('scanner_read_piece_seconds',
+                   'Time from read_piece() to the read_piece_alert buffer'),
+    'scan': ('scanner_scan_batch_seconds',
+             'Time spent in one scanner batch call'),
+}
+
+
+class Histogram:
+    """Cumulative Prometheus histogram (thread-safe)"""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def render(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f'{self.name}_sum {total:.6f}')
+        lines.append(f'{self.name}_count {cumulative}')
+        return lines
+
+
+class Metrics:
+    """
+    Process-wide metrics rendered in the Prometheus text format.
+
+    Latency histograms are fed by the download path (observe()). libtorrent
+    counters come from session_stats_alert: a background thread calls
+    post_session_stats() on every session each `interval` seconds and the
+    latest values per session are kept, so a scrape never waits on
+    libtorrent. Everything else (queue depths, cache ratios...) is read from
+    the components' stats() at scrape time and passed to render().
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.histograms = {key: Histogram(name, help_text, buckets)
+                           for key, (name, help_text) in HISTOGRAMS.items()}
+        self.metric_types = {m.name: m.type for m in lt.session_stats_metrics()
+                             if m.name.split('.')[0] in SESSION_METRIC_GROUPS}
+        self.session_values = {}  # session index -> {metric name: value}
+        self.lock = threading.Lock()
+        self.sessions = None
+        self.interval = 5.0
+        self.running = False
+        self.thread = None
+
+    def observe(self, name, seconds):
+        self.histograms[name].observe(seconds)
+
+    # ----- libtorrent session stats -----
+
+    def start(self, session_manager, interval=5.0):
+        """Poll session stats for every session of a SessionManager"""
+        if self.thread is not None:
+            return
+        self.sessions = session_manager
+        self.interval = interval
+        for index, engine in enumerate(session_manager.alert_engines):
+            engine.add_session_listener(_SessionStatsListener(self, index))
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='session-stats', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            for session in self.sessions.sessions:
+                session.post_session_stats()
+            time.sleep(self.interval)
+
+    def session_stats(self, index, values):
+        """session_stats_alert values for one session (alert thread)"""
+        exported = {name: value for name, value in values.items() if name in self.metric_types}
+        with self.lock:
+            self.session_values[index] = exported
+
+    # ----- exposition -----
+
+    def render(self, gauges=(), counters=()):
+        """
+        Prometheus text exposition. `gauges` and `counters` are iterables of
+        (name, help, value) or (name, help, value, labels) tuples read from
+        the components at scrape time; counter names end in _total.
+        """
+        lines = []
+        for histogram in self.histograms.values():
+            lines.extend(histogram.render())
+
+        with self.lock:
+            session_values = {index: dict(values) for index, values in self.session_values.items()}
+        for name, metric_type in sorted(self.metric_types.items()):
+            samples = [(index, values[name]) for index, values in sorted(session_values.items())
+                       if name in values]
+            if not samples:
+                continue
+            counter = metric_type == lt.metric_type_t.counter
+            metric = 'libtorrent_' + name.replace('.', '_') + ('_total' if counter else '')
+            lines.append(f'# TYPE {metric} {"counter" if counter else "gauge"}')
+            lines.extend(f'{metric}{{session="{index}"}} {value}' for index, value in samples)
+
+        lines.extend(_render_samples(gauges, 'gauge'))
+        lines.extend(_render_samples(counters, 'counter'))
+        return '\n'.join(lines) + '\n'
+
+
+def _render_samples(metrics, metric_type):
+    """Scrape-time samples; those sharing a name (different labels) go under one TYPE line"""
+    grouped = {}
+    for metric in metrics:
+        name, help_text, value = metric[:3]
+        labels = metric[3] if len(metric) > 3 else {}
+        grouped.setdefault(name, (help_text, []))[1].append((labels, value))
+
+    lines = []
+    for name, (help_text, samples) in grouped.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f'{name}{{{label_text}}} {float(value or 0)}' if label_text
+                         else f'{name} {float(value or 0)}')
+    return lines
+
+
+class _SessionStatsListener:
+    """AlertEngine session listener tagging session_stats_alert with its session"""
+
+    def __init__(self, metrics, index):
+        self.metrics = metrics
+        self.index = index
+
+    def on_session_alert(self, alert):
+        if isinstance(alert, lt.session_stats_alert):
+            self.metrics.session_stats(self.index, alert.values)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide Metrics registry, creating it on first use"""
+    global _metrics
+
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
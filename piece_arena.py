@@ -0,0 +1,114 @@
+import atexit
+import threading
+from multiprocessing import shared_memory
+
+
+class SharedPieceArena:
+    """
+    Piece buffers shared with scanner processes without pickling.
+
+    One multiprocessing.shared_memory segment is carved into variable-size
+    extents (first fit, neighbours coalesced on free), so a 64 MB arena holds
+    four 16 MB pieces or sixty-four 1 MB ones. put() copies a piece in once;
+    workers attach the segment by name and read (offset, length) through a
+    memoryview, so the bytes are never serialized. Extents are recycled as
+    soon as the scan that used them returns.
+
+    put() waits up to `timeout` seconds for space and returns None when a
+    piece doesn't fit (callers then fall back to passing the bytes).
+    """
+
+    def __init__(self, size=64 * 2**20, align=64):
+        self.size = size
+        self.align = align
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.name = self.shm.name
+        self.extents = [(0, size)]  # free (offset, length), sorted by offset
+        self.used = 0
+        self.condition = threading.Condition()
+        self.counters = {'puts': 0, 'bytes': 0, 'waits': 0, 'too_large': 0, 'timeouts': 0,
+                         'peak_used': 0}
+        self.closed = False
+        atexit.register(self.close)
+
+    def _take(self, length):
+        for i, (offset, free) in enumerate(self.extents):
+            if free >= length:
+                if free == length:
+                    del self.extents[i]
+                else:
+                    self.extents[i] = (offset + length, free - length)
+                self.used += length
+                self.counters['peak_used'] = max(self.counters['peak_used'], self.used)
+                return offset
+        return None
+
+    def alloc(self, length, timeout=1.0):
+        """Offset of a free extent of at least `length` bytes, or None"""
+        length = -(-max(length, 1) // self.align) * self.align
+        if length > self.size:
+            with self.condition:
+                self.counters['too_large'] += 1
+            return None
+
+        with self.condition:
+            offset = self._take(length)
+            if offset is None and timeout:
+                self.counters['waits'] += 1
+                if not self.condition.wait_for(lambda: self._fits(length), timeout=timeout):
+                    self.counters['timeouts'] += 1
+                    return None
+                offset = self._take(length)
+            return offset
+
+    def _fits(self, length):
+        return any(free >= length for _, free in self.extents)
+
+    def free(self, offset, length):
+        length = -(-max(length, 1) // self.align) * self.align
+        with self.condition:
+            self.used -= length
+            extents = self.extents
+            extents.append((offset, length))
+            extents.sort()
+            merged = [extents[0]]
+            for start, size in extents[1:]:
+                last_start, last_size = merged[-1]
+                if last_start + last_size == start:
+                    merged[-1] = (last_start, last_size + size)
+                else:
+                    merged.append((start, size))
+            self.extents = merged
+            self.condition.notify_all()
+
+    def put(self, data, timeout=1.0):
+        """Copy a piece into the arena: (offset, length), or None if it doesn't fit"""
+        length = len(data)
+        offset = self.alloc(length, timeout)
+        if offset is None:
+            return None
+        self.shm.buf[offset:offset + length] = data
+        with self.condition:
+            self.counters['puts'] += 1
+            self.counters['bytes'] += length
+        return offset, length
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+
+    def stats(self):
+        with self.condition:
+            return dict(self.counters, size=self.size, used=self.used,
+                        free_extents=len(self.extents))
+
+
+def attach(name):
+    """Worker side: the parent's arena segment (read through memoryviews)"""
+    return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,82 @@
+import os
+
+import libtorrent as lt
+
+
+PICK_MODES = ('priority', 'latency')
+
+
+class PiecePicker:
+    """
+    How a download asks libtorrent for its sampled pieces.
+
+        priority   priority 7 on the sampled pieces, 0 everywhere else; the
+                   rarest-first picker fetches them in any order, spread
+                   over many peers (original behaviour)
+        latency    the same priorities, plus sequential download and a
+                   deadline per piece in scan order (set_piece_deadline):
+                   time-critical pieces go to the fastest peers first and
+                   stragglers are re-requested from others, so the sample
+                   streams in the order it is scanned and the first verdict
+                   doesn't wait for a piece libtorrent started last.
+
+    Deadlines start `first_deadline_ms` from the request and are spaced
+    `deadline_step_ms` apart, one per piece.
+    """
+
+    def __init__(self, mode='priority', first_deadline_ms=0, deadline_step_ms=100):
+        if mode not in PICK_MODES:
+            raise ValueError(f"Unknown pick mode: {mode} (choose from {', '.join(PICK_MODES)})")
+        self.mode = mode
+        self.first_deadline_ms = int(first_deadline_ms)
+        self.deadline_step_ms = int(deadline_step_ms)
+
+    @property
+    def latency(self):
+        return self.mode == 'latency'
+
+    def start(self, handle, num_pieces, pieces):
+        """Request the first round of `pieces` (in scan order); nothing else is fetched"""
+        priorities = [0] * num_pieces
+        for i in pieces:
+            priorities[i] = 7
+        handle.prioritize_pieces(priorities)
+
+        if self.latency:
+            handle.set_flags(lt.torrent_flags.sequential_download)
+            self._set_deadlines(handle, pieces)
+
+    def add(self, handle, pieces):
+        """Request more pieces (budget expansion, adaptive feedback)"""
+        for i in pieces:
+            handle.piece_priority(i, 7)
+        if self.latency:
+            self._set_deadlines(handle, pieces)
+
+    def stop(self, handle, num_pieces):
+        """Stop requesting anything (early exit)"""
+        handle.prioritize_pieces([0] * num_pieces)
+        if self.latency:
+            handle.clear_piece_deadlines()
+
+    def _set_deadlines(self, handle, pieces):
+        for rank, i in enumerate(pieces):
+            handle.set_piece_deadline(i, self.first_deadline_ms + rank * self.deadline_step_ms)
+
+    def to_dict(self):
+        return {'mode': self.mode, 'first_deadline_ms': self.first_deadline_ms,
+                'deadline_step_ms': self.deadline_step_ms}
+
+
+def create_picker(mode=None):
+    """
+    PiecePicker for a download, defaults from:
+        PICK_MODE                 priority | latency (default: priority)
+        PICK_FIRST_DEADLINE_MS    latency mode: deadline of the first piece (default: 0)
+        PICK_DEADLINE_STEP_MS     latency mode: spacing of the next ones (default: 100)
+    """
+    return PiecePicker(
+        mode=mode or os.environ.get('PICK_MODE', 'priority'),
+        first_deadline_ms=int(os.environ.get('PICK_FIRST_DEADLINE_MS', 0)),
+        deadline_step_ms=int(os.environ.get('PICK_DEADLINE_STEP_MS', 100))
+    )
@@ -0,0 +1,201 @@
+import os
+import queue
+import threading
+import time
+
+from metrics import get_metrics
+
+
+class PiecePipeline:
+    """
+    Streams finished pieces into the scanners:
+
+        request() -> handle.read_piece() -> read_piece_alert -> bounded queue -> workers
+
+    Every piece holds a buffer slot from the moment its read is requested
+    until its scan is done, so at most max_buffered piece buffers are alive
+    at once. When scans fall behind, request() blocks the calling download
+    thread instead of letting buffers pile up in memory.
+
+    Counters per stage: reading (read requested, buffer not back yet),
+    queued (buffer waiting for a worker), in_flight (being scanned), done.
+
+    A worker takes whatever is queued (up to batch_size pieces) and scans
+    it in one call, so vectorized feature extraction sees several pieces
+    at once without the pipeline ever waiting to fill a batch.
+
+    With `metrics` (metrics.Metrics), read_piece latency and scan batch
+    times are recorded as histograms.
+    """
+
+    def __init__(self, workers=2, max_buffered=8, batch_size=4, metrics=None):
+        self.metrics = metrics
+        self.max_buffered = max_buffered
+        self.batch_size = max(1, batch_size)
+        self.slots = threading.BoundedSemaphore(max_buffered)
+        self.jobs = queue.Queue(maxsize=max_buffered)
+        self.lock = threading.Lock()
+        self.pending = {}  # (download_id, piece_index) -> job, from request until done
+        self.counters = {'reading': 0, 'queued': 0, 'in_flight': 0, 'done': 0, 'errors': 0}
+
+        self.workers = []
+        for i in range(max(1, workers)):
+            worker = threading.Thread(target=self._worker, name=f'piece-scanner-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def request(self, handle, download_id, piece_index, piece_hash, scan_fn, on_done,
+                should_stop=None):
+        """
+        Reserve a buffer slot and ask libtorrent for the piece's bytes.
+        Blocks while the pipeline is full; returns False if should_stop()
+        turned true while waiting.
+
+        scan_fn(pieces) runs on a worker thread with a list of
+        (piece_index, piece_hash, piece_data) and returns one result per
+        piece; on_done(piece_index, piece_hash, result) receives each result.
+        """
+        while not self.slots.acquire(timeout=0.5):
+            if should_stop is not None and should_stop():
+                return False
+
+        job = {
+            'download_id': download_id,
+            'piece_index': piece_index,
+            'piece_hash': piece_hash,
+            'scan_fn': scan_fn,
+            'on_done': on_done,
+            'data': None,
+            'error': None,
+            'requested_at': time.monotonic()
+        }
+        with self.lock:
+            self.pending[(download_id, piece_index)] = job
+            self.counters['reading'] += 1
+
+        handle.read_piece(piece_index)
+        return True
+
+    def piece_read(self, download_id, piece_index, data, error=None):
+        """Called from the alert thread with the read_piece_alert buffer"""
+        with self.lock:
+            job = self.pending.get((download_id, piece_index))
+            if job is None or job['data'] is not None or job['error'] is not None:
+                return  # cancelled, or a duplicate alert
+            # Marks the read as done under the lock, so cancel() can no
+            # longer release this job's slot
+            job['data'] = data
+            job['error'] = error
+            self.counters['reading'] -= 1
+            self.counters['queued'] += 1
+
+        if self.metrics is not None:
+            self.metrics.observe('read_piece', time.monotonic() - job['requested_at'])
+        # Never blocks: every job in the queue holds one of max_buffered slots
+        self.jobs.put(job)
+
+    def cancel(self, download_id):
+        """Release the slots of reads that will never complete for a download"""
+        with self.lock:
+            keys = [key for key, job in self.pending.items()
+                    if key[0] == download_id and job['data'] is None and job['error'] is None]
+            for key in keys:
+                del self.pending[key]
+                self.counters['reading'] -= 1
+
+        for _ in keys:
+            self.slots.release()
+
+    def _worker(self):
+        while True:
+            jobs = [self.jobs.get()]
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            with self.lock:
+                self.counters['queued'] -= len(jobs)
+                self.counters['in_flight'] += len(jobs)
+
+            # Jobs from the same download share a scan_fn and are scanned together
+            groups = {}
+            for job in jobs:
+                groups.setdefault(job['scan_fn'], []).append(job)
+            for scan_fn, group in groups.items():
+                self._scan_group(scan_fn, group)
+
+    def _scan_group(self, scan_fn, jobs):
+        results = [None] * len(jobs)
+        readable = [i for i, job in enumerate(jobs) if not job['error']]
+        for i, job in enumerate(jobs):
+            if job['error']:
+                results[i] = {'error': f"read_piece failed: {job['error']}"}
+
+        try:
+            if readable:
+                started = time.monotonic()
+                scanned = scan_fn([(jobs[i]['piece_index'], jobs[i]['piece_hash'], jobs[i]['data'])
+                                   for i in readable])
+                if self.metrics is not None:
+                    self.metrics.observe('scan', time.monotonic() - started)
+                scanned = list(scanned)
+                if len(scanned) != len(readable):
+                    raise RuntimeError(f"scanner returned {len(scanned)} results "
+                                       f"for {len(readable)} pieces")
+                for i, result in zip(readable, scanned):
+                    results[i] = result
+        except Exception as e:
+            for i in readable:
+                results[i] = {'error': str(e)}
+
+        errors = sum(1 for result in results if 'error' in result)
+
+        # Drop the buffers before handing the slots back
+        for job in jobs:
+            job['data'] = None
+
+        with self.lock:
+            for job in jobs:
+                self.pending.pop((job['download_id'], job['piece_index']), None)
+            self.counters['in_flight'] -= len(jobs)
+            self.counters['done'] += len(jobs)
+            self.counters['errors'] += errors
+        for _ in jobs:
+            self.slots.release()
+
+        for job, result in zip(jobs, results):
+            try:
+                job['on_done'](job['piece_index'], job['piece_hash'], result)
+            except Exception as e:
+                print(f"⚠ Scan callback failed for piece {job['piece_index']}: {e}")
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats['max_buffered'] = self.max_buffered
+        stats['workers'] = len(self.workers)
+        stats['batch_size'] = self.batch_size
+        return stats
+
+
+_piece_pipeline = None
+_piece_pipeline_lock = threading.Lock()
+
+
+def get_piece_pipeline():
+    """Return the process-wide PiecePipeline, creating it on first use"""
+    global _piece_pipeline
+
+    with _piece_pipeline_lock:
+        if _piece_pipeline is None:
+            _piece_pipeline = PiecePipeline(
+                # One pipeline thread per scanner worker keeps every worker busy
+                workers=int(os.environ.get('PIPELINE_WORKERS',
+                                           os.environ.get('SCANNER_WORKERS', 2))),
+                max_buffered=int(os.environ.get('PIPELINE_MAX_BUFFERED', 8)),
+                batch_size=int(os.environ.get('PIPELINE_BATCH_SIZE', 4)),
+                metrics=get_metrics()
+            )
+        return _piece_pipeline
@@ -0,0 +1,121 @@
+import os
+
+
+def _env_float(name, default):
+    value = os.environ.get(name, default)
+    return float(value) if value not in (None, '') else None
+
+
+# Tunables, overridable per download via create_policy(overrides)
+POLICY_DEFAULTS = {
+    # A single detection at or above this confidence ends the download
+    'malicious_confidence': _env_float('POLICY_MALICIOUS_CONFIDENCE', 0.9),
+    # ...as does the summed confidence of all detections so far
+    'cumulative_confidence': _env_float('POLICY_CUMULATIVE_CONFIDENCE', 1.5),
+    # Clean pieces at or above these are "suspicious". The entropy signal
+    # is off by default: compressed media sits near 8 bits/byte anyway
+    'suspicious_confidence': _env_float('POLICY_SUSPICIOUS_CONFIDENCE', 0.3),
+    'suspicious_entropy': _env_float('POLICY_SUSPICIOUS_ENTROPY', None),
+    # A clean sample with suspicious pieces grows by this share of the
+    # original budget, at most `max_expansions` times
+    'expand_share': _env_float('POLICY_EXPAND_SHARE', 0.5),
+    'max_expansions': int(os.environ.get('POLICY_MAX_EXPANSIONS', 1)),
+}
+
+
+class ScanPolicy:
+    """
+    Decides, verdict by verdict, whether a download has seen enough.
+
+    observe() returns 'stop' once the sample is conclusive (one confident
+    detection, or enough cumulative confidence): the caller should drop
+    the torrent's priorities, remove the handle and report verdict().
+    When the sample is used up without a detection but some pieces looked
+    suspicious, extra_budget() grants more pieces to fetch.
+    """
+
+    def __init__(self, **settings):
+        self.settings = dict(POLICY_DEFAULTS, **settings)
+        self.pieces_scanned = 0
+        self.errors = 0
+        self.cumulative = 0.0
+        self.flagged = []     # piece indexes with malicious verdicts
+        self.suspicious = []  # clean but suspicious piece indexes
+        self.expansions = 0
+        self.reason = None    # why observe() said 'stop'
+
+    def observe(self, piece_index, scan_result):
+        """Record one verdict; returns 'stop' or 'continue'"""
+        if self.reason:
+            return 'stop'
+
+        if 'error' in scan_result:
+            self.errors += 1
+            return 'continue'
+
+        self.pieces_scanned += 1
+        confidence = float(scan_result.get('confidence') or 0.0)
+
+        if scan_result.get('malicious'):
+            self.flagged.append(piece_index)
+            self.cumulative += confidence
+            if confidence >= self.settings['malicious_confidence']:
+                self.reason = 'confident_detection'
+            elif self.cumulative >= self.settings['cumulative_confidence']:
+                self.reason = 'cumulative_confidence'
+            return 'stop' if self.reason else 'continue'
+
+        entropy = (scan_result.get('features') or {}).get('entropy', 0.0)
+        entropy_threshold = self.settings['suspicious_entropy']
+        if (confidence >= self.settings['suspicious_confidence']
+                or (entropy_threshold is not None and entropy >= entropy_threshold)):
+            self.suspicious.append(piece_index)
+
+        return 'continue'
+
+    def extra_budget(self, budget_pieces):
+        """Pieces to add once the sample is exhausted (0 = finish)"""
+        if self.reason or self.flagged or not self.suspicious:
+            return 0
+        if self.expansions >= self.settings['max_expansions']:
+            return 0
+
+        self.expansions += 1
+        return max(1, int(budget_pieces * self.settings['expand_share']))
+
+    def verdict(self):
+        """Final verdict for the download, JSON-friendly"""
+        if self.reason:
+            verdict = 'malicious'
+        elif self.flagged:
+            verdict = 'suspicious'
+        elif self.pieces_scanned == 0:
+            verdict = 'inconclusive'
+        else:
+            verdict = 'clean'
+
+        return {
+            'verdict': verdict,
+            'early_exit': self.reason,
+            'cumulative_confidence': round(self.cumulative, 4),
+            'pieces_scanned': self.pieces_scanned,
+            'scan_errors': self.errors,
+            'flagged_pieces': self.flagged,
+            'suspicious_pieces': self.suspicious,
+            'expansions': self.expansions
+        }
+
+
+def create_policy(overrides=None):
+    """ScanPolicy with POLICY_* env defaults, optionally overridden per download"""
+    overrides = overrides or {}
+    unknown = [key for key in overrides if key not in POLICY_DEFAULTS]
+    if unknown:
+        raise ValueError(f"Unknown policy setting(s): {', '.join(unknown)} "
+                         f"(choose from {', '.join(POLICY_DEFAULTS)})")
+
+    settings = {
+        key: (int(value) if key == 'max_expansions' else None if value is None else float(value))
+        for key, value in overrides.items()
+    }
+    return ScanPolicy(**settings)
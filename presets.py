@@ -0,0 +1,114 @@
+import libtorrent as lt
+
+
+# Performance presets. 'settings' is a settings_pack fragment applied to a
+# whole session with apply_settings(); 'torrent' holds the per-torrent knobs
+# used when a single download asks for the preset. Keys never overlap with
+# the discovery/listen settings owned by session_profiles.py.
+PRESETS = {
+    'high-throughput': {
+        'description': 'Many peers, deep request pipelines and large disk queues',
+        'settings': {
+            'connections_limit': 800,
+            'connection_speed': 100,
+            'torrent_connect_boost': 60,
+            'active_downloads': 16,
+            'active_limit': 1000,
+            'unchoke_slots_limit': 20,
+            'choking_algorithm': int(lt.choking_algorithm_t.rate_based_choker),
+            'request_queue_time': 5,
+            'max_out_request_queue': 1500,
+            'max_allowed_in_request_queue': 4000,
+            'whole_pieces_threshold': 20,
+            'max_queued_disk_bytes': 256 * 1024 * 1024,
+            'aio_threads': 16,
+            'hashing_threads': 4,
+            'checking_mem_usage': 1024,
+            'send_buffer_watermark': 3 * 1024 * 1024,
+            'max_peer_recv_buffer_size': 8 * 1024 * 1024,
+            'suggest_mode': int(lt.suggest_mode_t.suggest_read_cache),
+        },
+        'torrent': {'max_connections': 200, 'max_uploads': -1},
+    },
+    'low-latency': {
+        'description': 'First sampled piece as soon as possible: fast connects, '
+                       'short queues, whole pieces from one peer, aggressive end game',
+        'settings': {
+            'connection_speed': 200,
+            'torrent_connect_boost': 100,
+            'smooth_connects': False,
+            'peer_connect_timeout': 5,
+            'active_downloads': 16,
+            'request_queue_time': 1,
+            'max_out_request_queue': 200,
+            'piece_timeout': 5,
+            'request_timeout': 10,
+            'whole_pieces_threshold': 1,
+            'prioritize_partial_pieces': True,
+            'strict_end_game_mode': False,
+            'max_queued_disk_bytes': 16 * 1024 * 1024,
+            'aio_threads': 4,
+        },
+        'torrent': {'max_connections': 100},
+    },
+    'low-memory': {
+        'description': 'Few connections and small buffers for constrained hosts',
+        'settings': {
+            'connections_limit': 50,
+            'active_downloads': 4,
+            'active_limit': 50,
+            'max_out_request_queue': 100,
+            'max_allowed_in_request_queue': 250,
+            'max_queued_disk_bytes': 4 * 1024 * 1024,
+            'aio_threads': 2,
+            'hashing_threads': 1,
+            'checking_mem_usage': 16,
+            'file_pool_size': 10,
+            'send_buffer_watermark': 128 * 1024,
+            'max_peer_recv_buffer_size': 256 * 1024,
+            'suggest_mode': int(lt.suggest_mode_t.no_piece_suggestions),
+        },
+        'torrent': {'max_connections': 20, 'max_uploads': 4},
+    },
+}
+
+# libtorrent's own values for every key a preset touches, so switching a
+# session back to 'default' undoes whatever preset was applied before
+_DEFAULTS = lt.default_settings()
+PRESETS['default'] = {
+    'description': 'libtorrent defaults',
+    'settings': {
+        key: _DEFAULTS[key]
+        for preset in list(PRESETS.values()) for key in preset['settings']
+    },
+    'torrent': {'max_connections': -1, 'max_uploads': -1},
+}
+
+
+def get_preset(name):
+    if name not in PRESETS:
+        raise ValueError(f"Unknown performance preset: {name} (choose from {', '.join(PRESETS)})")
+    return PRESETS[name]
+
+
+def apply_session_preset(session, name):
+    """Apply a preset's settings_pack fragment to a running session"""
+    session.apply_settings(dict(get_preset(name)['settings']))
+
+
+def apply_torrent_preset(handle, name):
+    """Apply a preset's per-torrent knobs to one download's handle"""
+    knobs = get_preset(name)['torrent']
+    if 'max_connections' in knobs:
+        handle.set_max_connections(knobs['max_connections'])
+    if 'max_uploads' in knobs:
+        handle.set_max_uploads(knobs['max_uploads'])
+
+
+def describe_presets():
+    """JSON-friendly listing for the API"""
+    return {
+        name: {'description': preset['description'], 'settings': preset['settings'],
+               'torrent': preset['torrent']}
+        for name, preset in PRESETS.items()
+    }
@@ -0,0 +1,153 @@
+import threading
+import time
+
+
+class ProgressEmitter:
+    """
+    Coalesces download progress into one Socket.IO frame per tick.
+
+    Downloads call update() as often as they like; only the latest fields
+    per download are kept. Every `interval` seconds each client due for a
+    frame gets a single 'progress_batch' event covering all the downloads
+    it subscribed to, containing only the fields that changed since that
+    client's previous frame (delta encoding). Clients pick their own pace
+    with set_interval(); nothing is sent to clients with no subscriptions
+    or nothing new.
+
+    `snapshot`, if given, is a callable returning {download_id: fields}
+    (StatusCollector.snapshot); those fields are merged under the ones
+    pushed with update(), so swarm status needs no polling by downloads.
+
+    Frame: {'t': <unix time>, 'downloads': {download_id: {changed fields}},
+            'finished': [download_id, ...]}
+    """
+
+    def __init__(self, socketio, interval=0.5, event='progress_batch', snapshot=None):
+        self.socketio = socketio
+        self.snapshot = snapshot
+        self.interval = interval
+        self.event = event
+        self.lock = threading.Lock()
+        self.states = {}   # download_id -> latest progress fields
+        self.clients = {}  # sid -> {'downloads', 'sent', 'finished', 'interval', 'last_sent'}
+        self.counters = {'ticks': 0, 'frames': 0, 'updates': 0}
+        self.thread = None
+        self.running = False
+
+    # ----- producers (download threads) -----
+
+    def update(self, download_id, fields):
+        with self.lock:
+            self.states.setdefault(download_id, {}).update(fields)
+            self.counters['updates'] += 1
+
+    def finish(self, download_id):
+        """Drop a download's state; subscribers get it in 'finished' once"""
+        with self.lock:
+            self.states.pop(download_id, None)
+            for client in self.clients.values():
+                if download_id in client['downloads']:
+                    client['downloads'].discard(download_id)
+                    client['sent'].pop(download_id, None)
+                    client['finished'].add(download_id)
+
+    # ----- clients (Socket.IO handlers) -----
+
+    def subscribe(self, sid, download_id):
+        with self.lock:
+            client = self._client(sid)
+            client['downloads'].add(download_id)
+            client['sent'].pop(download_id, None)  # next frame carries the full state
+
+    def unsubscribe(self, sid, download_id):
+        with self.lock:
+            client = self.clients.get(sid)
+            if client:
+                client['downloads'].discard(download_id)
+                client['sent'].pop(download_id, None)
+
+    def set_interval(self, sid, interval):
+        """Per-client rate limit: at most one frame every `interval` seconds"""
+        with self.lock:
+            self._client(sid)['interval'] = max(self.interval, float(interval))
+
+    def disconnect(self, sid):
+        with self.lock:
+            self.clients.pop(sid, None)
+
+    def _client(self, sid):
+        if sid not in self.clients:
+            self.clients[sid] = {
+                'downloads': set(), 'sent': {}, 'finished': set(),
+                'interval': self.interval, 'last_sent': 0.0
+            }
+        return self.clients[sid]
+
+    # ----- emitter thread -----
+
+    def start(self):
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name='progress-emitter', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"⚠ Progress emitter error: {e}")
+
+    def tick(self):
+        """Build and send this tick's frames (called by the emitter thread)"""
+        now = time.time()
+        frames = []
+        swarm = self.snapshot() if self.snapshot else {}
+
+        with self.lock:
+            self.counters['ticks'] += 1
+
+            for sid, client in self.clients.items():
+                if now - client['last_sent'] < client['interval'] - 1e-3:
+                    continue
+
+                downloads = {}
+                for download_id in client['downloads']:
+                    state = self.states.get(download_id)
+                    if not state:
+                        continue
+                    if download_id in swarm:
+                        state = dict(swarm[download_id], **state)
+                    sent = client['sent'].setdefault(download_id, {})
+                    delta = {k: v for k, v in state.items() if sent.get(k, _MISSING) != v}
+                    if delta:
+                        sent.update(delta)
+                        downloads[download_id] = delta
+
+                if downloads or client['finished']:
+                    client['last_sent'] = now
+                    frame = {'t': round(now, 3), 'downloads': downloads}
+                    if client['finished']:
+                        frame['finished'] = sorted(client['finished'])
+                        client['finished'] = set()
+                    frames.append((sid, frame))
+
+            self.counters['frames'] += len(frames)
+
+        # Emit outside the lock so slow sockets don't stall producers
+        for sid, frame in frames:
+            self.socketio.emit(self.event, frame, to=sid)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['clients'] = len(self.clients)
+            stats['tracked_downloads'] = len(self.states)
+        return stats
+
+
+_MISSING = object()
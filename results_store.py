@@ -0,0 +1,218 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class ResultsStore:
+    """
+    Append-only store of per-piece scan results and final verdicts.
+
+    Writers never touch SQLite: record() puts the row on a bounded queue
+    and a single writer thread inserts whatever has accumulated in one
+    transaction (up to `batch_size` rows, at least every `flush_interval`
+    seconds). Reads go through their own connection, which WAL mode lets
+    run alongside the writer. Queries are keyset-paginated, so memory use
+    depends on the page size, not on the history size.
+    """
+
+    def __init__(self, db_path, batch_size=256, flush_interval=0.5, max_pending=10000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.counters = {'recorded': 0, 'written': 0, 'batches': 0, 'write_errors': 0}
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.writer_db = self._connect()
+        self.writer_db.executescript('''
+            CREATE TABLE IF NOT EXISTS scan_results (
+                id INTEGER PRIMARY KEY,
+                download_id TEXT NOT NULL,
+                info_hash TEXT NOT NULL,
+                piece_index INTEGER NOT NULL,
+                piece_hash TEXT NOT NULL,
+                malicious INTEGER NOT NULL,
+                confidence REAL NOT NULL,
+                error INTEGER NOT NULL,
+                scanned_at REAL NOT NULL,
+                result TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scan_results_download ON scan_results (download_id, malicious, id);
+            CREATE INDEX IF NOT EXISTS scan_results_info_hash ON scan_results (info_hash, malicious, id);
+            CREATE INDEX IF NOT EXISTS scan_results_piece_hash ON scan_results (piece_hash);
+
+            CREATE TABLE IF NOT EXISTS download_verdicts (
+                download_id TEXT PRIMARY KEY,
+                info_hash TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                finished_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS download_verdicts_info_hash ON download_verdicts (info_hash);
+        ''')
+        self.writer_db.commit()
+
+        self.reader_db = self._connect()
+        self.reader_lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self._run, name='results-writer', daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    # ----- writes (any thread) -----
+
+    def record(self, download_id, info_hash, piece_index, piece_hash, scan_result):
+        """Queue one piece's scan result (blocks only if the writer is far behind)"""
+        self.pending.put(('result', (
+            download_id, info_hash, piece_index, piece_hash,
+            int(bool(scan_result.get('malicious'))),
+            float(scan_result.get('confidence') or 0.0),
+            int('error' in scan_result),
+            time.time(),
+            json.dumps(scan_result)
+        )))
+        self.counters['recorded'] += 1
+
+    def record_verdict(self, download_id, info_hash, verdict):
+        self.pending.put(('verdict', (download_id, info_hash, json.dumps(verdict), time.time())))
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written"""
+        done = threading.Event()
+        self.pending.put(('flush', done))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if batch[-1][0] == 'flush':
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        results = [row for kind, row in batch if kind == 'result']
+        verdicts = [row for kind, row in batch if kind == 'verdict']
+        try:
+            with self.writer_db:
+                if results:
+                    self.writer_db.executemany(
+                        'INSERT INTO scan_results (download_id, info_hash, piece_index, piece_hash, '
+                        'malicious, confidence, error, scanned_at, result) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', results)
+                if verdicts:
+                    self.writer_db.executemany(
+                        'INSERT OR REPLACE INTO download_verdicts (download_id, info_hash, verdict, finished_at) '
+                        'VALUES (?, ?, ?, ?)', verdicts)
+            self.counters['written'] += len(results)
+            self.counters['batches'] += 1
+        except sqlite3.Error as e:
+            self.counters['write_errors'] += 1
+            print(f"⚠ Failed to write {len(results)} scan result(s): {e}")
+
+        for kind, event in batch:
+            if kind == 'flush':
+                event.set()
+
+    # ----- reads -----
+
+    def query(self, download_id=None, info_hash=None, piece_hash=None, malicious=None,
+              after=0, limit=100):
+        """
+        One page of results in insertion order, plus the cursor for the next
+        page (None on the last page). `after` is the previous page's cursor.
+        """
+        clauses, params = ['id > ?'], [int(after or 0)]
+        for column, value in (('download_id', download_id), ('info_hash', info_hash),
+                              ('piece_hash', piece_hash)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if malicious is not None:
+            clauses.append('malicious = ?')
+            params.append(int(bool(malicious)))
+
+        with self.reader_lock:
+            rows = self.reader_db.execute(
+                'SELECT id, download_id, info_hash, piece_index, piece_hash, scanned_at, result '
+                f'FROM scan_results WHERE {" AND ".join(clauses)} ORDER BY id LIMIT ?',
+                params + [limit + 1]
+            ).fetchall()
+
+        page = [{
+            'download_id': row[1],
+            'info_hash': row[2],
+            'piece_index': row[3],
+            'piece_hash': row[4],
+            'scanned_at': row[5],
+            'scan_result': json.loads(row[6])
+        } for row in rows[:limit]]
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return page, next_cursor
+
+    def scanned_pieces(self, download_id):
+        """{piece_index: (piece_hash, scan_result)} already stored for a download"""
+        with self.reader_lock:
+            rows = self.reader_db.execute(
+                'SELECT piece_index, piece_hash, result FROM scan_results '
+                'WHERE download_id = ? AND error = 0 ORDER BY id', (download_id,)
+            ).fetchall()
+        return {piece_index: (piece_hash, json.loads(result)) for piece_index, piece_hash, result in rows}
+
+    def get_verdict(self, download_id):
+        with self.reader_lock:
+            row = self.reader_db.execute(
+                'SELECT verdict FROM download_verdicts WHERE download_id = ?', (download_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def summary(self, download_id):
+        """Piece counts for a download: scanned, malicious, errors"""
+        with self.reader_lock:
+            row = self.reader_db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(malicious), 0), COALESCE(SUM(error), 0) '
+                'FROM scan_results WHERE download_id = ?', (download_id,)
+            ).fetchone()
+        return {'pieces': row[0], 'malicious': row[1], 'errors': row[2]}
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['pending'] = self.pending.qsize()
+        return stats
+
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """
+    Return the process-wide ResultsStore, configured from:
+        RESULTS_DB_PATH      SQLite file (default: ./results/scan_results.db)
+        RESULTS_BATCH_SIZE   rows per insert transaction (default: 256)
+    """
+    global _results_store
+
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore(
+                os.environ.get('RESULTS_DB_PATH',
+                               os.path.join(os.getcwd(), 'results', 'scan_results.db')),
+                batch_size=int(os.environ.get('RESULTS_BATCH_SIZE', 256))
+            )
+        return _results_store
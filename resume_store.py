@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResumeStore:
+    """
+    Sampling jobs that haven't finished yet, with their libtorrent
+    fast-resume data, so a restarted server can pick them up again.
+
+    A job is saved when it is submitted and removed when it ends. While it
+    runs, a saver thread asks every handle with unsaved changes for
+    save_resume_data(); the save_resume_data_alert comes back through the
+    AlertEngine and the downloader stores the encoded data with
+    save_resume_data(), which only hands it to a writer thread: AlertEngine
+    callbacks must not wait for SQLite. Re-adding a torrent from that data
+    skips the full hash check of the files already in downloads/.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()  # the database connection
+        self.stats_lock = threading.Lock()
+        self.counters = {'jobs_saved': 0, 'resume_saves': 0, 'resumed': 0}
+        self.resume_times = []  # seconds from server start to each resumed torrent being checked
+        self.thread = None
+
+        # download_id -> (resume_data, saved_at) not written yet; only the
+        # latest blob of a job matters, so a slow disk coalesces saves
+        self.unsaved = {}
+        self.unsaved_ready = threading.Condition()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                download_id TEXT PRIMARY KEY,
+                job TEXT NOT NULL,
+                resume_data BLOB,
+                created_at REAL NOT NULL,
+                saved_at REAL
+            )
+        ''')
+        self.db.commit()
+
+        self.writer = threading.Thread(target=self._write_loop, name='resume-writer', daemon=True)
+        self.writer.start()
+
+    def save_job(self, download_id, job):
+        """
+        Remember a submitted job (JSON-friendly dict needed to restart it).
+        Saving a job again (resume_jobs() re-schedules every stored job)
+        only updates the dict: its resume data and place in the order stay.
+        """
+        with self.lock:
+            self.db.execute(
+                'INSERT INTO jobs (download_id, job, created_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(download_id) DO UPDATE SET job = excluded.job',
+                (download_id, json.dumps(job), time.time())
+            )
+            self.db.commit()
+        with self.stats_lock:
+            self.counters['jobs_saved'] += 1
+
+    def save_resume_data(self, download_id, resume_data):
+        """
+        Queue encoded resume data (lt.write_resume_data_buf) of a running
+        job for the writer thread (never blocks on the database)
+        """
+        with self.unsaved_ready:
+            self.unsaved[download_id] = (resume_data, time.time())
+            self.unsaved_ready.notify()
+
+    def flush(self):
+        """Write the queued resume data now"""
+        with self.lock:
+            with self.unsaved_ready:
+                unsaved, self.unsaved = self.unsaved, {}
+            if not unsaved:
+                return
+            self.db.executemany(
+                'UPDATE jobs SET resume_data = ?, saved_at = ? WHERE download_id = ?',
+                [(resume_data, saved_at, download_id)
+                 for download_id, (resume_data, saved_at) in unsaved.items()]
+            )
+            self.db.commit()
+        with self.stats_lock:
+            self.counters['resume_saves'] += len(unsaved)
+
+    def _write_loop(self):
+        while True:
+            with self.unsaved_ready:
+                while not self.unsaved:
+                    self.unsaved_ready.wait()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠ Could not save resume data: {e}")
+
+    def remove(self, download_id):
+        with self.unsaved_ready:
+            self.unsaved.pop(download_id, None)
+        with self.lock:
+            self.db.execute('DELETE FROM jobs WHERE download_id = ?', (download_id,))
+            self.db.commit()
+
+    def jobs(self):
+        """[(download_id, job, resume_data or None)] in submission order"""
+        self.flush()
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT download_id, job, resume_data FROM jobs ORDER BY created_at'
+            ).fetchall()
+        return [(download_id, json.loads(job), resume_data) for download_id, job, resume_data in rows]
+
+    def record_resume(self, seconds):
+        with self.stats_lock:
+            self.counters['resumed'] += 1
+            self.resume_times.append(seconds)
+
+    # ----- periodic save_resume_data -----
+
+    def start(self, session_manager, interval=10.0):
+        """Ask running torrents for resume data every `interval` seconds"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, args=(session_manager, interval),
+                                           name='resume-saver', daemon=True)
+            self.thread.start()
+
+    def _run(self, session_manager, interval):
+        while True:
+            time.sleep(interval)
+            for download_id, handle in session_manager.handles():
+                try:
+                    if handle.is_valid() and handle.need_save_resume_data():
+                        handle.save_resume_data()
+                except RuntimeError:
+                    pass  # removed while we were looking
+
+    def stats(self):
+        with self.lock:
+            pending_jobs = self.db.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+        with self.unsaved_ready:
+            unsaved = len(self.unsaved)
+        with self.stats_lock:
+            stats = dict(self.counters, pending_jobs=pending_jobs, unsaved_resume_data=unsaved)
+            if self.resume_times:
+                stats['resume_seconds'] = {
+                    'last': round(self.resume_times[-1], 3),
+                    'max': round(max(self.resume_times), 3)
+                }
+        return stats
+
+
+_resume_store = None
+_resume_store_lock = threading.Lock()
+
+
+def get_resume_store():
+    """
+    Return the process-wide ResumeStore, configured from:
+        RESUME_DB_PATH   SQLite file (default: ./resume/resume.db)
+    """
+    global _resume_store
+
+    with _resume_store_lock:
+        if _resume_store is None:
+            _resume_store = ResumeStore(
+                os.environ.get('RESUME_DB_PATH', os.path.join(os.getcwd(), 'resume', 'resume.db'))
+            )
+        return _resume_store
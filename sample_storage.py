@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import threading
+
+
+MODES = ('keep', 'delete', 'scratch')
+
+
+class SampleStorage:
+    """
+    Where sampling jobs keep the pieces libtorrent writes.
+
+    Pieces reach the scanners from memory (read_piece, see piece_pipeline.py),
+    so once a sample is complete its sparse files are only dead weight:
+
+        keep      files stay in the download folder (original behaviour)
+        delete    files are removed with the torrent (delete_files) as soon
+                  as the sample is complete or the job ends
+        scratch   each job gets its own directory under `scratch_dir` (put
+                  it on tmpfs, e.g. /dev/shm) holding at most `quota_bytes`
+                  of reserved sample budget in total; jobs that don't fit
+                  spill over to their usual save path. Files are deleted
+                  like in 'delete' mode.
+
+    A finished job calls release() while its files still exist, which
+    measures the bytes it actually put on disk (allocated blocks, holes
+    excluded) so the savings can be checked per job, then removes its
+    torrent and calls cleanup(). Bytes already there when the job started
+    (a torrent sampled before, in 'keep' mode) are not counted.
+    """
+
+    def __init__(self, mode='keep', scratch_dir=None, quota_bytes=1 << 30):
+        if mode not in MODES:
+            raise ValueError(f"Unknown sample storage mode: {mode} (choose from {', '.join(MODES)})")
+        self.mode = mode
+        self.scratch_dir = scratch_dir or _default_scratch_dir()
+        self.quota_bytes = quota_bytes
+        self.lock = threading.Lock()
+        self.reserved = {}   # download_id -> bytes reserved in the scratch area
+        self.baselines = {}  # download_id -> bytes allocated before the job started
+        self.counters = {'jobs': 0, 'disk_bytes': 0, 'max_job_disk_bytes': 0, 'files': 0, 'spills': 0}
+
+        if mode == 'scratch':
+            os.makedirs(self.scratch_dir, exist_ok=True)
+
+    @property
+    def deletes_files(self):
+        return self.mode != 'keep'
+
+    def acquire(self, download_id, info, expected_bytes, save_path):
+        """
+        Where a job writing about `expected_bytes` of a torrent's pieces
+        should save them: its scratch directory, or `save_path` (its usual
+        folder)
+        """
+        path = save_path
+        if self.mode == 'scratch':
+            with self.lock:
+                if download_id in self.reserved:
+                    path = self._scratch_path(download_id)
+                elif sum(self.reserved.values()) + expected_bytes > self.quota_bytes:
+                    self.counters['spills'] += 1
+                else:
+                    self.reserved[download_id] = expected_bytes
+                    path = self._scratch_path(download_id)
+
+        baseline, _ = allocated_bytes(info, path)
+        with self.lock:
+            self.baselines[download_id] = baseline
+        return path
+
+    def release(self, download_id, info, save_path):
+        """
+        Account a finished job's files: returns the bytes the job added to
+        the torrent's files under save_path.
+        """
+        disk_bytes, files = allocated_bytes(info, save_path)
+        with self.lock:
+            disk_bytes = max(0, disk_bytes - self.baselines.pop(download_id, 0))
+            self.counters['jobs'] += 1
+            self.counters['disk_bytes'] += disk_bytes
+            self.counters['files'] += files
+            self.counters['max_job_disk_bytes'] = max(self.counters['max_job_disk_bytes'], disk_bytes)
+        return disk_bytes
+
+    def cleanup(self, download_id):
+        """Free a job's scratch quota and directory (after its torrent is removed)"""
+        with self.lock:
+            reserved = self.reserved.pop(download_id, None)
+            self.baselines.pop(download_id, None)
+        if reserved is not None:
+            shutil.rmtree(self._scratch_path(download_id), ignore_errors=True)
+
+    def _scratch_path(self, download_id):
+        return os.path.join(self.scratch_dir, download_id)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['scratch_reserved_bytes'] = sum(self.reserved.values())
+        stats['mode'] = self.mode
+        stats['avg_job_disk_bytes'] = stats['disk_bytes'] // stats['jobs'] if stats['jobs'] else 0
+        if self.mode == 'scratch':
+            stats['scratch_dir'] = self.scratch_dir
+            stats['quota_bytes'] = self.quota_bytes
+        return stats
+
+
+def allocated_bytes(info, save_path):
+    """(bytes allocated on disk, files present) for a torrent's files under save_path"""
+    disk_bytes, files = 0, 0
+    storage = info.files()
+    for i in range(storage.num_files()):
+        try:
+            st = os.stat(os.path.join(save_path, storage.file_path(i)))
+        except OSError:
+            continue
+        disk_bytes += st.st_blocks * 512
+        files += 1
+    return disk_bytes, files
+
+
+def _default_scratch_dir():
+    # tmpfs where there is one, so scratch pieces never touch a real disk
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'torrent-scratch')
+
+
+_sample_storage = None
+_sample_storage_lock = threading.Lock()
+
+
+def get_sample_storage():
+    """
+    Return the process-wide SampleStorage, configured from:
+        SAMPLE_STORAGE        keep | delete | scratch (default: keep)
+        SCRATCH_DIR           scratch area (default: /dev/shm/torrent-scratch)
+        SCRATCH_QUOTA_BYTES   sample budget reserved in the scratch area (default: 1 GiB)
+    """
+    global _sample_storage
+
+    with _sample_storage_lock:
+        if _sample_storage is None:
+            _sample_storage = SampleStorage(
+                mode=os.environ.get('SAMPLE_STORAGE', 'keep'),
+                scratch_dir=os.environ.get('SCRATCH_DIR') or None,
+                quota_bytes=int(os.environ.get('SCRATCH_QUOTA_BYTES', 1 << 30))
+            )
+        return _sample_storage
@@ -0,0 +1,315 @@
+import libtorrent as lt
+import random
+
+from file_index import KINDS, KIND_PRIORITY, get_file_index, kind_from_name
+
+
+class SamplingBudget:
+    """
+    How much of a torrent to sample: a piece budget, a byte budget, or both
+    (whichever is smaller wins). One budget is shared by every strategy
+    contributing to a sample.
+    """
+
+    def __init__(self, max_pieces=None, max_bytes=None):
+        if max_pieces is None and max_bytes is None:
+            max_pieces = 10
+        self.max_pieces = _budget_value('num_pieces', max_pieces)
+        self.max_bytes = _budget_value('max_bytes', max_bytes)
+
+    def pieces(self, info):
+        limits = [info.num_pieces()]
+        if self.max_pieces is not None:
+            limits.append(self.max_pieces)
+        if self.max_bytes is not None:
+            limits.append(max(1, self.max_bytes // info.piece_length()))
+        return min(limits)
+
+    def to_dict(self):
+        return {'max_pieces': self.max_pieces, 'max_bytes': self.max_bytes}
+
+
+def _budget_value(name, value):
+    """A budget limit as a non-negative int (None for no limit); ValueError otherwise"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{name} must be a non-negative integer")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a non-negative integer") from None
+    if value < 0:
+        raise ValueError(f"{name} must be a non-negative integer")
+    return value
+
+
+# ============= STRATEGIES =============
+
+class SamplingStrategy:
+    """
+    Decides which pieces of a torrent are worth downloading.
+
+    order(info, budget) yields candidate pieces, best first; the caller
+    takes as many as the budget allows (skipping pieces it already has a
+    verdict for), so it may yield more than `budget`.
+
+    Adaptive strategies hold back `adaptive_share` of the budget and spend
+    it through feedback(), which sees every scan result and may return
+    more pieces to fetch. Whatever is left once the first round is
+    scanned is filled from order().
+    """
+
+    name = 'base'
+    adaptive_share = 0.0
+
+    def order(self, info, budget):
+        raise NotImplementedError
+
+    def feedback(self, info, piece_index, scan_result):
+        return []
+
+
+class FirstPiecesStrategy(SamplingStrategy):
+    """Pieces 0..N-1 (the original behaviour)"""
+
+    name = 'first'
+
+    def order(self, info, budget):
+        return range(info.num_pieces())
+
+
+class TailPiecesStrategy(SamplingStrategy):
+    """Last pieces first: trailers, appended payloads, archive directories"""
+
+    name = 'tail'
+
+    def order(self, info, budget):
+        return range(info.num_pieces() - 1, -1, -1)
+
+
+class FileHeadsStrategy(SamplingStrategy):
+    """
+    The first piece of every file (headers, magic bytes), using the file
+    storage piece mapping. Pad files and empty files are skipped; pieces
+    shared by several small files are only fetched once.
+    """
+
+    name = 'file-heads'
+
+    def order(self, info, budget):
+        files = info.files()
+        seen = set()
+        for file_index in range(files.num_files()):
+            if files.file_size(file_index) == 0:
+                continue
+            if files.file_flags(file_index) & lt.file_storage.flag_pad_file:
+                continue
+            piece = info.map_file(file_index, 0, 1).piece
+            if piece not in seen:
+                seen.add(piece)
+                yield piece
+
+
+class FileTypeStrategy(SamplingStrategy):
+    """
+    Budget by file type (file_index.py): executables, then archives,
+    documents, other files and media last; pad files never.
+
+    First the head piece of every file (magic bytes), then the tail of
+    every executable, archive and document (PE overlays, ZIP central
+    directories), then the remaining pieces kind by kind, files of a kind
+    taking turns and each file's pieces spread coarse to fine (ends,
+    middle, quarters...). Kinds are re-read at each step, so files the download sniffed
+    as executables (see FileIndex.sniff) move up.
+
+    The held-back share goes to files whose magic bytes outrank their
+    extension and to the pieces next to a detection.
+    """
+
+    name = 'file-types'
+    adaptive_share = 0.25
+
+    def order(self, info, budget):
+        # Heads and tails come back in the spreads, and a piece may hold
+        # several small files: each piece is yielded once
+        seen = set()
+        for piece in self._candidates(get_file_index(info)):
+            if piece not in seen:
+                seen.add(piece)
+                yield piece
+
+    @staticmethod
+    def _candidates(files):
+        for file_index in files.by_priority():
+            yield files.pieces(file_index)[0]
+
+        for file_index in files.by_priority():
+            if KIND_PRIORITY[files.kinds[file_index]] < KIND_PRIORITY['other']:
+                yield files.pieces(file_index)[-1]
+
+        for kind in KINDS:
+            spreads = [_spread(files.pieces(i)) for i in files.by_priority() if files.kinds[i] == kind]
+            while spreads:
+                for spread in list(spreads):
+                    piece = next(spread, None)
+                    if piece is None:
+                        spreads.remove(spread)
+                    else:
+                        yield piece
+
+    def feedback(self, info, piece_index, scan_result):
+        files = get_file_index(info)
+        pieces = []
+        for entry in scan_result.get('files') or []:
+            file_index = entry['file_index']
+            file_pieces = files.pieces(file_index)
+            if KIND_PRIORITY[entry['kind']] < KIND_PRIORITY[kind_from_name(entry['path'])]:
+                # Disguised file (e.g. an executable named .mp4): its tail and middle
+                pieces.extend([file_pieces[-1], file_pieces[len(file_pieces) // 2]])
+            if scan_result.get('malicious'):
+                pieces.extend(i for i in (piece_index + 1, piece_index - 1) if i in file_pieces)
+        return list(dict.fromkeys(pieces))
+
+
+def _spread(pieces):
+    """A file's pieces coarse to fine: both ends, the middle, the quarters..."""
+    last = len(pieces) - 1
+    seen = set()
+    parts = 1
+    while len(seen) <= last:
+        for k in range(parts + 1):
+            i = k * last // parts
+            if i not in seen:
+                seen.add(i)
+                yield pieces[i]
+        parts *= 2
+
+
+class StratifiedRandomStrategy(SamplingStrategy):
+    """
+    Split the torrent into `budget` equal strata and pick a random piece
+    from each, so the sample covers the whole torrent evenly.
+    """
+
+    name = 'stratified'
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def order(self, info, budget):
+        total = info.num_pieces()
+        strata_count = max(1, min(budget, total))
+
+        strata = []
+        for s in range(strata_count):
+            stratum = list(range(s * total // strata_count, (s + 1) * total // strata_count))
+            self.random.shuffle(stratum)
+            strata.append(stratum)
+
+        # One piece per stratum per round, until every stratum is drained
+        for round_index in range(max(len(stratum) for stratum in strata)):
+            for stratum in strata:
+                if round_index < len(stratum):
+                    yield stratum[round_index]
+
+
+class EntropyGuidedStrategy(SamplingStrategy):
+    """
+    Start with a stratified sample, then spend the held-back budget around
+    pieces whose scan reported high entropy (packed/encrypted payloads) or
+    an outright detection: the neighbouring pieces are fetched next.
+    """
+
+    name = 'entropy'
+    adaptive_share = 0.5
+
+    def __init__(self, threshold=7.2, seed=None):
+        self.threshold = threshold
+        self.stratified = StratifiedRandomStrategy(seed)
+
+    def order(self, info, budget):
+        return self.stratified.order(info, budget)
+
+    def feedback(self, info, piece_index, scan_result):
+        entropy = (scan_result.get('features') or {}).get('entropy', 0.0)
+        if not scan_result.get('malicious') and entropy < self.threshold:
+            return []
+        return [i for i in (piece_index + 1, piece_index - 1) if 0 <= i < info.num_pieces()]
+
+
+class MixedStrategy(SamplingStrategy):
+    """
+    Several strategies sharing one budget: their candidate orders are
+    interleaved round-robin (duplicates dropped).
+    """
+
+    name = 'mixed'
+
+    def __init__(self, strategies):
+        self.strategies = strategies
+        self.adaptive_share = max((s.adaptive_share for s in strategies), default=0.0)
+
+    def order(self, info, budget):
+        seen = set()
+        iterators = [iter(s.order(info, budget)) for s in self.strategies]
+        while iterators:
+            for iterator in list(iterators):
+                for piece in iterator:
+                    if piece not in seen:
+                        seen.add(piece)
+                        yield piece
+                        break
+                else:
+                    iterators.remove(iterator)
+
+    def feedback(self, info, piece_index, scan_result):
+        pieces = []
+        for strategy in self.strategies:
+            pieces.extend(strategy.feedback(info, piece_index, scan_result))
+        return pieces
+
+
+def select_pieces(strategy, info, budget):
+    """
+    Non-adaptive selection: the first pieces of strategy.order() that fit
+    the budget (a SamplingBudget), as a list in fetch order.
+    """
+    limit = budget.pieces(info)
+    selected = []
+    seen = set()
+    for piece in strategy.order(info, limit):
+        if len(selected) >= limit:
+            break
+        if piece not in seen:
+            seen.add(piece)
+            selected.append(piece)
+    return selected
+
+
+STRATEGIES = {
+    'first': FirstPiecesStrategy,
+    'tail': TailPiecesStrategy,
+    'file-heads': FileHeadsStrategy,
+    'file-types': FileTypeStrategy,
+    'stratified': StratifiedRandomStrategy,
+    'entropy': EntropyGuidedStrategy,
+}
+
+
+def create_strategy(spec='first'):
+    """
+    Build a strategy from a name ('first', 'tail', 'file-heads',
+    'file-types', 'stratified', 'entropy') or a '+'-joined mix such as 'file-heads+tail'.
+    """
+    spec = spec or 'first'
+    if not isinstance(spec, str):
+        raise ValueError(f"strategy must be a string, not {type(spec).__name__}")
+    names = [name.strip() for name in spec.split('+') if name.strip()]
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown or not names:
+        raise ValueError(f"Unknown sampling strategy: {spec} "
+                         f"(choose from {', '.join(STRATEGIES)})")
+
+    strategies = [STRATEGIES[name]() for name in names]
+    return strategies[0] if len(strategies) == 1 else MixedStrategy(strategies)
@@ -0,0 +1,273 @@
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.util
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from piece_arena import SharedPieceArena, attach
+from scanners import load_scanner, scan_batch, scanner_version
+
+
+# ============= WORKER PROCESS SIDE =============
+
+# Loaded once per worker process by _init_worker, reused for every piece
+_worker_scanner = None
+_worker_arena = None
+
+
+def _init_worker(scanner_spec, arena_name=None):
+    global _worker_scanner, _worker_arena
+    _worker_scanner = load_scanner(scanner_spec)
+    if arena_name:
+        _worker_arena = attach(arena_name)
+    threading.Thread(target=_exit_with_parent, name='parent-watch', daemon=True).start()
+
+
+def _exit_with_parent():
+    """A worker whose server was killed (SIGTERM, no exit handlers) would wait for work forever"""
+    multiprocessing.connection.wait([multiprocessing.parent_process().sentinel])
+    os._exit(0)
+
+
+def _scan_batch_in_worker(pieces):
+    """
+    piece_data is either the bytes themselves or an (offset, length) extent
+    of the shared arena, handed to the scanner as a memoryview
+    """
+    views = []
+    batch = []
+    for piece_index, piece_hash, data in pieces:
+        if isinstance(data, tuple):
+            offset, length = data
+            data = _worker_arena.buf[offset:offset + length]
+            views.append(data)
+        batch.append((piece_index, piece_hash, data))
+
+    try:
+        return scan_batch(_worker_scanner, batch)
+    finally:
+        # The extents are reused once we return: no view may outlive the scan
+        del batch
+        for view in views:
+            try:
+                view.release()
+            except BufferError:
+                pass  # still exported by an object the scanner kept; freed with it
+
+
+def _scanner_version_in_worker():
+    return scanner_version(_worker_scanner)
+
+
+# ============= EXECUTORS =============
+
+class InlineScannerExecutor:
+    """Runs the scanner on the calling (pipeline worker) thread"""
+
+    backend = 'inline'
+
+    def __init__(self, scanner_spec=None, workers=2):
+        self.scanner = load_scanner(scanner_spec)
+        self.version = scanner_version(self.scanner)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.counters = {'scans': 0, 'timeouts': 0, 'crashes': 0, 'restarts': 0}
+
+    def scan(self, piece_index, piece_hash, piece_data):
+        return self.scan_batch([(piece_index, piece_hash, piece_data)])[0]
+
+    def scan_batch(self, pieces):
+        with self.lock:
+            self.counters['scans'] += len(pieces)
+        return scan_batch(self.scanner, pieces)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, backend=self.backend, workers=self.workers,
+                        version=self.version)
+
+
+class ProcessScannerExecutor:
+    """
+    Runs the scanner in a ProcessPoolExecutor so CPU-heavy models never hold
+    the server's GIL. The model is loaded once per worker process.
+
+    scan() blocks the calling pipeline thread (not the server) for at most
+    `timeout` seconds. A timed-out scan or a crashed worker restarts the
+    pool; a crash is retried once on the fresh pool.
+
+    With `shm_bytes`, piece buffers go through a SharedPieceArena: one copy
+    into shared memory, and workers receive only (offset, length). Pieces
+    that don't fit (or don't get space in time) are pickled as before.
+    Scanners then get a memoryview as piece_data, valid during the call.
+    'copies' counts user-space copies of piece bytes: 1 per shared piece,
+    2 per pickled one (serialize + deserialize).
+    """
+
+    backend = 'process'
+
+    def __init__(self, scanner_spec=None, workers=2, timeout=30, shm_bytes=0):
+        self.scanner_spec = scanner_spec
+        self.workers = workers
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.counters = {'scans': 0, 'timeouts': 0, 'crashes': 0, 'restarts': 0,
+                         'shared_pieces': 0, 'pickled_pieces': 0, 'copies': 0}
+        self.arena = SharedPieceArena(shm_bytes) if shm_bytes else None
+        # spawn, not fork: the parent runs libtorrent and alert threads
+        self.context = multiprocessing.get_context('spawn')
+        self.pool = self._new_pool()
+        self._version = None
+
+        # Idle workers wait for work forever: shut them down when this process
+        # exits. A multiprocessing finalizer also runs when the owner is itself
+        # a multiprocessing child (bench_swarm.py), where atexit never does and
+        # the child waits for its own children before exiting. It has to run
+        # before the pool's queues close theirs (exitpriority 10).
+        multiprocessing.util.Finalize(self, ProcessScannerExecutor._shutdown,
+                                      args=(self.__dict__,), exitpriority=100)
+
+    @property
+    def version(self):
+        """Scanner name:version, asked once from a worker (the parent never loads the model)"""
+        if self._version is None:
+            self._version = self.pool.submit(_scanner_version_in_worker).result(timeout=self.timeout)
+        return self._version
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self.context,
+            initializer=_init_worker,
+            initargs=(self.scanner_spec, self.arena.name if self.arena else None)
+        )
+
+    def close(self):
+        """Stop the worker processes and free the arena"""
+        ProcessScannerExecutor._shutdown(self.__dict__)
+
+    @staticmethod
+    def _shutdown(state):
+        # Takes the instance's __dict__, not the instance: the finalizer
+        # mustn't keep the executor alive, and pools change on restart
+        state['pool'].shutdown(wait=True, cancel_futures=True)
+        if state['arena'] is not None:
+            state['arena'].close()
+
+    def _restart(self, broken_pool):
+        with self.lock:
+            if self.pool is not broken_pool:
+                return  # another thread already replaced it
+            self.pool = self._new_pool()
+            self.counters['restarts'] += 1
+
+        # Hung workers never exit on their own; shutdown() alone won't stop them
+        for process in list((broken_pool._processes or {}).values()):
+            process.terminate()
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+    def scan(self, piece_index, piece_hash, piece_data):
+        return self.scan_batch([(piece_index, piece_hash, piece_data)])[0]
+
+    def scan_batch(self, pieces):
+        """Scan a batch in one worker task; the timeout covers the whole batch"""
+        extents = []
+        if self.arena is not None:
+            shared = []
+            for piece_index, piece_hash, data in pieces:
+                # Only wait for space while holding none: the batch can't
+                # wait on extents it holds itself
+                extent = self.arena.put(data, timeout=0 if extents else 1.0)
+                if extent is not None:
+                    extents.append(extent)
+                    data = extent
+                shared.append((piece_index, piece_hash, data))
+            pieces = shared
+
+        with self.lock:
+            self.counters['scans'] += len(pieces)
+            self.counters['shared_pieces'] += len(extents)
+            self.counters['pickled_pieces'] += len(pieces) - len(extents)
+            self.counters['copies'] += len(extents) + 2 * (len(pieces) - len(extents))
+
+        try:
+            return self._submit(pieces)
+        finally:
+            for offset, length in extents:
+                self.arena.free(offset, length)
+
+    def _submit(self, pieces):
+        for _ in range(2):
+            pool = self.pool
+            try:
+                future = pool.submit(_scan_batch_in_worker, pieces)
+                return future.result(timeout=self.timeout)
+
+            except FutureTimeoutError:
+                with self.lock:
+                    self.counters['timeouts'] += 1
+                self._restart(pool)
+                return self._failed(f'scan timed out after {self.timeout}s', len(pieces))
+
+            except BrokenProcessPool:
+                with self.lock:
+                    self.counters['crashes'] += 1
+                self._restart(pool)
+
+        return self._failed('scanner worker crashed', len(pieces))
+
+    @staticmethod
+    def _failed(error, count):
+        timestamp = datetime.now().isoformat()
+        return [{
+            'malicious': None,
+            'confidence': 0.0,
+            'error': error,
+            'timestamp': timestamp
+        } for _ in range(count)]
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, backend=self.backend, workers=self.workers,
+                         timeout=self.timeout, version=self._version)
+        stats['copies_per_piece'] = round(stats['copies'] / stats['scans'], 3) if stats['scans'] else 0.0
+        if self.arena is not None:
+            stats['arena'] = self.arena.stats()
+        return stats
+
+
+_scanner_executor = None
+_scanner_executor_lock = threading.Lock()
+
+
+def get_scanner_executor():
+    """
+    Return the process-wide scanner executor, configured from:
+        SCANNER            "module:factory" spec (default: placeholder scanner)
+        SCANNER_EXECUTOR   inline | process (default: process for the placeholder
+                           scanner, whose signature regex holds the GIL for a
+                           whole piece; inline for a SCANNER spec)
+        SCANNER_WORKERS    worker count (default: 2)
+        SCANNER_TIMEOUT    per-scan timeout in seconds, process backend (default: 30)
+        SCANNER_SHM_BYTES  shared memory arena for piece buffers, process backend
+                           (default: 64 MiB; 0 pickles every piece)
+    """
+    global _scanner_executor
+
+    with _scanner_executor_lock:
+        if _scanner_executor is None:
+            spec = os.environ.get('SCANNER')
+            workers = int(os.environ.get('SCANNER_WORKERS', 2))
+
+            backend = os.environ.get('SCANNER_EXECUTOR') or ('inline' if spec else 'process')
+            if backend == 'process':
+                _scanner_executor = ProcessScannerExecutor(
+                    spec, workers, timeout=float(os.environ.get('SCANNER_TIMEOUT', 30)),
+                    shm_bytes=int(os.environ.get('SCANNER_SHM_BYTES', 64 * 2**20))
+                )
+            else:
+                _scanner_executor = InlineScannerExecutor(spec, workers)
+        return _scanner_executor
@@ -0,0 +1,70 @@
+import importlib
+from datetime import datetime
+
+from features import extract_features_batch, summarize
+from signatures import load_ruleset
+
+
+class PlaceholderScanner:
+    """
+    🔬 Default scanner until the ML model lands: byte features plus the
+    signature ruleset (signatures.py), whose hits set the verdict.
+    A scanner is any object with `name`, `version` and
+    scan(piece_index, piece_hash, piece_data) -> dict. Scanners may also
+    provide scan_batch(pieces) -> [dict], where pieces is a list of
+    (piece_index, piece_hash, piece_data); see scan_batch() below.
+    """
+
+    name = 'placeholder'
+
+    def __init__(self):
+        self.ruleset = load_ruleset()
+        # Verdicts change with the signatures: their digest is part of the version
+        self.version = f'1+{self.ruleset.digest[:12]}'
+
+    def scan(self, piece_index, piece_hash, piece_data):
+        return self.scan_batch([(piece_index, piece_hash, piece_data)])[0]
+
+    def scan_batch(self, pieces):
+        # Features for the whole batch in one vectorized pass (features.py)
+        features = extract_features_batch([data for _, _, data in pieces], ngrams=False)
+
+        # TODO: Integrate ML model here
+        # Example:
+        # predictions = ml_model.predict(np.hstack([features['histogram'], ...]))
+        # return [{'malicious': p, 'confidence': c} for p, c in predictions]
+
+        timestamp = datetime.now().isoformat()
+        return [dict(self.ruleset.scan(data), **{
+            'scanner': self.name,
+            'bytes_scanned': int(features['length'][row]),
+            'features': summarize(features, row),
+            'timestamp': timestamp
+        }) for row, (_, _, data) in enumerate(pieces)]
+
+
+def scan_batch(scanner, pieces):
+    """Scan a batch with scanner.scan_batch, or piece by piece if it has none"""
+    if hasattr(scanner, 'scan_batch'):
+        return scanner.scan_batch(pieces)
+    return [scanner.scan(piece_index, piece_hash, data) for piece_index, piece_hash, data in pieces]
+
+
+def scanner_version(scanner):
+    """Identifies the verdicts a scanner produces; part of the verdict cache key"""
+    return f"{getattr(scanner, 'name', type(scanner).__name__)}:{getattr(scanner, 'version', '0')}"
+
+
+def load_scanner(spec=None):
+    """
+    Build a scanner from a "package.module:factory" spec.
+    The factory is called with no arguments, so this is where a model
+    should be loaded (once per process).
+    """
+    if not spec:
+        return PlaceholderScanner()
+
+    module_name, _, attr = spec.partition(':')
+    module = importlib.import_module(module_name)
+    factory = getattr(module, attr or 'create_scanner')
+    return factory()
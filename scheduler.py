@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+
+class QueueFull(Exception):
+    """Raised by DownloadScheduler.submit() when no more jobs can be queued"""
+
+
+class DownloadScheduler:
+    """
+    Admission control for downloads: a fixed pool of `max_active` worker
+    threads runs jobs off a priority queue, so a burst of submissions
+    waits in line instead of spawning a thread and a torrent each.
+
+    Higher `priority` runs first. Within a priority, submitters take
+    turns: a job's place is set by how many jobs its submitter already
+    has waiting, so one client queueing 100 jobs doesn't hold back
+    another client's single job. The caller must pick a submitter key the
+    client can't choose (the API uses its address). Queued jobs can be
+    cancelled.
+    """
+
+    def __init__(self, max_active=4, max_queued=1000):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.condition = threading.Condition()
+        self.heap = []   # (-priority, submitter round, sequence, job_id)
+        self.jobs = {}   # job_id -> job record, while queued or running
+        self.waiting = {}  # submitter -> queued job count
+        self.sequence = itertools.count()
+        self.active = 0
+        self.counters = {'submitted': 0, 'started': 0, 'completed': 0, 'failed': 0,
+                         'cancelled': 0, 'rejected': 0}
+        self.wait_times = deque(maxlen=1000)  # seconds queued, most recent jobs
+
+        self.workers = [
+            threading.Thread(target=self._worker, name=f'download-worker-{i}', daemon=True)
+            for i in range(max(1, max_active))
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job_id, fn, submitter='anonymous', priority=0):
+        """
+        Queue fn() to run on a worker. Returns the job's queue position
+        (0 = next to start); raises QueueFull when the queue is at capacity.
+        """
+        with self.condition:
+            if job_id in self.jobs:
+                raise ValueError(f'Job {job_id} already scheduled')
+            if self.queued() >= self.max_queued:
+                self.counters['rejected'] += 1
+                raise QueueFull(f'{self.max_queued} jobs already queued')
+
+            turn = self.waiting.get(submitter, 0)
+            self.waiting[submitter] = turn + 1
+            entry = (-int(priority), turn, next(self.sequence), job_id)
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'fn': fn,
+                'submitter': submitter,
+                'priority': int(priority),
+                'state': 'queued',
+                'entry': entry,
+                'submitted_at': time.time(),
+                'started_at': None
+            }
+            heapq.heappush(self.heap, entry)
+            self.counters['submitted'] += 1
+            self.condition.notify()
+            return self._position(job_id)
+
+    def cancel(self, job_id):
+        """Remove a job that hasn't started yet; False if it is running or unknown"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job['state'] != 'queued':
+                return False
+
+            del self.jobs[job_id]
+            self.heap.remove(job['entry'])
+            heapq.heapify(self.heap)
+            self._left_queue(job)
+            self.counters['cancelled'] += 1
+            return True
+
+    def position(self, job_id):
+        """0-based queue position, or None if the job isn't queued"""
+        with self.condition:
+            return self._position(job_id)
+
+    def _position(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job['state'] != 'queued':
+            return None
+        return sum(1 for entry in self.heap if entry < job['entry'])
+
+    def queued(self):
+        return len(self.heap)
+
+    def queued_jobs(self):
+        """Queued jobs in start order (JSON-friendly)"""
+        with self.condition:
+            return [{
+                'job_id': job_id,
+                'submitter': self.jobs[job_id]['submitter'],
+                'priority': self.jobs[job_id]['priority'],
+                'queue_position': position,
+                'submitted_at': self.jobs[job_id]['submitted_at']
+            } for position, (_, _, _, job_id) in enumerate(sorted(self.heap))]
+
+    def _left_queue(self, job):
+        remaining = self.waiting[job['submitter']] - 1
+        if remaining:
+            self.waiting[job['submitter']] = remaining
+        else:
+            del self.waiting[job['submitter']]
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.heap:
+                    self.condition.wait()
+                job = self.jobs[heapq.heappop(self.heap)[3]]
+                self._left_queue(job)
+                job['state'] = 'running'
+                job['started_at'] = time.time()
+                self.wait_times.append(job['started_at'] - job['submitted_at'])
+                self.active += 1
+                self.counters['started'] += 1
+
+            outcome = 'completed'
+            try:
+                job['fn']()
+            except Exception as e:
+                outcome = 'failed'
+                print(f"⚠ Download job {job['job_id']} failed: {e}")
+            finally:
+                with self.condition:
+                    self.active -= 1
+                    self.counters[outcome] += 1
+                    self.jobs.pop(job['job_id'], None)
+
+    def stats(self):
+        with self.condition:
+            waits = sorted(self.wait_times)
+            oldest = min((job['submitted_at'] for job in self.jobs.values()
+                          if job['state'] == 'queued'), default=None)
+            stats = dict(self.counters)
+            stats.update({
+                'max_active': self.max_active,
+                'active': self.active,
+                'queue_depth': len(self.heap),
+                'submitters_waiting': len(self.waiting),
+                'oldest_queued_seconds': round(time.time() - oldest, 3) if oldest else 0.0
+            })
+
+        if waits:
+            stats['wait_seconds'] = {
+                'avg': round(sum(waits) / len(waits), 3),
+                'p50': round(waits[len(waits) // 2], 3),
+                'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3),
+                'max': round(waits[-1], 3)
+            }
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Return the process-wide DownloadScheduler, configured from:
+        SCHEDULER_MAX_ACTIVE   concurrent downloads / worker threads (default: 4)
+        SCHEDULER_MAX_QUEUED   queued jobs before submissions are refused (default: 1000)
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = DownloadScheduler(
+                max_active=int(os.environ.get('SCHEDULER_MAX_ACTIVE', 4)),
+                max_queued=int(os.environ.get('SCHEDULER_MAX_QUEUED', 1000))
+            )
+        return _scheduler
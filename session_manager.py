@@ -0,0 +1,192 @@
+import libtorrent as lt
+import atexit
+import os
+import threading
+import time
+from alert_engine import AlertEngine
+from session_profiles import DEFAULT_PROFILE, create_session, save_session_state
+from presets import apply_session_preset
+
+
+class TorrentBusy(RuntimeError):
+    """A torrent is already being downloaded; `download_id` is the download that has it"""
+
+    def __init__(self, download_id):
+        super().__init__(f'Torrent is already being downloaded (download {download_id})')
+        self.download_id = download_id
+
+
+class SessionManager:
+    """
+    Process-wide owner of the libtorrent session(s).
+    Every download becomes a torrent handle on a shared session instead of
+    bootstrapping its own session, DHT table and port mappings.
+    Sessions are started with a named profile (see session_profiles.py);
+    with DHT on, each session's routing table is saved to `state_path`
+    at exit and reloaded on the next start. `preset` names a performance
+    preset (see presets.py) applied to every session.
+    """
+
+    def __init__(self, pool_size=1, base_port=6881, profile=DEFAULT_PROFILE, state_path=None,
+                 preset=None):
+        self.profile = profile
+        self.state_path = state_path
+        self.preset = None
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.alert_engines = []
+        self.torrent_counts = []
+        self.downloads = {}  # download_id -> bookkeeping record
+        self.info_hashes = {}  # info hash -> download_id
+
+        for i in range(max(1, pool_size)):
+            session = create_session(profile, base_port + i, self._state_path(i))
+            engine = AlertEngine(session)
+            engine.start()
+
+            self.sessions.append(session)
+            self.alert_engines.append(engine)
+            self.torrent_counts.append(0)
+
+        if preset:
+            self.apply_preset(preset)
+
+        atexit.register(self.save_state)
+
+        print(f"Session manager initialized with {len(self.sessions)} session(s) "
+              f"({profile} profile).")
+
+    def _state_path(self, index):
+        """One DHT state file per session (each has its own node id)"""
+        if not self.state_path or index == 0:
+            return self.state_path
+        return f"{self.state_path}.{index}"
+
+    def apply_preset(self, name):
+        """Switch every session to a performance preset (ValueError if unknown)"""
+        with self.lock:
+            for session in self.sessions:
+                apply_session_preset(session, name)
+            self.preset = name
+
+    def save_state(self):
+        """Persist every session's DHT state (called at exit)"""
+        for i, session in enumerate(self.sessions):
+            try:
+                save_session_state(session, self._state_path(i))
+            except Exception as e:
+                print(f"⚠ Could not save DHT state: {e}")
+
+    def add_torrent(self, download_id, params, listener=None):
+        """
+        Add a torrent to the least loaded session and track it under download_id.
+        The listener is registered with the session's AlertEngine before the
+        torrent is added so no early alert is missed. `params` is a dict or
+        an lt.add_torrent_params (e.g. from lt.read_resume_data).
+        """
+        ti = params['ti'] if isinstance(params, dict) else params.ti
+        info_hash = str(ti.info_hash())
+
+        with self.lock:
+            if download_id in self.downloads:
+                raise RuntimeError(f'Download {download_id} already has a torrent')
+            if info_hash in self.info_hashes:
+                raise TorrentBusy(self.info_hashes[info_hash])
+
+            index = self.torrent_counts.index(min(self.torrent_counts))
+            if listener is not None:
+                self.alert_engines[index].register(info_hash, listener)
+
+            try:
+                handle = self.sessions[index].add_torrent(params)
+            except Exception:
+                self.alert_engines[index].unregister(info_hash)
+                raise
+
+            self.torrent_counts[index] += 1
+            self.info_hashes[info_hash] = download_id
+            self.downloads[download_id] = {
+                'handle': handle,
+                'session_index': index,
+                'info_hash': info_hash,
+                'added_at': time.time()
+            }
+
+        return handle
+
+    def remove_torrent(self, download_id, delete_files=False):
+        """Remove a download's torrent from its session (safe to call twice)"""
+        with self.lock:
+            record = self.downloads.pop(download_id, None)
+            if record is None:
+                return False
+
+            self.torrent_counts[record['session_index']] -= 1
+            self.info_hashes.pop(record['info_hash'], None)
+
+        self.alert_engines[record['session_index']].unregister(record['info_hash'])
+
+        session = self.sessions[record['session_index']]
+        if delete_files:
+            session.remove_torrent(record['handle'], lt.session.delete_files)
+        else:
+            session.remove_torrent(record['handle'])
+        return True
+
+    def get_handle(self, download_id):
+        with self.lock:
+            record = self.downloads.get(download_id)
+            return record['handle'] if record else None
+
+    def session_for(self, download_id):
+        with self.lock:
+            record = self.downloads.get(download_id)
+            return self.sessions[record['session_index']] if record else None
+
+    def handles(self):
+        """[(download_id, handle)] for every torrent currently in a session"""
+        with self.lock:
+            return [(download_id, record['handle']) for download_id, record in self.downloads.items()]
+
+    def info_hashes_by_download(self):
+        """{download_id: info hash} for every torrent currently in a session"""
+        with self.lock:
+            return {download_id: record['info_hash'] for download_id, record in self.downloads.items()}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'sessions': len(self.sessions),
+                'torrents_per_session': list(self.torrent_counts),
+                'active_torrents': len(self.downloads),
+                'profile': self.profile,
+                'preset': self.preset or 'default'
+            }
+
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager():
+    """
+    Return the process-wide SessionManager, creating it on first use:
+        TORRENT_SESSION_POOL_SIZE   sessions (default: 1)
+        TORRENT_LISTEN_PORT         first listen port (default: 6881)
+        TORRENT_PROFILE             offline | tracker-only | full-swarm (default)
+        DHT_STATE_PATH              saved DHT state (default: ./state/dht.dat)
+        TORRENT_PRESET              performance preset (default: libtorrent defaults)
+    """
+    global _session_manager
+
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = SessionManager(
+                pool_size=int(os.environ.get('TORRENT_SESSION_POOL_SIZE', 1)),
+                base_port=int(os.environ.get('TORRENT_LISTEN_PORT', 6881)),
+                profile=os.environ.get('TORRENT_PROFILE', DEFAULT_PROFILE),
+                state_path=os.environ.get('DHT_STATE_PATH',
+                                          os.path.join(os.getcwd(), 'state', 'dht.dat')),
+                preset=os.environ.get('TORRENT_PRESET') or None
+            )
+        return _session_manager
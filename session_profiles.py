@@ -0,0 +1,104 @@
+import libtorrent as lt
+import os
+from alert_engine import ALERT_MASK
+
+
+DHT_ROUTERS = [
+    ("router.bittorrent.com", 6881),
+    ("router.utorrent.com", 6881),
+    ("dht.transmissionbt.com", 6881),
+]
+
+# Settings shared by every profile
+BASE_SETTINGS = {
+    'alert_mask': ALERT_MASK,
+    'announce_to_all_trackers': True,
+    'announce_to_all_tiers': True,
+}
+
+PROFILES = {
+    # Air-gapped lab and tests: loopback only, no discovery, no port mapping
+    'offline': {
+        'listen_host': '127.0.0.1',
+        'settings': {
+            'enable_dht': False,
+            'enable_lsd': False,
+            'enable_upnp': False,
+            'enable_natpmp': False,
+            'allow_multiple_connections_per_ip': True,
+        },
+        'dht_routers': [],
+    },
+    # Peers come from the torrent's trackers only
+    'tracker-only': {
+        'listen_host': '0.0.0.0',
+        'settings': {
+            'enable_dht': False,
+            'enable_lsd': False,
+            'enable_upnp': False,
+            'enable_natpmp': False,
+        },
+        'dht_routers': [],
+    },
+    # Everything on: DHT (warm-started from saved state), LSD, UPnP, NAT-PMP
+    'full-swarm': {
+        'listen_host': '0.0.0.0',
+        'settings': {
+            'enable_dht': True,
+            'enable_lsd': True,
+            'enable_upnp': True,
+            'enable_natpmp': True,
+        },
+        'dht_routers': DHT_ROUTERS,
+    },
+}
+
+DEFAULT_PROFILE = 'full-swarm'
+
+
+def profile_settings(profile, port):
+    """The settings pack a profile starts a session with"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown session profile: {profile} (choose from {', '.join(PROFILES)})")
+    spec = PROFILES[profile]
+    settings = dict(BASE_SETTINGS, **spec['settings'])
+    settings['listen_interfaces'] = f"{spec['listen_host']}:{port}"
+    return settings
+
+
+def create_session(profile=DEFAULT_PROFILE, port=6881, state_path=None):
+    """
+    Start a libtorrent session for a named profile.
+
+    Settings go to the session constructor, so features a profile turns
+    off (DHT, UPnP...) are never started in the first place. For profiles
+    with DHT, the routing table saved by save_session_state() is loaded
+    first, so the node rejoins the DHT warm instead of bootstrapping from
+    the routers alone.
+    """
+    session = lt.session(profile_settings(profile, port))
+
+    if PROFILES[profile]['settings'].get('enable_dht'):
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, 'rb') as f:
+                    session.load_state(lt.bdecode(f.read()), lt.save_state_flags_t.save_dht_state)
+            except Exception as e:
+                print(f"⚠ Ignoring unreadable DHT state {state_path}: {e}")
+        for host, router_port in PROFILES[profile]['dht_routers']:
+            session.add_dht_router(host, router_port)
+
+    return session
+
+
+def save_session_state(session, state_path):
+    """Persist the session's DHT routing table (no-op without DHT)"""
+    if not state_path or not session.is_dht_running():
+        return False
+    os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+    state = session.save_state(lt.save_state_flags_t.save_dht_state)
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(lt.bencode(state))
+    os.replace(tmp_path, state_path)
+    return True
@@ -0,0 +1,374 @@
+import hashlib
+import json
+import os
+import re
+import stat
+import sys
+import tempfile
+import threading
+from array import array
+from collections import deque
+
+
+# (name, category, confidence, pattern). Confidence is what one hit says
+# about a piece: header and API-name hits are weak on their own, packer
+# stubs make a piece suspicious, dropper one-liners and the EICAR test file
+# are detections (see MALICIOUS_CONFIDENCE and policy.py).
+DEFAULT_SIGNATURES = [
+    ('pe-dos-stub', 'header', 0.1, b'This program cannot be run in DOS mode'),
+    ('elf64-header', 'header', 0.1, b'\x7fELF\x02\x01\x01'),
+    ('upx-section-0', 'packer', 0.4, b'UPX0\x00\x00\x00\x00'),
+    ('upx-section-1', 'packer', 0.4, b'UPX1\x00\x00\x00\x00'),
+    ('upx-magic', 'packer', 0.4, b'UPX!'),
+    ('mpress-section', 'packer', 0.4, b'.MPRESS1'),
+    ('aspack-section', 'packer', 0.4, b'.aspack\x00'),
+    ('pecompact-magic', 'packer', 0.4, b'PEC2'),
+    ('themida-section', 'packer', 0.4, b'.themida'),
+    ('remote-thread-injection', 'api', 0.2, b'CreateRemoteThread'),
+    ('process-memory-write', 'api', 0.2, b'WriteProcessMemory'),
+    ('powershell-encoded', 'dropper', 0.6, b'powershell -enc'),
+    ('powershell-noprofile', 'dropper', 0.6, b'powershell.exe -nop'),
+    ('powershell-base64', 'dropper', 0.6, b'FromBase64String('),
+    ('powershell-download', 'dropper', 0.6, b'DownloadString('),
+    ('powershell-iex', 'dropper', 0.6, b'Invoke-Expression'),
+    ('wscript-shell', 'dropper', 0.6, b'WScript.Shell'),
+    ('certutil-decode', 'dropper', 0.6, b'certutil -decode'),
+    ('php-eval-base64', 'dropper', 0.6, b'eval(base64_decode('),
+    ('eicar-test-file', 'test', 1.0,
+     b'X5O!P%@AP[4\\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*'),
+]
+
+# A piece with a hit at or above this confidence is reported malicious
+MALICIOUS_CONFIDENCE = 0.5
+
+# Hits reported per piece (a packed file repeats its stub names a lot)
+MAX_HITS = 32
+
+
+class Ruleset:
+    """
+    A compiled set of byte signatures.
+
+    Inside a piece, matching is one pass of a compiled regex alternation
+    (longest pattern first), which runs in C over bytes or memoryviews.
+    Across pieces it is an Aho-Corasick automaton flattened into a DFA
+    table (state * 256 + byte -> state): the state after a file segment
+    depends only on its last max_len - 1 bytes, so scanning carries that
+    state to the next piece instead of re-reading an overlap. See
+    SignatureStreams.
+    """
+
+    def __init__(self, signatures, automaton=None):
+        self.signatures = _normalize(signatures)
+        if not self.signatures or not all(pattern for *_, pattern in self.signatures):
+            raise ValueError("A ruleset needs at least one signature and no empty patterns")
+
+        self.lengths = [len(pattern) for *_, pattern in self.signatures]
+        self.max_len = max(self.lengths)
+        self.by_pattern = {pattern: rule for rule, (*_, pattern) in enumerate(self.signatures)}
+        self.by_name = {name: rule for rule, (name, *_) in enumerate(self.signatures)}
+        self.digest = _digest(self.signatures)
+        # (delta, outputs) from the disk cache, or built here
+        self.delta, self.outputs = automaton or _build_automaton(
+            [pattern for *_, pattern in self.signatures])
+        patterns = sorted(self.by_pattern, key=len, reverse=True)
+        self.regex = re.compile(b'|'.join(re.escape(pattern) for pattern in patterns))
+
+    @property
+    def overlap(self):
+        """Bytes of a piece's edges a boundary match can use"""
+        return self.max_len - 1
+
+    def match(self, data):
+        """[(rule, offset)] of the signatures in a buffer (non-overlapping, leftmost first)"""
+        return [(self.by_pattern[m.group()], m.start()) for m in self.regex.finditer(data)]
+
+    def run(self, state, data):
+        """
+        Feed bytes through the automaton from `state`:
+        (state after them, [(rule, end)]) with `end` counted in bytes of data
+        """
+        delta, outputs = self.delta, self.outputs
+        hits = []
+        for end, byte in enumerate(data, 1):
+            state = delta[state << 8 | byte]
+            if outputs[state]:
+                hits.extend((rule, end) for rule in outputs[state])
+        return state, hits
+
+    def boundary(self, data):
+        """(head, tail): the edge bytes SignatureStreams needs to join pieces"""
+        overlap = self.overlap
+        return bytes(data[:overlap]), bytes(data[-overlap:]) if overlap else b''
+
+    def hit(self, rule, offset):
+        name, category, confidence, _ = self.signatures[rule]
+        return {'rule': name, 'category': category, 'confidence': confidence, 'offset': offset}
+
+    def assess(self, hits):
+        """(malicious, confidence) for a piece's hits: the strongest one decides"""
+        confidence = max((hit['confidence'] for hit in hits), default=0.0)
+        return confidence >= MALICIOUS_CONFIDENCE, confidence
+
+    def scan(self, data):
+        """Signature part of a scan result for one piece"""
+        hits = [self.hit(rule, offset) for rule, offset in self.match(data)[:MAX_HITS]]
+        malicious, confidence = self.assess(hits)
+        return {'malicious': malicious, 'confidence': confidence, 'signatures': hits,
+                'boundary': self.boundary(data)}
+
+
+def _normalize(signatures):
+    return [(name, category, float(confidence), bytes(pattern))
+            for name, category, confidence, pattern in signatures]
+
+
+def _digest(signatures):
+    """sha256 of normalized signatures (their repr is stable: str, float and bytes only)"""
+    return hashlib.sha256(repr(signatures).encode()).hexdigest()
+
+
+def _build_automaton(patterns):
+    """Aho-Corasick goto/fail functions folded into a DFA: (delta, outputs)"""
+    children = [{}]
+    outputs = [()]
+    for rule, pattern in enumerate(patterns):
+        state = 0
+        for byte in pattern:
+            if byte not in children[state]:
+                children.append({})
+                outputs.append(())
+                children[state][byte] = len(children) - 1
+            state = children[state][byte]
+        outputs[state] += (rule,)
+
+    delta = array('I', bytes(4 * 256 * len(children)))
+    fail = [0] * len(children)
+    queue = deque()
+    for byte in range(256):
+        child = children[0].get(byte, 0)
+        delta[byte] = child
+        if child:
+            queue.append(child)
+
+    # Breadth first, so a state's fail target is complete before the state
+    while queue:
+        state = queue.popleft()
+        outputs[state] += outputs[fail[state]]
+        base = state << 8
+        fail_base = fail[state] << 8
+        for byte in range(256):
+            child = children[state].get(byte)
+            if child is None:
+                delta[base | byte] = delta[fail_base | byte]
+            else:
+                fail[child] = delta[fail_base | byte]
+                delta[base | byte] = child
+                queue.append(child)
+
+    return delta, outputs
+
+
+class SignatureStreams:
+    """
+    Cross-piece signature matching for one torrent.
+
+    Pieces are scanned on their own, in any order, by any worker; their
+    scan results carry the first and last max_len - 1 bytes ('boundary').
+    Per file, this keeps the automaton state at the end of every scanned
+    segment that the file continues after, and the head bytes of every
+    segment whose predecessor isn't scanned yet. When both sides of a
+    boundary are known, the state runs over the head bytes once: matches
+    that started before the boundary are the ones each piece missed.
+
+    It also drops in-piece hits that straddle two files of the piece and
+    adds the file and offset within the file to every hit.
+    """
+
+    def __init__(self, files, ruleset=None):
+        self.files = files  # file_index.FileIndex
+        self.ruleset = ruleset
+        self.ends = {}   # (file_index, file_offset) -> state after the bytes before it
+        self.heads = {}  # (file_index, file_offset) -> bytes from it, predecessor unscanned
+        self.lock = threading.Lock()
+        self.counters = {'joined': 0, 'cross_piece_hits': 0, 'dropped_hits': 0}
+
+    def feed(self, piece_index, scan_result):
+        """
+        Fold one piece's result in: returns the result with its boundary
+        removed, hits mapped to files and boundary matches added. Results
+        without a boundary (other scanners, verdicts cached without one)
+        pass through.
+        """
+        boundary = scan_result.pop('boundary', None)
+        if boundary is None or 'signatures' not in scan_result:
+            return scan_result
+
+        ruleset = self.ruleset = self.ruleset or load_ruleset()
+        segments = self.files.segments(piece_index)
+        hits, dropped = [], 0
+        for hit in scan_result['signatures']:
+            length = ruleset.lengths[ruleset.by_name[hit['rule']]]
+            located = self._locate(segments, hit['offset'], length)
+            if located is None:
+                dropped += 1  # straddles two files of the piece
+                continue
+            hits.append(dict(hit, file_index=located[0], file_offset=located[1]))
+        if dropped:
+            with self.lock:
+                self.counters['dropped_hits'] += dropped
+
+        if segments:
+            head, tail = boundary
+            file_index, file_offset, piece_offset, length = segments[0]
+            if piece_offset == 0 and file_offset > 0:
+                hits += self._join((file_index, file_offset), head=head[:length])
+
+            file_index, file_offset, piece_offset, length = segments[-1]
+            if (piece_offset + length == self.files.piece_size(piece_index)
+                    and self.files.continues_after(file_index, file_offset, length)):
+                state, _ = ruleset.run(0, tail[-length:])
+                hits += self._join((file_index, file_offset + length), state=state)
+
+        malicious, confidence = ruleset.assess(hits)
+        return dict(scan_result, signatures=hits[:MAX_HITS], malicious=malicious, confidence=confidence)
+
+    @staticmethod
+    def _locate(segments, offset, length):
+        for file_index, file_offset, piece_offset, segment_length in segments:
+            if piece_offset <= offset and offset + length <= piece_offset + segment_length:
+                return file_index, file_offset + offset - piece_offset
+        return None
+
+    def _join(self, key, head=None, state=None):
+        """Match across the boundary at `key` once both of its sides are known"""
+        with self.lock:
+            if head is not None:
+                state = self.ends.pop(key, None)
+                if state is None:
+                    self.heads[key] = head
+                    return []
+            else:
+                head = self.heads.pop(key, None)
+                if head is None:
+                    self.ends[key] = state
+                    return []
+            self.counters['joined'] += 1
+
+        file_index, file_offset = key
+        hits = []
+        for rule, end in self.ruleset.run(state, head)[1]:
+            start = end - self.ruleset.lengths[rule]
+            if start < 0:  # otherwise the later piece found it on its own
+                hits.append(dict(self.ruleset.hit(rule, None), file_index=file_index,
+                                 file_offset=file_offset + start, cross_piece=True))
+        with self.lock:
+            self.counters['cross_piece_hits'] += len(hits)
+        return hits
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending_ends=len(self.ends), pending_heads=len(self.heads))
+
+
+def load_signatures(path):
+    """
+    Signatures from a JSON file: a list of objects with "name", "pattern"
+    (text) or "hex", and optional "category" and "confidence"
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    signatures = []
+    for entry in entries:
+        pattern = bytes.fromhex(entry['hex']) if 'hex' in entry else entry['pattern'].encode()
+        signatures.append((entry['name'], entry.get('category', 'custom'),
+                           float(entry.get('confidence', 1.0)), pattern))
+    return signatures
+
+
+_rulesets = {}
+_rulesets_lock = threading.Lock()
+
+
+def load_ruleset(path=None, cache_dir=None):
+    """
+    Return the compiled ruleset, built once per process and cached on disk
+    so that scanner worker processes load the DFA instead of rebuilding it.
+        SIGNATURES_PATH        JSON signature file (default: DEFAULT_SIGNATURES)
+        SIGNATURES_CACHE_DIR   compiled ruleset cache, used only if it is a
+                               directory of ours nobody else can write to
+                               (default: <tmp>/torrent-signatures-<uid>)
+    """
+    path = path or os.environ.get('SIGNATURES_PATH') or None
+    signatures = _normalize(load_signatures(path) if path else DEFAULT_SIGNATURES)
+    key = _digest(signatures)
+
+    with _rulesets_lock:
+        if key in _rulesets:
+            return _rulesets[key]
+
+        cache_dir = cache_dir or os.environ.get('SIGNATURES_CACHE_DIR') or _default_cache_dir()
+        cache_path = os.path.join(cache_dir, f'{key}.dfa')
+        private = _private_dir(cache_dir)
+        automaton = _read_automaton(cache_path, len(signatures)) if private else None
+        ruleset = Ruleset(signatures, automaton=automaton)
+        if private and automaton is None:
+            _write_automaton(cache_path, ruleset)
+
+        _rulesets[key] = ruleset
+        return ruleset
+
+
+def _default_cache_dir():
+    uid = os.getuid() if hasattr(os, 'getuid') else os.getpid()
+    return os.path.join(tempfile.gettempdir(), f'torrent-signatures-{uid}')
+
+
+def _private_dir(path):
+    """Create `path` (mode 0700) if needed; True if it is ours and closed to others"""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(st.st_mode) or st.st_mode & 0o077:
+        return False
+    return not hasattr(os, 'getuid') or st.st_uid == os.getuid()
+
+
+# Cache file: one JSON header line ({"states", "outputs", "byteorder"}),
+# then the DFA table as raw 32-bit entries. Plain data, nothing to execute;
+# a table that doesn't fit its header is ignored and rebuilt.
+
+def _read_automaton(cache_path, num_rules):
+    try:
+        with open(cache_path, 'rb') as f:
+            header = json.loads(f.readline())
+            table = f.read()
+        states = int(header['states'])
+        outputs = [tuple(int(rule) for rule in rules) for rules in header['outputs']]
+        delta = array('I')
+        delta.frombytes(table)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if header.get('byteorder') != sys.byteorder or delta.itemsize != 4:
+        return None
+    if states < 1 or len(delta) != states * 256 or len(outputs) != states or max(delta) >= states:
+        return None
+    if any(rule < 0 or rule >= num_rules for rules in outputs for rule in rules):
+        return None
+    return delta, outputs
+
+
+def _write_automaton(cache_path, ruleset):
+    header = {'states': len(ruleset.outputs), 'outputs': [list(rules) for rules in ruleset.outputs],
+              'byteorder': sys.byteorder}
+    try:
+        # Written aside and renamed: workers starting together never read half a file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            ruleset.delta.tofile(f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # read-only tmp: every process builds its own
@@ -0,0 +1,130 @@
+import threading
+import time
+from types import MappingProxyType
+
+
+STATE_STR = [
+    'queued', 'checking', 'downloading metadata',
+    'downloading', 'finished', 'seeding', 'allocating',
+    'checking fastresume', 'unknown'
+]
+
+_EMPTY = MappingProxyType({})
+
+
+def status_record(status):
+    """Plain, JSON-friendly copy of the torrent_status fields we report"""
+    return {
+        'state': STATE_STR[min(int(status.state), len(STATE_STR) - 1)],
+        'progress': status.progress * 100,
+        'peers': status.num_peers,
+        'seeds': status.num_seeds,
+        'download_rate': status.download_rate,
+        'upload_rate': status.upload_rate,
+        'total_done': status.total_done,
+        'num_pieces': status.num_pieces,
+        'paused': bool(status.paused)
+    }
+
+
+class StatusCollector:
+    """
+    Keeps an immutable snapshot of every active torrent's status.
+
+    A background thread asks each session for post_torrent_updates();
+    libtorrent answers with one state_update_alert listing only the
+    torrents whose status changed, which the AlertEngine hands to
+    on_state_update(). Each update publishes a new read-only snapshot
+    (download_id -> record), so readers never call handle.status() or
+    take a libtorrent lock: REST requests and the progress emitter cost
+    the same however many torrents are active.
+    """
+
+    def __init__(self, session_manager, interval=0.5):
+        self.sessions = session_manager
+        self.interval = interval
+        self.lock = threading.Lock()  # serializes publishers, readers never wait
+        self.static = {}   # download_id -> fields known when tracking starts
+        self.current = {}  # info hash -> latest status record
+        self._snapshot = _EMPTY
+        self.published_at = 0.0
+        self.counters = {'polls': 0, 'updates': 0, 'torrents_updated': 0}
+        self.running = False
+        self.thread = None
+
+        for engine in self.sessions.alert_engines:
+            engine.add_session_listener(self)
+
+    def track(self, download_id, **fields):
+        """Start reporting a download; `fields` (name, sizes...) are included as is"""
+        with self.lock:
+            self.static[download_id] = fields
+            self._publish()
+
+    def forget(self, download_id):
+        with self.lock:
+            self.static.pop(download_id, None)
+            self._publish()
+
+    def snapshot(self):
+        """Read-only {download_id: record} as of the last update (never blocks)"""
+        return self._snapshot
+
+    def get(self, download_id):
+        return self._snapshot.get(download_id)
+
+    # ----- AlertEngine callback (alert thread) -----
+
+    def on_state_update(self, statuses):
+        records = {str(status.info_hash): status_record(status) for status in statuses}
+        with self.lock:
+            self.current.update(records)
+            self.counters['updates'] += 1
+            self.counters['torrents_updated'] += len(records)
+            self._publish()
+
+    def _publish(self):
+        """Build a fresh snapshot from current state (lock held)"""
+        hashes = self.sessions.info_hashes_by_download()
+        live = set(hashes.values())
+        # Torrents that left the session no longer get updates: drop them
+        for info_hash in [h for h in self.current if h not in live]:
+            del self.current[info_hash]
+
+        snapshot = {}
+        for download_id, fields in self.static.items():
+            record = dict(fields, download_id=download_id)
+            status = self.current.get(hashes.get(download_id))
+            if status:
+                record.update(status)
+            snapshot[download_id] = MappingProxyType(record)
+
+        self._snapshot = MappingProxyType(snapshot)
+        self.published_at = time.time()
+
+    # ----- poller thread -----
+
+    def start(self):
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name='status-collector', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            if self.static:
+                for session in self.sessions.sessions:
+                    # flags=0: only the cheap fields, no piece bitfields or peer lists
+                    session.post_torrent_updates(0)
+                self.counters['polls'] += 1
+            time.sleep(self.interval)
+
+    def stats(self):
+        return {
+            **self.counters,
+            'tracked_downloads': len(self._snapshot),
+            'snapshot_age': round(time.time() - self.published_at, 3) if self.published_at else None
+        }
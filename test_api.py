@@ -53,11 +53,17 @@ def test_websocket_updates(download_id):
         print(f"   Size: {data['total_size'] / (1024**2):.2f} MB")
         print(f"   Pieces: {data['downloading_pieces']}/{data['total_pieces']}")
     
-    @sio.on('download_progress')
-    def on_progress(data):
-        print(f"\r⏳ Progress: {data['progress']:.1f}% | "
-              f"Peers: {data['peers']} | "
-              f"State: {data['state']}", end='')
+    # Progress arrives batched, with only the fields that changed: merge
+    progress = {}
+    
+    @sio.on('progress_batch')
+    def on_progress(frame):
+        if download_id not in frame['downloads']:
+            return
+        progress.update(frame['downloads'][download_id])
+        print(f"\r⏳ Progress: {progress.get('progress', 0):.1f}% | "
+              f"Peers: {progress.get('peers', 0)} | "
+              f"State: {progress.get('state', '?')}", end='')
     
     @sio.on('piece_downloaded')
     def on_piece(data):
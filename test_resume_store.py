@@ -0,0 +1,65 @@
+import os
+import threading
+
+import pytest
+
+from resume_store import ResumeStore
+from scheduler import DownloadScheduler
+from torrent_index import TorrentIndex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TORRENTS = ['tiny-iso-test_archive.torrent', 'academic_test.torrent']
+
+
+def make_job(torrent_id):
+    return {'torrent_id': torrent_id, 'num_pieces': 5, 'max_bytes': None, 'strategy': 'first',
+            'policy': None, 'preset': None, 'pick_mode': None, 'priority': 0,
+            'submitter': 'test'}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """api_server with its stores in tmp_path and a scheduler that never starts a job"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('TORRENT_PROFILE', 'offline')
+    import api_server
+
+    store = ResumeStore(str(tmp_path / 'resume.db'))
+    index = TorrentIndex(str(tmp_path / 'uploads'))
+    scheduler = DownloadScheduler(max_active=1)
+    # Keep the only worker busy so the resumed jobs stay queued
+    release = threading.Event()
+    scheduler.submit('blocker', release.wait)
+
+    monkeypatch.setattr(api_server, 'get_resume_store', lambda: store)
+    monkeypatch.setattr(api_server, 'get_scheduler', lambda: scheduler)
+    monkeypatch.setattr(api_server, 'torrent_index', index)
+    yield api_server, store, index, scheduler
+    release.set()
+
+
+def restart(api_server, scheduler, download_ids):
+    """What a new server process starts from: nothing queued, nothing active"""
+    for download_id in download_ids:
+        scheduler.cancel(download_id)
+        api_server.forget_download(download_id)
+
+
+def test_resume_jobs_keeps_resume_data_and_order(server):
+    api_server, store, index, scheduler = server
+
+    download_ids = []
+    for i, name in enumerate(TORRENTS):
+        with open(os.path.join(HERE, name), 'rb') as f:
+            record, _ = index.add(f.read())
+        download_id = f'download-{i}'
+        store.save_job(download_id, make_job(record['torrent_id']))
+        store.save_resume_data(download_id, f'resume-{i}'.encode())
+        download_ids.append(download_id)
+    store.flush()
+
+    expected = [(download_id, f'resume-{i}'.encode()) for i, download_id in enumerate(download_ids)]
+    for _ in range(2):
+        restart(api_server, scheduler, download_ids)
+        assert api_server.resume_jobs() == len(download_ids)
+        assert [(download_id, resume_data) for download_id, _, resume_data in store.jobs()] == expected
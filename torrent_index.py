@@ -0,0 +1,140 @@
+import json
+import libtorrent as lt
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+INDEX_FILE = 'index.json'
+
+
+def torrent_record(info, file_path):
+    """Compact, JSON-friendly metadata record for a parsed torrent"""
+    files = info.files()
+    return {
+        'torrent_id': str(info.info_hash()),
+        'name': info.name(),
+        'total_size': info.total_size(),
+        'total_pieces': info.num_pieces(),
+        'piece_size': info.piece_length(),
+        'files': [
+            {'path': files.file_path(i), 'size': files.file_size(i)}
+            for i in range(files.num_files())
+        ],
+        'file_path': file_path,
+        'uploaded_at': datetime.now().isoformat()
+    }
+
+
+class TorrentIndex:
+    """
+    Uploaded torrents keyed by infohash.
+
+    Each upload is parsed once: the metadata record is kept in memory and
+    persisted to uploads/index.json, and the parsed torrent_info objects
+    live in a bounded LRU so starting a download doesn't re-read the
+    .torrent from disk. Uploading the same torrent twice (under any
+    filename) returns the existing entry.
+    """
+
+    def __init__(self, upload_folder, max_cached=64):
+        self.upload_folder = upload_folder
+        self.index_path = os.path.join(upload_folder, INDEX_FILE)
+        self.max_cached = max_cached
+        self.lock = threading.Lock()
+        self.records = {}  # infohash -> metadata record
+        self.infos = OrderedDict()  # infohash -> lt.torrent_info (LRU)
+
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.records = json.load(f)
+            return
+
+        # First run: index whatever .torrent files are already uploaded
+        for filename in sorted(os.listdir(self.upload_folder)):
+            if not filename.endswith('.torrent'):
+                continue
+            file_path = os.path.join(self.upload_folder, filename)
+            try:
+                info = lt.torrent_info(file_path)
+            except Exception as e:
+                print(f"⚠ Skipping unreadable torrent {filename}: {e}")
+                continue
+            record = torrent_record(info, file_path)
+            self.records[record['torrent_id']] = record
+        self._save()
+
+    def _save(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.records, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+
+    def add(self, data):
+        """
+        Parse and store an uploaded .torrent.
+        Returns (record, created); raises ValueError for invalid data.
+        """
+        decoded = lt.bdecode(data)
+        if not decoded:
+            raise ValueError('not a bencoded torrent')
+        info = lt.torrent_info(decoded)
+        torrent_id = str(info.info_hash())
+
+        with self.lock:
+            if torrent_id in self.records:
+                self._cache(torrent_id, info)
+                return self.records[torrent_id], False
+
+            file_path = os.path.join(self.upload_folder, f"{torrent_id}.torrent")
+            with open(file_path, 'wb') as f:
+                f.write(data)
+
+            record = torrent_record(info, file_path)
+            self.records[torrent_id] = record
+            self._cache(torrent_id, info)
+            self._save()
+
+        return record, True
+
+    def get(self, torrent_id):
+        with self.lock:
+            return self.records.get(torrent_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.records.values())
+
+    def get_info(self, torrent_id):
+        """
+        Return a private copy of the torrent's torrent_info (None if unknown).
+        Served from the LRU; only a cache miss parses the file again.
+        """
+        with self.lock:
+            record = self.records.get(torrent_id)
+            if record is None:
+                return None
+
+            info = self.infos.get(torrent_id)
+            if info is None:
+                info = lt.torrent_info(record['file_path'])
+                self._cache(torrent_id, info)
+            else:
+                self.infos.move_to_end(torrent_id)
+
+        # Each download gets its own copy; the cached object is never handed out
+        return lt.torrent_info(info)
+
+    def _cache(self, torrent_id, info):
+        self.infos[torrent_id] = info
+        self.infos.move_to_end(torrent_id)
+        while len(self.infos) > self.max_cached:
+            self.infos.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {'torrents': len(self.records), 'cached_infos': len(self.infos)}
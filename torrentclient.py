@@ -1,37 +1,55 @@
 import libtorrent as lt
 import time
 import os
+import queue
+from alert_engine import AlertEngine, torrent_key
+from file_index import FileIndex
+from sampling import FirstPiecesStrategy, SamplingBudget, select_pieces
+from session_profiles import DEFAULT_PROFILE, create_session, save_session_state
+from presets import apply_session_preset
+from piece_picker import create_picker
 
 class TorrentClient:
-    def __init__(self):
-        self.session = lt.session()
-        
-        settings = self.session.get_settings()
-        settings['listen_interfaces'] = '0.0.0.0:6881'
-        settings['enable_dht'] = True
-        settings['enable_lsd'] = True
-        settings['enable_upnp'] = True
-        settings['enable_natpmp'] = True
-        settings['announce_to_all_trackers'] = True
-        settings['announce_to_all_tiers'] = True
-        self.session.apply_settings(settings)
-
-        self.session.add_dht_router("router.bittorrent.com", 6881)
-        self.session.add_dht_router("router.utorrent.com", 6881)
-        self.session.add_dht_router("dht.transmissionbt.com", 6881)
+    def __init__(self, profile=DEFAULT_PROFILE, port=6881, state_path=None, preset=None):
+        """
+        profile: 'offline' (loopback, no discovery), 'tracker-only' or
+        'full-swarm' (DHT, LSD, UPnP, NAT-PMP); see session_profiles.py.
+        state_path: where the DHT routing table is kept between runs
+        (full-swarm only; call save_state() before exiting).
+        preset: performance preset from presets.py (default: libtorrent defaults).
+        """
+        self.profile = profile
+        self.state_path = state_path
+        self.session = create_session(profile, port, state_path)
+        if preset:
+            apply_session_preset(self.session, preset)
         
-        self.session.start_dht()
+        # Piece completion is pushed by libtorrent alerts instead of polled
+        self.alerts = AlertEngine(self.session)
+        self.alerts.start()
         
-        print("Torrent client initialized. DHT enabled.")
+        print(f"Torrent client initialized ({profile} profile).")
 
-    def download_chunks_only(self, torrent_file_path, save_path, num_pieces=5):
+    def save_state(self):
+        """Save the DHT routing table so the next start is warm"""
+        return save_session_state(self.session, self.state_path)
+
+    def download_chunks_only(self, torrent_file_path, save_path, num_pieces=5, strategy=None,
+                             budget=None, peers=None, picker=None):
         """
-        Download ONLY the first N pieces for malware scanning testing.
+        Download ONLY N sampled pieces for malware scanning testing.
         Perfect for your chunk-level detection project!
+        The pieces are chosen by `strategy` (see sampling.py, default: the
+        first N pieces) within `budget` (default: num_pieces pieces).
+        `peers` are (host, port) pairs connected to directly, for swarms
+        without a tracker (lab seeders, bench_swarm.py).
+        `picker` requests the pieces (see piece_picker.py, default: PICK_MODE).
         """
         
         # Load torrent info
         info = lt.torrent_info(torrent_file_path)
+        started = time.time()
+        first_piece_at = None
         
         params = {
             'save_path': save_path,
@@ -39,7 +57,14 @@ class TorrentClient:
             'ti': info
         }
         
+        # Alert callbacks land here; the wait loop below drains them
+        events = queue.Queue()
+        listener = _QueueListener(events)
+        self.alerts.register(str(info.info_hash()), listener)
+        
         handle = self.session.add_torrent(params)
+        for peer in peers or []:
+            handle.connect_peer(peer)
         
         print(f"\n{'='*60}")
         print(f"Torrent: {info.name()}")
@@ -48,27 +73,49 @@ class TorrentClient:
         print(f"Piece size: {info.piece_length() / 1024:.2f} KB")
         print(f"{'='*60}")
         
-        # ✨ KEY FEATURE: Download ONLY first N pieces for malware detection testing
+        # ✨ KEY FEATURE: Download ONLY N sampled pieces for malware detection testing
         total_pieces = info.num_pieces()
-        num_pieces = min(num_pieces, total_pieces)  # Don't request more than available
-        
-        # Set all pieces to priority 0 (don't download)
-        priorities = [0] * total_pieces
+        strategy = strategy or FirstPiecesStrategy()
+        budget = budget or SamplingBudget(max_pieces=num_pieces)
+        targets = select_pieces(strategy, info, budget)  # never more than available
+        num_pieces = len(targets)
         
-        # Set only first N pieces to priority 7 (highest)
-        for i in range(num_pieces):
-            priorities[i] = 7
+        # Only the sampled pieces are requested (priority 7, deadlines in
+        # latency mode), every other piece stays at priority 0
+        picker = picker or create_picker()
+        picker.start(handle, total_pieces, targets)
         
-        handle.prioritize_pieces(priorities)
-        
-        print(f"\n🎯 Downloading ONLY first {num_pieces} pieces ({num_pieces * info.piece_length() / 1024:.2f} KB)")
+        print(f"\n🎯 Downloading ONLY {num_pieces} pieces ({strategy.name} strategy, "
+              f"{num_pieces * info.piece_length() / 1024:.2f} KB)")
         print(f"   Perfect for testing your malware scanner!\n")
         
         # Wait for those specific pieces to download
         pieces_downloaded = set()
+        last_print = 0
         
         try:
             while len(pieces_downloaded) < num_pieces:
+                try:
+                    kind, value = events.get(timeout=0.5)
+                except queue.Empty:
+                    kind, value = None, None
+                
+                if kind == 'checked':
+                    # Pieces already on disk don't raise piece_finished_alert
+                    for i in targets:
+                        if handle.have_piece(i):
+                            events.put(('piece', i))
+                
+                if kind == 'piece' and value in targets and value not in pieces_downloaded:
+                    pieces_downloaded.add(value)
+                    first_piece_at = first_piece_at or time.time()
+                    piece_hash = info.hash_for_piece(value)
+                    print(f"\n✓ Piece {value} downloaded ({len(pieces_downloaded)}/{num_pieces})! Hash: {piece_hash}")
+                
+                if time.time() - last_print < 0.5:
+                    continue
+                last_print = time.time()
+                
                 s = handle.status()
                 
                 # FIXED: Extended state list to avoid IndexError
@@ -82,14 +129,6 @@ class TorrentClient:
                 state_idx = min(s.state, len(state_str) - 1)
                 state = state_str[state_idx]
                 
-                # Check which pieces we have
-                if s.has_metadata:
-                    for i in range(num_pieces):
-                        if handle.have_piece(i) and i not in pieces_downloaded:
-                            pieces_downloaded.add(i)
-                            piece_hash = info.hash_for_piece(i)
-                            print(f"✓ Piece {i}/{num_pieces-1} downloaded! Hash: {piece_hash}")
-                
                 progress_percent = (len(pieces_downloaded) / num_pieces) * 100
                 download_speed_kb = s.download_rate / 1024
                 
@@ -98,12 +137,13 @@ class TorrentClient:
                       f'Peers: {s.num_peers} | '
                       f'Speed: {download_speed_kb:.1f} KB/s | '
                       f'Pieces: {len(pieces_downloaded)}/{num_pieces}   ', end='')
-                
-                time.sleep(0.5)
         
         except KeyboardInterrupt:
             print("\n\n⚠ Download stopped by user.")
             return None, pieces_downloaded
+        
+        finally:
+            self.alerts.unregister(torrent_key(handle))
 
         print(f"\n\n{'='*60}")
         print(f"✓ Downloaded {len(pieces_downloaded)} chunks!")
@@ -116,13 +156,15 @@ class TorrentClient:
             'save_path': save_path,
             'piece_length': info.piece_length(),
             'downloaded_pieces': list(pieces_downloaded),
-            'total_pieces': total_pieces
+            'total_pieces': total_pieces,
+            'first_piece_seconds': first_piece_at and first_piece_at - started,
+            'elapsed_seconds': time.time() - started
         }
         
         return piece_info, pieces_downloaded
 
     def download_full_file(self, torrent_file_path, save_path):
-        """Full download (original method, now fixed)"""
+        """Full download (original method, now fixed); returns the saved file paths"""
         
         info = lt.torrent_info(torrent_file_path)
         
@@ -165,14 +207,26 @@ class TorrentClient:
 
         print(f"\n✓ Download Complete!")
         
-        if info.num_files() > 0:
-            first_file = info.file_at(0)
-            file_path = os.path.join(save_path, first_file.path)
-        else:
-            file_path = os.path.join(save_path, info.name())
-        
-        print(f"File saved: {file_path}")
-        return file_path
+        # Every file of the torrent (pad files are never written)
+        files = FileIndex(info)
+        file_paths = [os.path.join(save_path, files.paths[i]) for i in range(files.num_files)
+                      if not files.pad[i]]
+        for file_path in file_paths:
+            print(f"File saved: {file_path}")
+        return file_paths
+
+
+class _QueueListener:
+    """AlertEngine listener that forwards piece/check events into a queue"""
+
+    def __init__(self, events):
+        self.events = events
+
+    def on_piece_finished(self, piece_index):
+        self.events.put(('piece', piece_index))
+
+    def on_torrent_checked(self):
+        self.events.put(('checked', None))
 
 
 if __name__ == "__main__":
@@ -182,7 +236,9 @@ if __name__ == "__main__":
         os.makedirs(download_dir)
         print(f"Created directory: {download_dir}")
 
-    client = TorrentClient()
+    # TORRENT_PROFILE=offline for the lab / loopback tests
+    client = TorrentClient(profile=os.environ.get('TORRENT_PROFILE', 'full-swarm'),
+                           state_path=os.path.join(os.getcwd(), 'state', 'dht.dat'))
     
     # 🎯 OPTION 1: Test with tiny 4.8MB file from Internet Archive
     print("\n" + "="*60)
@@ -216,3 +272,5 @@ if __name__ == "__main__":
         print("OR use Ubuntu torrent:")
         print("wget https://releases.ubuntu.com/jammy/ubuntu-22.04.5-desktop-amd64.iso.torrent")
         print("="*60)
+    
+    client.save_state()
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def piece_hash_hex(info, piece_index):
+    """Hex SHA-1 of a piece from the torrent metadata (content address of the piece)"""
+    piece_hash = info.hash_for_piece(piece_index)
+    if isinstance(piece_hash, bytes):
+        return piece_hash.hex()
+    return str(piece_hash)
+
+
+class VerdictCache:
+    """
+    Scan verdicts keyed by (piece SHA-1, scanner version).
+
+    Identical pieces are shared across torrents (popular ISOs, repacks,
+    resubmissions), so a verdict computed once can be reused without
+    reading or scanning the piece again. Lookups hit an in-memory LRU
+    first and fall back to a SQLite store that survives restarts.
+    """
+
+    def __init__(self, db_path, max_entries=100000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()  # (piece_hash, scanner_version) -> verdict
+        self.counters = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS verdicts (
+                piece_hash TEXT NOT NULL,
+                scanner_version TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                PRIMARY KEY (piece_hash, scanner_version)
+            ) WITHOUT ROWID
+        ''')
+        self.db.commit()
+
+    def get(self, piece_hash, scanner_version, count=True):
+        """
+        The cached verdict, or None. count=False leaves the hit/miss
+        counters alone, for a second look at a piece already counted.
+        """
+        key = (piece_hash, scanner_version)
+
+        with self.lock:
+            verdict = self.memory.get(key)
+            if verdict is not None:
+                self.memory.move_to_end(key)
+                if count:
+                    self.counters['hits'] += 1
+                    self.counters['memory_hits'] += 1
+                return verdict
+
+            row = self.db.execute(
+                'SELECT verdict FROM verdicts WHERE piece_hash = ? AND scanner_version = ?', key
+            ).fetchone()
+            if row is None:
+                if count:
+                    self.counters['misses'] += 1
+                return None
+
+            verdict = json.loads(row[0])
+            self._remember(key, verdict)
+            if count:
+                self.counters['hits'] += 1
+                self.counters['disk_hits'] += 1
+            return verdict
+
+    def get_many(self, piece_hashes, scanner_version):
+        """Batch form of get(): {piece_hash: verdict} for the hashes that have one"""
+        piece_hashes = list(dict.fromkeys(piece_hashes))  # identical pieces count once
+        found = {}
+        missing = []
+
+        with self.lock:
+            for piece_hash in piece_hashes:
+                key = (piece_hash, scanner_version)
+                verdict = self.memory.get(key)
+                if verdict is not None:
+                    self.memory.move_to_end(key)
+                    found[piece_hash] = verdict
+                    self.counters['memory_hits'] += 1
+                else:
+                    missing.append(piece_hash)
+
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self.db.execute(
+                    'SELECT piece_hash, verdict FROM verdicts WHERE scanner_version = ? '
+                    f'AND piece_hash IN ({",".join("?" * len(chunk))})',
+                    [scanner_version] + chunk
+                ).fetchall()
+                for piece_hash, verdict in rows:
+                    found[piece_hash] = json.loads(verdict)
+                    self._remember((piece_hash, scanner_version), found[piece_hash])
+                    self.counters['disk_hits'] += 1
+
+            self.counters['hits'] += len(found)
+            self.counters['misses'] += len(piece_hashes) - len(found)
+
+        return found
+
+    def put(self, piece_hash, scanner_version, verdict):
+        key = (piece_hash, scanner_version)
+        with self.lock:
+            self._remember(key, verdict)
+            self.db.execute(
+                'INSERT OR REPLACE INTO verdicts (piece_hash, scanner_version, verdict) VALUES (?, ?, ?)',
+                (piece_hash, scanner_version, json.dumps(verdict))
+            )
+            self.db.commit()
+            self.counters['stores'] += 1
+
+    def _remember(self, key, verdict):
+        self.memory[key] = verdict
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self.memory)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_verdict_cache = None
+_verdict_cache_lock = threading.Lock()
+
+
+def get_verdict_cache():
+    """
+    Return the process-wide VerdictCache, configured from:
+        VERDICT_CACHE_PATH   SQLite file (default: ./cache/verdicts.db)
+        VERDICT_CACHE_SIZE   in-memory LRU entries (default: 100000)
+    """
+    global _verdict_cache
+
+    with _verdict_cache_lock:
+        if _verdict_cache is None:
+            _verdict_cache = VerdictCache(
+                os.environ.get('VERDICT_CACHE_PATH',
+                               os.path.join(os.getcwd(), 'cache', 'verdicts.db')),
+                max_entries=int(os.environ.get('VERDICT_CACHE_SIZE', 100000))
+            )
+        return _verdict_cache